@@ -1,27 +1,118 @@
-﻿from flask import Flask
+﻿import time
+from flask import Flask, request
 from flask_cors import CORS
 from .config import Config
 from .database import Database
+from .json_provider import init_json
+from .metrics import init_metrics, query_metrics
+from .schema import init_schema
 
-# Initialiser la connexion à la base de données
+# Accès à la base de données, limité en requêtes concurrentes (la connexion
+# est ouverte au premier usage, dans chaque processus : voir ConcurrencyLimiter)
 db = Database().get_db()
 
+
+def _init_schema(graph):
+    """Crée les contraintes et index s'ils n'existent pas encore"""
+    report = init_schema(graph)
+    print(f"Schéma Neo4j : créés {report['created']}, déjà présents {report['existing']}")
+
+
+def _load_friendship_index(graph):
+    """Charge l'index d'adjacence des amitiés"""
+    from .adjacency import friendship_index
+    stats = friendship_index.rebuild(graph)
+    print(f"Index des amitiés : {stats['users']} utilisateurs, {stats['friendships']} amitiés, "
+          f"{stats['memory_bytes'] / 1e6:.1f} Mo en {stats['load_seconds']}s")
+
+
 def create_app(config_class=Config):
+    """Construit l'application Flask
+
+    Aucune connexion n'est ouverte ici : le schéma et l'index des amitiés
+    sont préparés à la première connexion de chaque processus.
+    """
+    start = time.perf_counter()
+    
     # Initialiser l'application Flask
     app = Flask(__name__)
     app.config.from_object(config_class)
     
+    # Encodage JSON des réponses et des corps de requête (JSON_PROVIDER)
+    init_json(app)
+    
+    # Créer les contraintes et index à la première connexion
+    if app.config.get('NEO4J_INIT_SCHEMA'):
+        db.on_connect(_init_schema)
+    
+    # Charger l'index d'adjacence des amitiés à la première connexion
+    from .adjacency import friendship_index
+    if friendship_index.enabled:
+        db.on_connect(_load_friendship_index)
+    
     # Activer CORS pour permettre les requêtes cross-origin
     CORS(app)
     
+    # Durée des routes, requêtes Cypher par requête HTTP, GET /metrics
+    init_metrics(app, db)
+    
     # Enregistrer les blueprints pour les routes
     from .routes.user_routes import user_bp
     from .routes.post_routes import post_bp
     from .routes.comment_routes import comment_bp
+    from .routes.bulk_routes import bulk_bp
     
     app.register_blueprint(user_bp, url_prefix='/users')
     app.register_blueprint(post_bp, url_prefix='/posts')
     app.register_blueprint(comment_bp, url_prefix='/comments')
+    app.register_blueprint(bulk_bp)
+    
+    @app.route('/cache/stats')
+    def cache_stats():
+        from .cache import entity_cache
+        return {
+            'status': 'success',
+            'entity_cache': entity_cache.stats(),
+            'friendship_index': friendship_index.stats()
+        }
+    
+    @app.route('/db/stats')
+    def db_stats():
+        return {
+            'status': 'success',
+            'limiter': db.stats(),
+            'queries': query_metrics.summary()
+        }
+    
+    @app.route('/db/plans', methods=['GET', 'DELETE'])
+    def db_plans():
+        from .plans import plan_capture
+        if plan_capture is None:
+            return {
+                'status': 'error',
+                'message': 'Capture des plans désactivée (PLAN_CAPTURE_ENABLED, backend Neo4j)'
+            }, 400
+        if request.method == 'DELETE':
+            plan_capture.clear()
+        flagged_only = request.args.get('flagged', '').lower() in ('true', '1', 't')
+        return {
+            'status': 'success',
+            'mode': plan_capture.mode,
+            'sample_rate': plan_capture.sample_rate,
+            'plans': plan_capture.report(flagged_only)
+        }
+    
+    @app.route('/cache/friendship-index/rebuild', methods=['POST'])
+    def rebuild_friendship_index():
+        if not friendship_index.enabled:
+            return {
+                'status': 'error',
+                'message': 'Index des amitiés désactivé (FRIENDSHIP_INDEX_ENABLED)'
+            }, 400
+        return {
+            'status': 'success',
+            'friendship_index': friendship_index.rebuild(db)
+        }
     
     @app.route('/')
     def index():
@@ -31,8 +122,11 @@ def create_app(config_class=Config):
             'endpoints': {
                 'users': '/users',
                 'posts': '/posts',
-                'comments': '/comments'
+                'comments': '/comments',
+                'likes': '/likes/bulk',
+                'friendships': '/friendships/bulk'
             }
         }
     
+    app.config['STARTUP_SECONDS'] = time.perf_counter() - start
     return app
@@ -0,0 +1,176 @@
+﻿# Index d'adjacence des amitiés gardé en mémoire
+#
+# Chaque utilisateur reçoit un identifiant entier compact ; ses amis sont
+# un ensemble d'entiers. Vérifier une amitié, compter les amis ou trouver
+# les amis en commun (intersection d'ensembles) se fait alors sans requête.
+# L'index est chargé au démarrage (FRIENDSHIP_INDEX_ENABLED) et tenu à jour
+# par les modèles ; il ne voit pas les écritures faites par d'autres
+# processus ou hors de l'API : le reconstruire dans ce cas
+# (POST /cache/friendship-index/rebuild).
+#
+# Il n'y a aucune invalidation entre processus : avec plusieurs workers
+# (python -m app.serve), une amitié créée ou retirée par un worker reste
+# invisible aux autres jusqu'à leur prochain rechargement, et ils s'en
+# servent pour les amis en commun, les versions des listes d'amis et les
+# recommandations. N'activer l'index qu'avec un seul processus, ou en
+# acceptant ce retard et en le reconstruisant régulièrement.
+import sys
+import threading
+import time
+from .config import Config
+from .database import Query
+from .recommendations import EDGES_QUERY
+
+USERS_QUERY = Query("friendship_index.users", """
+MATCH (u:User)
+RETURN u.id AS id
+""")
+
+
+class FriendshipIndex:
+    """Graphe d'amitié non orienté : ID texte <-> entier, et un ensemble d'entiers par utilisateur"""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.loaded = False
+        self.loaded_at = None
+        self.load_seconds = None
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._ids = []        # entier -> ID texte (None pour un utilisateur supprimé)
+        self._numbers = {}    # ID texte -> entier
+        self._friends = []    # entier -> ensemble des entiers des amis
+
+    @property
+    def active(self):
+        return self.enabled and self.loaded
+
+    # Chargement
+
+    def rebuild(self, graph):
+        """Recharge tout l'index depuis la base (l'ancien reste utilisé pendant le chargement)"""
+        start = time.time()
+        ids, numbers, friends = [], {}, []
+
+        def number(user_id):
+            if user_id not in numbers:
+                numbers[user_id] = len(ids)
+                ids.append(user_id)
+                friends.append(set())
+            return numbers[user_id]
+
+        for record in graph.run(USERS_QUERY):
+            number(record['id'])
+        for record in graph.run(EDGES_QUERY):
+            user, friend = number(record['user_id']), number(record['friend_id'])
+            friends[user].add(friend)
+            friends[friend].add(user)
+
+        with self._lock:
+            self._ids, self._numbers, self._friends = ids, numbers, friends
+            self.loaded = True
+            self.loaded_at = time.time()
+            self.load_seconds = self.loaded_at - start
+        return self.stats()
+
+    # Mises à jour faites par les modèles
+
+    def add_user(self, user_id):
+        if not self.active:
+            return
+        with self._lock:
+            if user_id not in self._numbers:
+                self._numbers[user_id] = len(self._ids)
+                self._ids.append(user_id)
+                self._friends.append(set())
+
+    def remove_user(self, user_id):
+        if not self.active:
+            return
+        with self._lock:
+            user = self._numbers.pop(user_id, None)
+            if user is None:
+                return
+            for friend in self._friends[user]:
+                self._friends[friend].discard(user)
+            self._friends[user] = set()
+            self._ids[user] = None
+
+    def add_friendship(self, user_id, friend_id):
+        if not self.active:
+            return
+        with self._lock:
+            user, friend = self._numbers.get(user_id), self._numbers.get(friend_id)
+            if user is not None and friend is not None:
+                self._friends[user].add(friend)
+                self._friends[friend].add(user)
+
+    def remove_friendship(self, user_id, friend_id):
+        if not self.active:
+            return
+        with self._lock:
+            user, friend = self._numbers.get(user_id), self._numbers.get(friend_id)
+            if user is not None and friend is not None:
+                self._friends[user].discard(friend)
+                self._friends[friend].discard(user)
+
+    # Lectures (None si l'index ne peut pas répondre)
+    #
+    # Prises sous le verrou, comme les mises à jour : avec un serveur à
+    # threads, un ensemble parcouru pendant qu'un autre thread le modifie
+    # lèverait RuntimeError.
+
+    def _knows(self, user_ids):
+        return self.active and all(user_id in self._numbers for user_id in user_ids)
+
+    def knows(self, *user_ids):
+        """Indique si l'index est chargé et connaît tous ces utilisateurs"""
+        with self._lock:
+            return self._knows(user_ids)
+
+    def are_friends(self, user_id, friend_id):
+        with self._lock:
+            if not self._knows((user_id, friend_id)):
+                return None
+            return self._numbers[friend_id] in self._friends[self._numbers[user_id]]
+
+    def friend_ids(self, user_id):
+        with self._lock:
+            if not self._knows((user_id,)):
+                return None
+            return [self._ids[friend] for friend in self._friends[self._numbers[user_id]]]
+
+    def friend_count(self, user_id):
+        with self._lock:
+            if not self._knows((user_id,)):
+                return None
+            return len(self._friends[self._numbers[user_id]])
+
+    def mutual_friend_ids(self, user_id, other_id):
+        with self._lock:
+            if not self._knows((user_id, other_id)):
+                return None
+            mutual = self._friends[self._numbers[user_id]] & self._friends[self._numbers[other_id]]
+            return [self._ids[friend] for friend in mutual]
+
+    def stats(self):
+        """Taille de l'index et estimation de son empreinte mémoire (octets)"""
+        with self._lock:
+            ids, numbers, friends = self._ids, self._numbers, self._friends
+            memory = (sys.getsizeof(ids) + sys.getsizeof(numbers) + sys.getsizeof(friends)
+                      + sum(sys.getsizeof(user_id) for user_id in ids if user_id is not None)
+                      + sum(sys.getsizeof(user) for user in numbers.values())
+                      + sum(sys.getsizeof(friend_set) for friend_set in friends))
+            return {
+                'enabled': self.enabled,
+                'loaded': self.loaded,
+                'users': len(numbers),
+                'friendships': sum(len(friend_set) for friend_set in friends) // 2,
+                'memory_bytes': memory,
+                'load_seconds': round(self.load_seconds, 3) if self.load_seconds is not None else None
+            }
+
+
+friendship_index = FriendshipIndex(enabled=Config.FRIENDSHIP_INDEX_ENABLED)
@@ -0,0 +1,80 @@
+﻿# Variante asynchrone (ASGI) de l'API
+#
+# Les routes de lecture les plus sollicitées et les likes sont servis par
+# une application Quart avec le pilote Neo4j asynchrone : une requête en
+# attente de la base ne bloque pas de thread, et un processus peut garder
+# des milliers de requêtes en cours. Les autres routes (écritures, masse,
+# réponses en flux) sont transmises à l'application Flask de `create_app`,
+# exécutée dans des threads.
+#
+#   hypercorn asgi:app --bind 0.0.0.0:8000
+from urllib.parse import parse_qs
+from werkzeug.exceptions import HTTPException
+from app.config import Config
+from app.json_provider import init_json
+from app.streaming import NDJSON_MIMETYPE
+from .database import graph
+
+
+def create_quart_app(config_class=Config):
+    """Application Quart contenant uniquement les routes asynchrones"""
+    from quart import Quart
+    app = Quart(__name__)
+    app.config.from_object(config_class)
+    init_json(app)
+
+    @app.before_serving
+    async def connect():
+        await graph.connect()
+
+    @app.after_serving
+    async def close():
+        await graph.close()
+
+    from .routes import user_bp, post_bp, comment_bp
+
+    app.register_blueprint(user_bp, url_prefix='/users')
+    app.register_blueprint(post_bp, url_prefix='/posts')
+    app.register_blueprint(comment_bp, url_prefix='/comments')
+
+    return app
+
+
+class FallbackDispatcher:
+    """Application ASGI : routes asynchrones si elles existent, sinon application Flask"""
+
+    def __init__(self, async_app, sync_app):
+        from hypercorn.middleware import AsyncioWSGIMiddleware
+        self.async_app = async_app
+        self.sync_app = AsyncioWSGIMiddleware(sync_app)
+        self._urls = async_app.url_map.bind('')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and not self._handles(scope):
+            return await self.sync_app(scope, receive, send)
+        # lifespan (connexion au démarrage) et routes asynchrones
+        return await self.async_app(scope, receive, send)
+
+    def _handles(self, scope):
+        if self._wants_stream(scope):
+            return False
+        try:
+            self._urls.match(scope['path'], method=scope['method'])
+        except HTTPException:
+            return False
+        return True
+
+    @staticmethod
+    def _wants_stream(scope):
+        """Les réponses NDJSON en flux restent servies par l'application Flask"""
+        args = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        if any(value.lower() in ('1', 'true', 't') for value in args.get('stream', [])):
+            return True
+        accept = dict(scope.get('headers', [])).get(b'accept', b'').decode('latin-1')
+        return accept.split(',')[0].split(';')[0].strip() == NDJSON_MIMETYPE
+
+
+def create_async_app(config_class=Config):
+    """Construit l'application ASGI complète (routes asynchrones + application Flask)"""
+    from app import create_app
+    return FallbackDispatcher(create_quart_app(config_class), create_app(config_class))
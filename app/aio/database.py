@@ -0,0 +1,86 @@
+﻿# Accès asynchrone à la base de données (application ASGI)
+import time
+from app.config import Config
+from app.metrics import query_metrics
+from app.plans import plan_capture, with_prefix
+
+
+class AsyncGraph:
+    """Exécute les requêtes nommées (voir app.database.Query) sans bloquer la boucle d'événements
+
+    Avec Neo4j, chaque appel emprunte sa propre session au pool du pilote
+    Bolt asynchrone : les requêtes indépendantes d'une même route peuvent
+    donc s'exécuter en même temps (`asyncio.gather`). Le pool est borné par
+    NEO4J_POOL_MAX_SIZE, comme les requêtes en cours de l'application synchrone.
+
+    Avec le backend mémoire, les requêtes sont exécutées sur le même
+    `MemoryGraph` que l'application Flask, sans entrée/sortie.
+    """
+
+    def __init__(self):
+        self.driver = None
+        self._memory_graph = None
+
+    @property
+    def connected(self):
+        return self.driver is not None or self._memory_graph is not None
+
+    async def connect(self):
+        if Config.DB_BACKEND == 'memory':
+            from app import db
+            db.connect(force=False)
+            self._memory_graph = db.graph
+            return
+
+        from neo4j import AsyncGraphDatabase
+        self.driver = AsyncGraphDatabase.driver(
+            Config.NEO4J_URI,
+            auth=(Config.NEO4J_USER, Config.NEO4J_PASSWORD),
+            max_connection_pool_size=Config.NEO4J_POOL_MAX_SIZE,
+            connection_acquisition_timeout=Config.NEO4J_POOL_ACQUIRE_TIMEOUT,
+            max_connection_lifetime=Config.NEO4J_POOL_MAX_LIFETIME,
+            liveness_check_timeout=Config.NEO4J_POOL_LIVENESS_CHECK
+        )
+        try:
+            await self.driver.verify_connectivity()
+            print("Connected to Neo4j database (async driver)")
+        except Exception as e:
+            print(f"Failed to connect to Neo4j: {e}")
+
+    async def close(self):
+        if self.driver is not None:
+            await self.driver.close()
+            self.driver = None
+        self._memory_graph = None
+
+    async def run(self, query, **params):
+        """Exécute une requête et retourne ses enregistrements (liste de dictionnaires)
+
+        La requête est mesurée sous son nom, comme dans l'application Flask
+        (voir app.metrics).
+        """
+        start = time.perf_counter()
+        data = await self._run(query, params)
+        query_metrics.record(getattr(query, 'name', 'unnamed'), time.perf_counter() - start, len(data), params)
+        return data
+
+    async def _run(self, query, params):
+        if self._memory_graph is not None:
+            return self._memory_graph.run(query, **params).data()
+        if self.driver is None:
+            raise ConnectionError("Base de données indisponible")
+
+        # Plan d'exécution d'une fraction des requêtes (voir app.plans)
+        mode = plan_capture.sample(query) if plan_capture is not None else None
+        async with self.driver.session() as session:
+            if mode == 'EXPLAIN':
+                result = await session.run(with_prefix(query, mode), params)
+                plan_capture.store(query, mode, (await result.consume()).plan)
+            result = await session.run(with_prefix(query, mode) if mode == 'PROFILE' else query, params)
+            data = await result.data()
+            if mode == 'PROFILE':
+                plan_capture.store(query, mode, (await result.consume()).profile)
+            return data
+
+
+graph = AsyncGraph()
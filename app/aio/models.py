@@ -0,0 +1,184 @@
+﻿# Lectures et likes asynchrones
+#
+# Mêmes requêtes que les modèles synchrones (app.models), exécutées avec
+# le pilote asynchrone. Les lectures par ID retournent les modèles
+# habituels ; les listes retournent les lignes projetées par la requête
+# (dictionnaires de la forme de `to_dict()`).
+# Le cache d'entités est partagé avec l'application Flask du même processus.
+import asyncio
+from app.adjacency import friendship_index
+from app.cache import async_entity_version, entity_cache
+from app.engagement import engagement_dict
+from app.models import comment as comment_model
+from app.models import post as post_model
+from app.models import user as user_model
+from app.models.comment import Comment
+from app.models.post import Post
+from app.models.user import User
+from app.status import CREATED, EXISTS, NOT_FOUND, REMOVED
+from app.timeline import timelines
+from app.versions import POSTS, bump, comments_key, post_key
+from .database import graph
+
+
+async def find_entity(kind, entity_id, build, load):
+    """Résout une entité : cache d'entités, puis base (voir app.cache.find_entity)"""
+    version = async_entity_version.get()
+    snapshot = entity_cache.get(kind, entity_id, version)
+    if snapshot is not None:
+        return build(snapshot)
+    generation = entity_cache.generation()
+    entity = await load(entity_id)
+    if entity is not None:
+        entity_cache.set(kind, entity_id, entity.to_dict(), version, generation)
+    return entity
+
+
+def post_from_record(record):
+    post = Post.from_node(record['p'])
+    post.user_id = record.get('user_id')
+    post.liked_by_me = record.get('liked_by_me')
+    return post
+
+
+def comment_from_record(record):
+    comment = Comment.from_node(record['c'])
+    comment.user_id = record.get('user_id')
+    comment.post_id = record.get('post_id')
+    comment.liked_by_me = record.get('liked_by_me')
+    return comment
+
+
+class AsyncUser:
+    """Lectures d'utilisateurs (voir app.models.user)"""
+
+    @staticmethod
+    async def find_by_id(user_id):
+        return await find_entity('user', user_id, User.from_node, AsyncUser._load)
+
+    @staticmethod
+    async def _load(user_id):
+        result = await graph.run(user_model.FIND_BY_ID_QUERY, user_id=user_id)
+        if result:
+            return User.from_node(result[0].get('u'))
+        return None
+
+    @staticmethod
+    async def find_by_ids(user_ids):
+        if not user_ids:
+            return []
+        result = await graph.run(user_model.FIND_BY_IDS_QUERY, user_ids=list(user_ids))
+        users = {user.id: user for user in (User.from_node(record['u']) for record in result)}
+        return [users[user_id] for user_id in user_ids if user_id in users]
+
+    @staticmethod
+    async def friendship_status(user_id, friend_id):
+        """Vérifie une amitié (index d'adjacence, sinon une requête) ; voir app.status"""
+        are_friends = friendship_index.are_friends(user_id, friend_id)
+        if are_friends is not None:
+            return EXISTS if are_friends else NOT_FOUND
+        result = await graph.run(user_model.FRIENDSHIP_STATUS_QUERY, user_id=user_id, friend_id=friend_id)
+        return result[0].get('status')
+
+    @staticmethod
+    async def get_mutual_friends(user_id, other_id):
+        mutual_ids = friendship_index.mutual_friend_ids(user_id, other_id)
+        if mutual_ids is not None:
+            return await AsyncUser.find_by_ids(mutual_ids)
+        result = await graph.run(user_model.MUTUAL_FRIENDS_QUERY, user_id=user_id, other_id=other_id)
+        return [User.from_node(record.get('mutual')) for record in result]
+
+
+class AsyncPost:
+    """Lectures et likes de posts (voir app.models.post)"""
+
+    @staticmethod
+    async def find_by_id(post_id):
+        return await find_entity('post', post_id, Post.from_node, AsyncPost._load)
+
+    @staticmethod
+    async def _load(post_id):
+        result = await graph.run(post_model.FIND_BY_ID_QUERY, post_id=post_id)
+        if result:
+            return post_from_record(result[0])
+        return None
+
+    @staticmethod
+    async def find_all(limit=None, after=None, viewer_id=None):
+        query, params = post_model.find_all_query(limit=limit, after=after, viewer_id=viewer_id)
+        return [record['post'] for record in await graph.run(query, **params)]
+
+    @staticmethod
+    async def find_by_user(user_id, viewer_id=None):
+        query, params = post_model.find_by_user_query(user_id, viewer_id=viewer_id)
+        return [record['post'] for record in await graph.run(query, **params)]
+
+    @staticmethod
+    async def find_feed(user_id, limit=None, after=None, viewer_id=None):
+        """Page du fil d'actualité
+
+        Les fils matérialisés (TIMELINE_ENABLED) sont lus par le code
+        synchrone de `Post.find_timeline`, dans un thread à part.
+        """
+        if timelines is not None:
+            posts = await asyncio.to_thread(Post.find_timeline, user_id, limit,
+                                            after=after, viewer_id=viewer_id)
+            return [engagement_dict(post, viewer_id=viewer_id) for post in posts]
+        query, params = post_model.feed_query(user_id, limit=limit, after=after, viewer_id=viewer_id)
+        return [record['post'] for record in await graph.run(query, **params)]
+
+    @staticmethod
+    async def add_like(post_id, user_id):
+        result = await graph.run(post_model.ADD_LIKE_QUERY, user_id=user_id, post_id=post_id)
+        entity_cache.invalidate('post', post_id)
+        status = result[0].get('status')
+        if status == CREATED:
+            bump(POSTS, post_key(post_id))
+        return status
+
+    @staticmethod
+    async def remove_like(post_id, user_id):
+        result = await graph.run(post_model.REMOVE_LIKE_QUERY, user_id=user_id, post_id=post_id)
+        entity_cache.invalidate('post', post_id)
+        status = result[0].get('status')
+        if status == REMOVED:
+            bump(POSTS, post_key(post_id))
+        return status
+
+
+class AsyncComment:
+    """Lectures et likes de commentaires (voir app.models.comment)"""
+
+    @staticmethod
+    async def find_by_id(comment_id):
+        return await find_entity('comment', comment_id, Comment.from_node, AsyncComment._load)
+
+    @staticmethod
+    async def _load(comment_id):
+        result = await graph.run(comment_model.FIND_BY_ID_QUERY, comment_id=comment_id)
+        if result:
+            return comment_from_record(result[0])
+        return None
+
+    @staticmethod
+    async def find_by_post(post_id, viewer_id=None):
+        query, params = comment_model.find_by_post_query(post_id, viewer_id=viewer_id)
+        return [record['comment'] for record in await graph.run(query, **params)]
+
+    @staticmethod
+    async def add_like(comment_id, user_id):
+        result = await graph.run(comment_model.ADD_LIKE_QUERY, user_id=user_id, comment_id=comment_id)
+        entity_cache.invalidate('comment', comment_id)
+        status = result[0].get('status')
+        if status == CREATED:
+            bump(comments_key(result[0].get('post_id')))
+        return status
+
+    @staticmethod
+    async def remove_like(comment_id, user_id):
+        result = await graph.run(comment_model.REMOVE_LIKE_QUERY, user_id=user_id, comment_id=comment_id)
+        entity_cache.invalidate('comment', comment_id)
+        status = result[0].get('status')
+        if status == REMOVED:
+            bump(comments_key(result[0].get('post_id')))
+        return status
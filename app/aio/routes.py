@@ -0,0 +1,322 @@
+﻿# Routes de l'application asynchrone
+#
+# Mêmes URL et mêmes réponses que les routes Flask (app.routes) ; les
+# requêtes indépendantes d'une route sont lancées ensemble (asyncio.gather).
+import asyncio
+from quart import Blueprint, current_app, jsonify, request
+from app.pagination import get_page_params, split_page
+from app.engagement import get_engagement_params, engagement_row
+from app.schemas import validate_body, LIKE
+from app.conditional import async_conditional
+from app.versions import POSTS, post_key, comments_key
+from app.status import USER_MISSING, TARGET_MISSING, CREATED, REMOVED, EXISTS
+from .models import AsyncUser, AsyncPost, AsyncComment
+
+user_bp = Blueprint('async_user_bp', __name__)
+post_bp = Blueprint('async_post_bp', __name__)
+comment_bp = Blueprint('async_comment_bp', __name__)
+
+
+def error(message, code):
+    return jsonify({
+        'status': 'error',
+        'message': message
+    }), code
+
+
+# Utilisateurs
+
+@user_bp.route('/<user_id>', methods=['GET'])
+async def get_user(user_id):
+    """Route pour récupérer un utilisateur par son ID"""
+    try:
+        user = await AsyncUser.find_by_id(user_id)
+        if not user:
+            return error(f'Utilisateur avec l\'ID {user_id} non trouvé', 404)
+
+        return jsonify({
+            'status': 'success',
+            'user': user.to_dict()
+        }), 200
+    except Exception as e:
+        return error(str(e), 500)
+
+@user_bp.route('/<user_id>/feed', methods=['GET'])
+async def get_feed(user_id):
+    """Route pour récupérer le fil d'actualité, paginé par curseur"""
+    try:
+        try:
+            limit, after = get_page_params(args=request.args, config=current_app.config)
+            include, viewer_id = get_engagement_params(('likes_count', 'comment_count'), args=request.args)
+        except ValueError as e:
+            return error(str(e), 400)
+
+        # Vérifier l'utilisateur et lire la page en même temps
+        # (une page de plus pour savoir s'il reste des résultats)
+        user, posts = await asyncio.gather(
+            AsyncUser.find_by_id(user_id),
+            AsyncPost.find_feed(user_id, limit + 1, after=after, viewer_id=viewer_id)
+        )
+        if not user:
+            return error(f'Utilisateur avec l\'ID {user_id} non trouvé', 404)
+
+        posts, next_cursor = split_page(posts, limit)
+        return jsonify({
+            'status': 'success',
+            'posts': [engagement_row(post, include) for post in posts],
+            'next_cursor': next_cursor
+        }), 200
+    except Exception as e:
+        return error(str(e), 500)
+
+@user_bp.route('/<user_id>/friends/<friend_id>', methods=['GET'])
+async def check_friendship(user_id, friend_id):
+    """Route pour vérifier si deux utilisateurs sont amis"""
+    try:
+        status = await AsyncUser.friendship_status(user_id, friend_id)
+
+        if status == USER_MISSING:
+            return error(f'Utilisateur avec l\'ID {user_id} non trouvé', 404)
+        if status == TARGET_MISSING:
+            return error(f'Ami avec l\'ID {friend_id} non trouvé', 404)
+
+        return jsonify({
+            'status': 'success',
+            'are_friends': status == EXISTS
+        }), 200
+    except Exception as e:
+        return error(str(e), 500)
+
+@user_bp.route('/<user_id>/mutual-friends/<other_id>', methods=['GET'])
+async def get_mutual_friends(user_id, other_id):
+    """Route pour récupérer les amis en commun"""
+    try:
+        # Les deux vérifications et la lecture des amis en commun sont indépendantes
+        user, other, mutual_friends = await asyncio.gather(
+            AsyncUser.find_by_id(user_id),
+            AsyncUser.find_by_id(other_id),
+            AsyncUser.get_mutual_friends(user_id, other_id)
+        )
+
+        if not user:
+            return error(f'Utilisateur avec l\'ID {user_id} non trouvé', 404)
+        if not other:
+            return error(f'Utilisateur avec l\'ID {other_id} non trouvé', 404)
+
+        return jsonify({
+            'status': 'success',
+            'mutual_friends': [friend.to_dict() for friend in mutual_friends]
+        }), 200
+    except Exception as e:
+        return error(str(e), 500)
+
+
+# Posts
+
+@post_bp.route('', methods=['GET'])
+@async_conditional(lambda: [POSTS])
+async def get_posts():
+    """Route pour récupérer les posts, paginés par curseur"""
+    try:
+        try:
+            limit, after = get_page_params(args=request.args, config=current_app.config)
+            include, viewer_id = get_engagement_params(('likes_count', 'comment_count'), args=request.args)
+        except ValueError as e:
+            return error(str(e), 400)
+
+        posts = await AsyncPost.find_all(limit=limit + 1, after=after, viewer_id=viewer_id)
+        posts, next_cursor = split_page(posts, limit)
+
+        return jsonify({
+            'status': 'success',
+            'posts': [engagement_row(post, include) for post in posts],
+            'next_cursor': next_cursor
+        }), 200
+    except Exception as e:
+        return error(str(e), 500)
+
+@post_bp.route('/<post_id>', methods=['GET'])
+@async_conditional(lambda post_id: [post_key(post_id)])
+async def get_post(post_id):
+    """Route pour récupérer un post par son ID"""
+    try:
+        post = await AsyncPost.find_by_id(post_id)
+        if not post:
+            return error(f'Post avec l\'ID {post_id} non trouvé', 404)
+
+        post_dict = post.to_dict()
+        post_dict['likes_count'] = post.get_likes_count()
+
+        return jsonify({
+            'status': 'success',
+            'post': post_dict
+        }), 200
+    except Exception as e:
+        return error(str(e), 500)
+
+@post_bp.route('/<post_id>/like', methods=['POST'])
+async def like_post(post_id):
+    """Route pour ajouter un like à un post"""
+    try:
+        try:
+            data = validate_body(LIKE, await request.get_json(silent=True))
+        except ValueError as e:
+            return error(str(e), 400)
+
+        user_id = data['user_id']
+        status = await AsyncPost.add_like(post_id, user_id)
+
+        if status == USER_MISSING:
+            return error(f'Utilisateur avec l\'ID {user_id} non trouvé', 404)
+        if status == TARGET_MISSING:
+            return error(f'Post avec l\'ID {post_id} non trouvé', 404)
+
+        return jsonify({
+            'status': 'success',
+            'message': f'Like ajouté au post {post_id} par l\'utilisateur {user_id}',
+            'created': status == CREATED
+        }), 201 if status == CREATED else 200
+    except Exception as e:
+        return error(str(e), 500)
+
+@post_bp.route('/<post_id>/like', methods=['DELETE'])
+async def unlike_post(post_id):
+    """Route pour retirer un like d'un post"""
+    try:
+        try:
+            data = validate_body(LIKE, await request.get_json(silent=True))
+        except ValueError as e:
+            return error(str(e), 400)
+
+        user_id = data['user_id']
+        status = await AsyncPost.remove_like(post_id, user_id)
+
+        if status == USER_MISSING:
+            return error(f'Utilisateur avec l\'ID {user_id} non trouvé', 404)
+        if status == TARGET_MISSING:
+            return error(f'Post avec l\'ID {post_id} non trouvé', 404)
+
+        return jsonify({
+            'status': 'success',
+            'message': f'Like retiré du post {post_id} par l\'utilisateur {user_id}',
+            'removed': status == REMOVED
+        }), 200
+    except Exception as e:
+        return error(str(e), 500)
+
+@post_bp.route('/users/<user_id>/posts', methods=['GET'])
+async def get_user_posts(user_id):
+    """Route pour récupérer les posts d'un utilisateur"""
+    try:
+        try:
+            include, viewer_id = get_engagement_params(('likes_count', 'comment_count'), args=request.args)
+        except ValueError as e:
+            return error(str(e), 400)
+
+        # Vérifier l'utilisateur et lire ses posts en même temps
+        user, posts = await asyncio.gather(
+            AsyncUser.find_by_id(user_id),
+            AsyncPost.find_by_user(user_id, viewer_id=viewer_id)
+        )
+        if not user:
+            return error(f'Utilisateur avec l\'ID {user_id} non trouvé', 404)
+
+        return jsonify({
+            'status': 'success',
+            'posts': [engagement_row(post, include) for post in posts]
+        }), 200
+    except Exception as e:
+        return error(str(e), 500)
+
+
+# Commentaires
+
+@comment_bp.route('/<comment_id>', methods=['GET'])
+async def get_comment(comment_id):
+    """Route pour récupérer un commentaire par son ID"""
+    try:
+        comment = await AsyncComment.find_by_id(comment_id)
+        if not comment:
+            return error(f'Commentaire avec l\'ID {comment_id} non trouvé', 404)
+
+        return jsonify({
+            'status': 'success',
+            'comment': comment.to_dict()
+        }), 200
+    except Exception as e:
+        return error(str(e), 500)
+
+@comment_bp.route('/<comment_id>/like', methods=['POST'])
+async def like_comment(comment_id):
+    """Route pour ajouter un like à un commentaire"""
+    try:
+        try:
+            data = validate_body(LIKE, await request.get_json(silent=True))
+        except ValueError as e:
+            return error(str(e), 400)
+
+        user_id = data['user_id']
+        status = await AsyncComment.add_like(comment_id, user_id)
+
+        if status == USER_MISSING:
+            return error(f'Utilisateur avec l\'ID {user_id} non trouvé', 404)
+        if status == TARGET_MISSING:
+            return error(f'Commentaire avec l\'ID {comment_id} non trouvé', 404)
+
+        return jsonify({
+            'status': 'success',
+            'message': f'Like ajouté au commentaire {comment_id} par l\'utilisateur {user_id}',
+            'created': status == CREATED
+        }), 201 if status == CREATED else 200
+    except Exception as e:
+        return error(str(e), 500)
+
+@comment_bp.route('/<comment_id>/like', methods=['DELETE'])
+async def unlike_comment(comment_id):
+    """Route pour retirer un like d'un commentaire"""
+    try:
+        try:
+            data = validate_body(LIKE, await request.get_json(silent=True))
+        except ValueError as e:
+            return error(str(e), 400)
+
+        user_id = data['user_id']
+        status = await AsyncComment.remove_like(comment_id, user_id)
+
+        if status == USER_MISSING:
+            return error(f'Utilisateur avec l\'ID {user_id} non trouvé', 404)
+        if status == TARGET_MISSING:
+            return error(f'Commentaire avec l\'ID {comment_id} non trouvé', 404)
+
+        return jsonify({
+            'status': 'success',
+            'message': f'Like retiré du commentaire {comment_id} par l\'utilisateur {user_id}',
+            'removed': status == REMOVED
+        }), 200
+    except Exception as e:
+        return error(str(e), 500)
+
+@comment_bp.route('/posts/<post_id>/comments', methods=['GET'])
+@async_conditional(lambda post_id: [comments_key(post_id)])
+async def get_post_comments(post_id):
+    """Route pour récupérer les commentaires d'un post"""
+    try:
+        try:
+            include, viewer_id = get_engagement_params(('likes_count',), args=request.args)
+        except ValueError as e:
+            return error(str(e), 400)
+
+        # Vérifier le post et lire ses commentaires en même temps
+        post, comments = await asyncio.gather(
+            AsyncPost.find_by_id(post_id),
+            AsyncComment.find_by_post(post_id, viewer_id=viewer_id)
+        )
+        if not post:
+            return error(f'Post avec l\'ID {post_id} non trouvé', 404)
+
+        return jsonify({
+            'status': 'success',
+            'comments': [engagement_row(comment, include) for comment in comments]
+        }), 200
+    except Exception as e:
+        return error(str(e), 500)
@@ -0,0 +1 @@
+﻿# Backends de stockage alternatifs à Neo4j (voir Config.DB_BACKEND)
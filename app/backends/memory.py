@@ -0,0 +1,796 @@
+﻿# Backend de stockage en mémoire
+#
+# Remplace le `Graph` py2neo pour les tests, les benchmarks et les petits
+# déploiements : les nœuds sont indexés par ID et les relations stockées
+# dans des listes d'adjacence (avant/arrière) par type. Le Cypher n'est pas
+# interprété : chaque requête nommée (voir app.database.Query) est associée
+# à une fonction Python équivalente.
+#
+# Les résultats sont ceux de Neo4j, requête par requête (vérifié par
+# tests/test_memory_backend.py), aux différences connues près :
+# - pas de transaction : une requête est atomique vis-à-vis des autres
+#   (verrou global) mais une erreur en cours de route n'annule pas les
+#   écritures déjà faites ;
+# - les lignes sans ORDER BY et les listes collectées sortent dans un ordre
+#   quelconque, qui peut différer de celui de Neo4j ;
+# - les recommandations qui désignent un utilisateur supprimé restent dans
+#   la table mais sont écartées à la lecture (Neo4j supprime la relation) ;
+# - les requêtes de schéma ne créent ni index ni contrainte.
+from bisect import bisect_left, insort
+from collections import defaultdict
+import heapq
+from itertools import islice
+import threading
+from app.status import (USER_MISSING, TARGET_MISSING, CREATED, ALREADY_EXISTED,
+                        REMOVED, EXISTS, NOT_FOUND)
+
+LABELS = ("User", "Post", "Comment")
+RELATIONSHIPS = ("CREATED", "LIKES", "HAS_COMMENT", "FRIENDS_WITH")
+
+# Nom de requête -> fonction(graph, **paramètres) retournant une liste de records
+HANDLERS = {}
+
+
+def handles(name):
+    """Enregistre l'implémentation en mémoire d'une requête nommée"""
+    def decorator(func):
+        HANDLERS[name] = func
+        return func
+    return decorator
+
+
+class MemoryCursor:
+    """Résultat d'une requête, avec la même interface que le curseur py2neo"""
+
+    def __init__(self, records):
+        self._records = records
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def data(self):
+        return list(self._records)
+
+
+class MemoryGraph:
+    """Graphe en mémoire compatible avec l'usage que les modèles font de py2neo"""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        # Label -> {id: propriétés}
+        self.nodes = {label: {} for label in LABELS}
+        # Label -> liste triée de (created_at, id), pour les pages par curseur
+        self.order = {label: [] for label in LABELS}
+        # Type -> {id source: {ids cibles}} et {id cible: {ids sources}}
+        self.out = {rel: defaultdict(set) for rel in RELATIONSHIPS}
+        self.inc = {rel: defaultdict(set) for rel in RELATIONSHIPS}
+        # Table de recommandations : {id source: {id candidat: score}}
+        self.recommended = defaultdict(dict)
+
+    def run(self, query, **params):
+        """Exécute une requête nommée"""
+        name = getattr(query, 'name', None)
+        handler = HANDLERS.get(name)
+        if handler is None:
+            raise NotImplementedError(f"Requête non supportée par le backend mémoire : {name}")
+        with self.lock:
+            return MemoryCursor(handler(self, **params))
+
+    def stream(self, query, **params):
+        """Parcourt le résultat d'une requête ligne à ligne (voir ConcurrencyLimiter.stream)
+
+        Le résultat est calculé en entier sous le verrou : les données sont
+        déjà en mémoire, seules les lignes sérialisées sont produites au fil
+        du parcours.
+        """
+        yield from self.run(query, **params)
+
+    # Nœuds
+
+    def get(self, label, node_id):
+        props = self.nodes[label].get(node_id)
+        return dict(props) if props is not None else None
+
+    def exists(self, label, node_id):
+        return node_id in self.nodes[label]
+
+    def put(self, label, props):
+        old = self.nodes[label].get(props['id'])
+        if old is not None:
+            self._unindex(label, old)
+        self.nodes[label][props['id']] = props
+        insort(self.order[label], (props.get('created_at') or 0, props['id']))
+
+    def remove(self, label, node_id):
+        """Supprime un nœud et toutes ses relations"""
+        props = self.nodes[label].pop(node_id, None)
+        if props is None:
+            return False
+        self._unindex(label, props)
+        self.recommended.pop(node_id, None)
+        for rel in RELATIONSHIPS:
+            for target in self.out[rel].pop(node_id, ()):
+                self.inc[rel][target].discard(node_id)
+            for source in self.inc[rel].pop(node_id, ()):
+                self.out[rel][source].discard(node_id)
+        return True
+
+    def _unindex(self, label, props):
+        order = self.order[label]
+        position = bisect_left(order, (props.get('created_at') or 0, props['id']))
+        if position < len(order) and order[position][1] == props['id']:
+            del order[position]
+
+    def iter_desc(self, label, after_created_at=None, after_id=None):
+        """Parcourt les nœuds du plus récent au plus ancien, après une position"""
+        order = self.order[label]
+        if after_created_at is None:
+            position = len(order)
+        else:
+            position = bisect_left(order, (after_created_at, after_id))
+        for index in range(position - 1, -1, -1):
+            yield self.nodes[label][order[index][1]]
+
+    # Relations
+
+    def link(self, rel, source, target):
+        """Crée la relation si elle n'existe pas (équivalent de MERGE)
+
+        Retourne True si la relation a été créée.
+        """
+        if target in self.out[rel][source]:
+            return False
+        self.out[rel][source].add(target)
+        self.inc[rel][target].add(source)
+        return True
+
+    def unlink(self, rel, source, target):
+        self.out[rel].get(source, set()).discard(target)
+        self.inc[rel].get(target, set()).discard(source)
+
+    def targets(self, rel, source):
+        return self.out[rel].get(source, set())
+
+    def sources(self, rel, target):
+        return self.inc[rel].get(target, set())
+
+    def neighbours(self, rel, node_id):
+        """Voisins sans tenir compte du sens de la relation"""
+        return self.targets(rel, node_id) | self.sources(rel, node_id)
+
+    def author(self, node_id):
+        """ID de l'utilisateur qui a créé un post ou un commentaire"""
+        return next(iter(self.sources("CREATED", node_id)), None)
+
+    def post_of(self, comment_id):
+        return next(iter(self.sources("HAS_COMMENT", comment_id)), None)
+
+    # Compteurs dénormalisés (voir app.counters)
+
+    def bump(self, label, node_id, counter, delta):
+        """Ajoute `delta` à un compteur d'un nœud, sans descendre sous zéro"""
+        props = self.nodes[label].get(node_id)
+        if props is not None:
+            props[counter] = max((props.get(counter) or 0) + delta, 0)
+
+
+def _page(graph, label, limit, after_created_at, after_id, build):
+    """Page de records du plus récent au plus ancien
+
+    `build(props)` retourne le record d'un nœud, ou None pour l'ignorer.
+    """
+    records = []
+    if limit is not None and limit <= 0:
+        return records
+    for props in graph.iter_desc(label, after_created_at, after_id):
+        record = build(props)
+        if record is None:
+            continue
+        records.append(record)
+        if limit is not None and len(records) >= limit:
+            break
+    return records
+
+
+def _endpoints_status(graph, source_label, source_id, target_label, target_id):
+    """Statut d'erreur si l'une des extrémités d'une relation manque, sinon None"""
+    if not graph.exists(source_label, source_id):
+        return USER_MISSING
+    if not graph.exists(target_label, target_id):
+        return TARGET_MISSING
+    return None
+
+
+def _add_like(graph, user_id, label, target_id):
+    status = _endpoints_status(graph, "User", user_id, label, target_id)
+    if status:
+        return status
+    if not graph.link("LIKES", user_id, target_id):
+        return ALREADY_EXISTED
+    graph.bump(label, target_id, 'like_count', 1)
+    return CREATED
+
+
+def _remove_like(graph, user_id, label, target_id):
+    status = _endpoints_status(graph, "User", user_id, label, target_id)
+    if status:
+        return status
+    if target_id not in graph.targets("LIKES", user_id):
+        return NOT_FOUND
+    graph.unlink("LIKES", user_id, target_id)
+    graph.bump(label, target_id, 'like_count', -1)
+    return REMOVED
+
+
+def _with_liked_by(graph, records, key, viewer_id):
+    """Ajoute `liked_by_me` aux records quand un lecteur est précisé"""
+    if viewer_id is not None:
+        liked = graph.targets("LIKES", viewer_id)
+        for record in records:
+            record['liked_by_me'] = record[key]['id'] in liked
+    return records
+
+
+def _with_liked_by_row(graph, rows, viewer_id):
+    """Comme `_with_liked_by`, pour les lignes projetées (`liked_by_me` dans la ligne)"""
+    if viewer_id is not None:
+        liked = graph.targets("LIKES", viewer_id)
+        for row in rows:
+            row['liked_by_me'] = row['id'] in liked
+    return rows
+
+
+def _user_row(props):
+    """Projection `USER_PROJECTION` d'un utilisateur"""
+    return {'id': props['id'], 'name': props.get('name'), 'email': props.get('email'),
+            'created_at': props.get('created_at'), 'friend_count': props.get('friend_count') or 0}
+
+
+def _post_row(props, author):
+    """Projection `post_projection` d'un post"""
+    return {'id': props['id'], 'title': props.get('title'), 'content': props.get('content'),
+            'created_at': props.get('created_at'), 'user_id': author,
+            'like_count': props.get('like_count') or 0,
+            'comment_count': props.get('comment_count') or 0}
+
+
+def _comment_row(graph, props, post_id=None):
+    """Projection `comment_projection` d'un commentaire (None sans auteur ou post)"""
+    record = _comment_record(graph, props, post_id)
+    if record is None:
+        return None
+    return {'id': props['id'], 'content': props.get('content'), 'created_at': props.get('created_at'),
+            'user_id': record['user_id'], 'post_id': record['post_id'],
+            'like_count': props.get('like_count') or 0}
+
+
+def _by_created_at_desc(nodes):
+    return sorted(nodes, key=lambda props: (props.get('created_at') or 0, props['id']), reverse=True)
+
+
+# Schéma et maintenance : les index n'ont pas d'objet en mémoire
+
+@handles("schema.show_constraints")
+@handles("schema.show_indexes")
+def _schema_show(graph):
+    return []
+
+
+@handles("schema.create")
+def _schema_create(graph):
+    return []
+
+
+@handles("schema.backfill_post_authors")
+def _schema_backfill_post_authors(graph, batch_size):
+    updated = 0
+    for props in graph.nodes["Post"].values():
+        if updated == batch_size:
+            break
+        author = graph.author(props['id'])
+        if props.get('author_id') is None and author is not None:
+            props['author_id'] = author
+            updated += 1
+    return [{'updated': updated}]
+
+
+@handles("db.ping")
+def _db_ping(graph):
+    return [{'ok': 1}]
+
+
+@handles("db.reset")
+def _db_reset(graph):
+    graph.clear()
+    return []
+
+
+@handles("db.reset_batch")
+def _db_reset_batch(graph, batch_size):
+    deleted = 0
+    for label in LABELS:
+        for node_id in list(graph.nodes[label])[:batch_size - deleted]:
+            graph.remove(label, node_id)
+            deleted += 1
+    return [{'deleted': deleted}]
+
+
+# Utilisateurs
+
+@handles("user.find_by_id")
+def _user_find_by_id(graph, user_id):
+    props = graph.get("User", user_id)
+    return [{'u': props}] if props else []
+
+
+@handles("user.find_by_ids")
+def _user_find_by_ids(graph, user_ids):
+    return [{'u': graph.get("User", user_id)} for user_id in user_ids if graph.exists("User", user_id)]
+
+
+@handles("friendship_index.users")
+def _friendship_index_users(graph):
+    return [{'id': user_id} for user_id in graph.nodes["User"]]
+
+
+@handles("user.find_all")
+def _user_find_all(graph, limit=None, after_created_at=None, after_id=None):
+    return _page(graph, "User", limit, after_created_at, after_id,
+                 lambda props: {'user': _user_row(props)})
+
+
+@handles("user.save")
+def _user_save(graph, user_id, name, email, created_at):
+    props = graph.get("User", user_id)
+    changed = props is not None and (props.get('name'), props.get('email')) != (name, email)
+    props = props or {'id': user_id, 'created_at': created_at, 'friend_count': 0}
+    props.update(name=name, email=email)
+    graph.put("User", props)
+    return [{'u': dict(props), 'changed': changed}]
+
+
+@handles("user.bulk_create")
+def _user_bulk_create(graph, rows):
+    records = []
+    for row in rows:
+        props = graph.get("User", row['id']) or {'id': row['id'], 'created_at': row['created_at'],
+                                                 'friend_count': 0}
+        props.update(name=row['name'], email=row['email'])
+        graph.put("User", props)
+        records.append({'key': row['key']})
+    return records
+
+
+@handles("user.bulk_add_friends")
+def _user_bulk_add_friends(graph, rows):
+    records = []
+    for row in rows:
+        if graph.exists("User", row['user_id']) and graph.exists("User", row['friend_id']):
+            record = _friendship_record(graph, None, row['user_id'], row['friend_id'])
+            records.append({'key': row['key'], 'user_id': row['user_id'], 'friend_id': row['friend_id'],
+                            'created': _add_friendship(graph, row['user_id'], row['friend_id']),
+                            'user_friend_ids': record['user_friend_ids'],
+                            'friend_friend_ids': record['friend_friend_ids']})
+    return records
+
+
+@handles("user.delete")
+def _user_delete(graph, user_id):
+    if not graph.exists("User", user_id):
+        return []
+    friend_ids = list(graph.neighbours("FRIENDS_WITH", user_id))
+    liked = list(graph.targets("LIKES", user_id))
+    for friend_id in friend_ids:
+        graph.bump("User", friend_id, 'friend_count', -1)
+    post_ids = [node_id for node_id in liked if graph.exists("Post", node_id)]
+    comment_ids = [node_id for node_id in liked if graph.exists("Comment", node_id)]
+    for node_id in post_ids:
+        graph.bump("Post", node_id, 'like_count', -1)
+    for node_id in comment_ids:
+        graph.bump("Comment", node_id, 'like_count', -1)
+    graph.remove("User", user_id)
+    return [{'friend_ids': friend_ids, 'post_ids': post_ids, 'comment_ids': comment_ids}]
+
+
+def _add_friendship(graph, user_id, friend_id):
+    """Crée l'amitié si elle n'existe dans aucun sens ; retourne True si créée.
+    Comme avec Neo4j, la relation va du plus petit id vers le plus grand."""
+    if friend_id in graph.neighbours("FRIENDS_WITH", user_id):
+        return False
+    graph.link("FRIENDS_WITH", min(user_id, friend_id), max(user_id, friend_id))
+    graph.bump("User", user_id, 'friend_count', 1)
+    graph.bump("User", friend_id, 'friend_count', 1)
+    return True
+
+
+def _friendship_record(graph, status, user_id, friend_id):
+    """Statut d'une mutation d'amitié, avec les amis de chacun avant le changement"""
+    return {'status': status,
+            'user_friend_ids': list(graph.neighbours("FRIENDS_WITH", user_id)),
+            'friend_friend_ids': list(graph.neighbours("FRIENDS_WITH", friend_id))}
+
+
+@handles("user.create_friendship")
+def _user_create_friendship(graph, user_id, friend_id):
+    status = _endpoints_status(graph, "User", user_id, "User", friend_id)
+    if status:
+        return [{'status': status, 'user_friend_ids': [], 'friend_friend_ids': []}]
+    if friend_id in graph.neighbours("FRIENDS_WITH", user_id):
+        return [_friendship_record(graph, ALREADY_EXISTED, user_id, friend_id)]
+    record = _friendship_record(graph, CREATED, user_id, friend_id)
+    _add_friendship(graph, user_id, friend_id)
+    return [record]
+
+
+@handles("user.delete_friendship")
+def _user_delete_friendship(graph, user_id, friend_id):
+    status = _endpoints_status(graph, "User", user_id, "User", friend_id)
+    if status:
+        return [{'status': status, 'user_friend_ids': [], 'friend_friend_ids': []}]
+    if friend_id not in graph.neighbours("FRIENDS_WITH", user_id):
+        return [_friendship_record(graph, NOT_FOUND, user_id, friend_id)]
+    record = _friendship_record(graph, REMOVED, user_id, friend_id)
+    graph.unlink("FRIENDS_WITH", user_id, friend_id)
+    graph.unlink("FRIENDS_WITH", friend_id, user_id)
+    graph.bump("User", user_id, 'friend_count', -1)
+    graph.bump("User", friend_id, 'friend_count', -1)
+    return [record]
+
+
+@handles("user.friendship_status")
+def _user_friendship_status(graph, user_id, friend_id):
+    status = _endpoints_status(graph, "User", user_id, "User", friend_id)
+    if not status:
+        status = EXISTS if friend_id in graph.neighbours("FRIENDS_WITH", user_id) else NOT_FOUND
+    return [{'status': status}]
+
+
+@handles("user.get_friends")
+def _user_get_friends(graph, user_id):
+    return [{'friend': graph.get("User", friend_id)}
+            for friend_id in graph.neighbours("FRIENDS_WITH", user_id)]
+
+
+@handles("user.friend_ids")
+def _user_friend_ids(graph, user_id):
+    return [{'id': friend_id} for friend_id in graph.neighbours("FRIENDS_WITH", user_id)]
+
+
+@handles("user.celebrity_friend_ids")
+def _user_celebrity_friend_ids(graph, user_id, threshold):
+    return [{'id': friend_id} for friend_id in graph.neighbours("FRIENDS_WITH", user_id)
+            if (graph.nodes["User"][friend_id].get('friend_count') or 0) > threshold]
+
+
+@handles("user.recommendations")
+def _user_recommendations(graph, user_id, limit):
+    friends = graph.neighbours("FRIENDS_WITH", user_id)
+    candidates = [(score, candidate_id) for candidate_id, score in graph.recommended.get(user_id, {}).items()
+                  if candidate_id not in friends and graph.exists("User", candidate_id)]
+    return [{'candidate': graph.get("User", candidate_id), 'mutual_count': score}
+            for score, candidate_id in sorted(candidates, reverse=True)[:limit]]
+
+
+@handles("user.recommendations_apply")
+def _user_recommendations_apply(graph, rows):
+    for row in rows:
+        source, target = row['source'], row['target']
+        if not (graph.exists("User", source) and graph.exists("User", target)):
+            continue
+        scores = graph.recommended[source]
+        if target in scores:
+            scores[target] += row['delta']
+        else:
+            scores[target] = len(graph.neighbours("FRIENDS_WITH", source) & graph.neighbours("FRIENDS_WITH", target))
+        if scores[target] <= 0 or target in graph.neighbours("FRIENDS_WITH", source):
+            del scores[target]
+    return []
+
+
+@handles("user.recommendations_trim")
+def _user_recommendations_trim(graph, user_ids, top_k):
+    for user_id in user_ids:
+        scores = graph.recommended.get(user_id)
+        if scores and len(scores) > top_k:
+            # Les candidats supprimés ne comptent pas dans les top_k gardés
+            live = ((target, score) for target, score in scores.items() if graph.exists("User", target))
+            kept = heapq.nlargest(top_k, live, key=lambda item: item[1])
+            graph.recommended[user_id] = dict(kept)
+    return []
+
+
+@handles("user.recommendations_of")
+def _user_recommendations_of(graph, user_ids):
+    return [{'source': user_id, 'target': target}
+            for user_id in user_ids for target in graph.recommended.get(user_id, {})
+            if graph.exists("User", target)]
+
+
+@handles("recommendations.edges")
+def _recommendations_edges(graph):
+    return [{'user_id': user_id, 'friend_id': friend_id}
+            for user_id, friend_ids in graph.out["FRIENDS_WITH"].items() for friend_id in friend_ids]
+
+
+@handles("recommendations.replace")
+def _recommendations_replace(graph, rows):
+    for row in rows:
+        if graph.exists("User", row['user_id']):
+            graph.recommended[row['user_id']] = {
+                candidate['id']: candidate['score'] for candidate in row['candidates']
+                if graph.exists("User", candidate['id'])}
+    return []
+
+
+@handles("user.mutual_friends")
+def _user_mutual_friends(graph, user_id, other_id):
+    mutual = graph.neighbours("FRIENDS_WITH", user_id) & graph.neighbours("FRIENDS_WITH", other_id)
+    return [{'mutual': graph.get("User", mutual_id)} for mutual_id in mutual]
+
+
+# Posts
+
+@handles("post.save")
+def _post_save(graph, user_id, post_id, title, content, created_at):
+    if not graph.exists("User", user_id):
+        return []
+    created = not graph.exists("Post", post_id)
+    props = graph.get("Post", post_id) or {'id': post_id, 'created_at': created_at,
+                                              'like_count': 0, 'comment_count': 0, 'author_id': user_id}
+    props.update(title=title, content=content)
+    graph.put("Post", props)
+    graph.link("CREATED", user_id, post_id)
+    return [{'p': dict(props), 'created': created}]
+
+
+@handles("post.find_by_id")
+def _post_find_by_id(graph, post_id):
+    props = graph.get("Post", post_id)
+    return [{'p': props, 'user_id': graph.author(post_id)}] if props else []
+
+
+@handles("post.find_all")
+def _post_find_all(graph, limit=None, after_created_at=None, after_id=None, viewer_id=None):
+    def build(props):
+        author = graph.author(props['id'])
+        return _post_row(props, author) if author else None
+    rows = _page(graph, "Post", limit, after_created_at, after_id, build)
+    return [{'post': row} for row in _with_liked_by_row(graph, rows, viewer_id)]
+
+
+@handles("post.find_by_user")
+def _post_find_by_user(graph, user_id, viewer_id=None):
+    posts = [graph.nodes["Post"][node_id] for node_id in graph.targets("CREATED", user_id)
+             if node_id in graph.nodes["Post"]]
+    rows = [_post_row(props, user_id) for props in _by_created_at_desc(posts)]
+    return [{'post': row} for row in _with_liked_by_row(graph, rows, viewer_id)]
+
+
+def _merge_authors(graph, author_ids, limit, after_created_at, after_id):
+    """Posts de plusieurs auteurs après une position, du plus récent au plus ancien"""
+    def stream(author_id):
+        posts = (graph.nodes["Post"][node_id] for node_id in graph.targets("CREATED", author_id)
+                 if node_id in graph.nodes["Post"])
+        for props in _by_created_at_desc(posts):
+            if after_created_at is None or (props.get('created_at') or 0, props['id']) < (after_created_at, after_id):
+                yield {'p': dict(props), 'user_id': author_id}
+
+    # Fusion k-voies des flux des auteurs, déjà triés par (created_at, id) décroissant
+    merged = heapq.merge(*(stream(author_id) for author_id in author_ids),
+                         key=lambda record: (record['p'].get('created_at') or 0, record['p']['id']),
+                         reverse=True)
+    return list(islice(merged, limit)) if limit is not None else list(merged)
+
+
+@handles("post.feed")
+def _post_feed(graph, user_id, limit=None, after_created_at=None, after_id=None, viewer_id=None):
+    records = _merge_authors(graph, graph.neighbours("FRIENDS_WITH", user_id), limit,
+                             after_created_at, after_id)
+    rows = [_post_row(record['p'], record['user_id']) for record in records]
+    return [{'post': row} for row in _with_liked_by_row(graph, rows, viewer_id)]
+
+
+@handles("post.find_by_users")
+def _post_find_by_users(graph, user_ids, limit=None, after_created_at=None, after_id=None, viewer_id=None):
+    author_ids = [user_id for user_id in set(user_ids) if graph.exists("User", user_id)]
+    records = _merge_authors(graph, author_ids, limit, after_created_at, after_id)
+    rows = [_post_row(record['p'], record['user_id']) for record in records]
+    return [{'post': row} for row in _with_liked_by_row(graph, rows, viewer_id)]
+
+
+@handles("post.find_by_ids")
+def _post_find_by_ids(graph, post_ids, viewer_id=None):
+    records = []
+    for post_id in post_ids:
+        props = graph.get("Post", post_id)
+        author = graph.author(post_id)
+        if props and author:
+            records.append({'p': props, 'user_id': author})
+    return _with_liked_by(graph, records, 'p', viewer_id)
+
+
+@handles("post.bulk_create")
+def _post_bulk_create(graph, rows):
+    records = []
+    for row in rows:
+        if not graph.exists("User", row['user_id']):
+            continue
+        created = not graph.exists("Post", row['id'])
+        props = graph.get("Post", row['id']) or {'id': row['id'], 'created_at': row['created_at'],
+                                                 'like_count': 0, 'comment_count': 0,
+                                                 'author_id': row['user_id']}
+        props.update(title=row['title'], content=row['content'])
+        graph.put("Post", props)
+        graph.link("CREATED", row['user_id'], row['id'])
+        records.append({'key': row['key'], 'created': created})
+    return records
+
+
+@handles("post.bulk_like")
+def _post_bulk_like(graph, rows):
+    records = []
+    for row in rows:
+        if graph.exists("User", row['user_id']) and graph.exists("Post", row['post_id']):
+            if graph.link("LIKES", row['user_id'], row['post_id']):
+                graph.bump("Post", row['post_id'], 'like_count', 1)
+            records.append({'key': row['key']})
+    return records
+
+
+@handles("post.delete")
+def _post_delete(graph, post_id):
+    if not graph.exists("Post", post_id):
+        return []
+    comment_ids = list(graph.targets("HAS_COMMENT", post_id))
+    for comment_id in comment_ids:
+        graph.remove("Comment", comment_id)
+    graph.remove("Post", post_id)
+    return [{'comment_ids': comment_ids}]
+
+
+@handles("post.add_like")
+def _post_add_like(graph, user_id, post_id):
+    return [{'status': _add_like(graph, user_id, "Post", post_id)}]
+
+
+@handles("post.remove_like")
+def _post_remove_like(graph, user_id, post_id):
+    return [{'status': _remove_like(graph, user_id, "Post", post_id)}]
+
+
+@handles("post.liked_by")
+def _post_liked_by(graph, post_id):
+    return [{'u': graph.get("User", user_id)} for user_id in graph.sources("LIKES", post_id)]
+
+
+# Commentaires
+
+def _comment_record(graph, props, post_id=None):
+    """Record d'un commentaire avec son auteur et son post (None si absent)"""
+    author = graph.author(props['id'])
+    post_id = post_id or graph.post_of(props['id'])
+    if not author or not post_id:
+        return None
+    return {'c': dict(props), 'user_id': author, 'post_id': post_id}
+
+
+@handles("comment.save")
+def _comment_save(graph, user_id, post_id, comment_id, content, created_at):
+    user_found = graph.exists("User", user_id)
+    post_found = graph.exists("Post", post_id)
+    if user_found and post_found:
+        props = graph.get("Comment", comment_id) or {'id': comment_id, 'created_at': created_at,
+                                                    'like_count': 0}
+        props.update(content=content)
+        graph.put("Comment", props)
+        graph.link("CREATED", user_id, comment_id)
+        if graph.link("HAS_COMMENT", post_id, comment_id):
+            graph.bump("Post", post_id, 'comment_count', 1)
+    return [{'user_found': user_found, 'post_found': post_found,
+             'c': graph.get("Comment", comment_id)}]
+
+
+@handles("comment.find_by_id")
+def _comment_find_by_id(graph, comment_id):
+    props = graph.get("Comment", comment_id)
+    if not props:
+        return []
+    return [{'c': props, 'user_id': graph.author(comment_id), 'post_id': graph.post_of(comment_id)}]
+
+
+@handles("comment.find_all")
+def _comment_find_all(graph, limit=None, after_created_at=None, after_id=None, viewer_id=None):
+    rows = _page(graph, "Comment", limit, after_created_at, after_id,
+                 lambda props: _comment_row(graph, props))
+    return [{'comment': row} for row in _with_liked_by_row(graph, rows, viewer_id)]
+
+
+@handles("comment.find_by_post")
+def _comment_find_by_post(graph, post_id, viewer_id=None):
+    comments = [graph.nodes["Comment"][node_id] for node_id in graph.targets("HAS_COMMENT", post_id)
+                if node_id in graph.nodes["Comment"]]
+    rows = (_comment_row(graph, props, post_id) for props in _by_created_at_desc(comments))
+    rows = _with_liked_by_row(graph, [row for row in rows if row], viewer_id)
+    return [{'comment': row} for row in rows]
+
+
+@handles("comment.bulk_create")
+def _comment_bulk_create(graph, rows):
+    records = []
+    for row in rows:
+        if not (graph.exists("User", row['user_id']) and graph.exists("Post", row['post_id'])):
+            continue
+        props = graph.get("Comment", row['id']) or {'id': row['id'], 'created_at': row['created_at'],
+                                                    'like_count': 0}
+        props.update(content=row['content'])
+        graph.put("Comment", props)
+        graph.link("CREATED", row['user_id'], row['id'])
+        if graph.link("HAS_COMMENT", row['post_id'], row['id']):
+            graph.bump("Post", row['post_id'], 'comment_count', 1)
+        records.append({'key': row['key']})
+    return records
+
+
+@handles("comment.bulk_like")
+def _comment_bulk_like(graph, rows):
+    records = []
+    for row in rows:
+        if graph.exists("User", row['user_id']) and graph.exists("Comment", row['comment_id']):
+            if graph.link("LIKES", row['user_id'], row['comment_id']):
+                graph.bump("Comment", row['comment_id'], 'like_count', 1)
+            records.append({'key': row['key']})
+    return records
+
+
+@handles("comment.delete")
+def _comment_delete(graph, comment_id):
+    if not graph.exists("Comment", comment_id):
+        return []
+    post_id = graph.post_of(comment_id)
+    graph.bump("Post", post_id, 'comment_count', -1)
+    graph.remove("Comment", comment_id)
+    return [{'post_id': post_id}]
+
+
+@handles("comment.add_like")
+def _comment_add_like(graph, user_id, comment_id):
+    return [{'status': _add_like(graph, user_id, "Comment", comment_id),
+             'post_id': graph.post_of(comment_id)}]
+
+
+@handles("comment.remove_like")
+def _comment_remove_like(graph, user_id, comment_id):
+    return [{'status': _remove_like(graph, user_id, "Comment", comment_id),
+             'post_id': graph.post_of(comment_id)}]
+
+
+# Réparation des compteurs : recalcul depuis les listes d'adjacence
+
+def _repair(graph, label, batch_size, after_id, counts):
+    ids = sorted(node_id for node_id in graph.nodes[label] if after_id is None or node_id > after_id)
+    batch = ids[:batch_size]
+    for node_id in batch:
+        graph.nodes[label][node_id].update(counts(node_id))
+    return [{'updated': len(batch), 'last_id': batch[-1] if batch else None}]
+
+
+@handles("counters.repair_users")
+def _counters_repair_users(graph, batch_size, after_id=None):
+    return _repair(graph, "User", batch_size, after_id, lambda node_id: {
+        'friend_count': len(graph.neighbours("FRIENDS_WITH", node_id))})
+
+
+@handles("counters.repair_posts")
+def _counters_repair_posts(graph, batch_size, after_id=None):
+    return _repair(graph, "Post", batch_size, after_id, lambda node_id: {
+        'like_count': len(graph.sources("LIKES", node_id)),
+        'comment_count': len(graph.targets("HAS_COMMENT", node_id))})
+
+
+@handles("counters.repair_comments")
+def _counters_repair_comments(graph, batch_size, after_id=None):
+    return _repair(graph, "Comment", batch_size, after_id, lambda node_id: {
+        'like_count': len(graph.sources("LIKES", node_id))})
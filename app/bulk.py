@@ -0,0 +1,105 @@
+﻿# Écritures en masse par lots UNWIND
+from flask import current_app, jsonify, request
+from app import db
+
+
+def batches(rows, batch_size):
+    """Découpe `rows` en lots de `batch_size` éléments"""
+    for start in range(0, len(rows), batch_size):
+        yield rows[start:start + batch_size]
+
+
+def bulk_write(items, schema, build_row, query, missing_message, batch_size,
+               dedupe_key=None, on_written=None):
+    """Écrit une liste d'éléments par lots, une requête UNWIND par lot
+
+    - `schema` : schéma de chaque élément (voir app.schemas)
+    - `build_row` : construit la ligne envoyée à Neo4j à partir d'un élément
+      validé (peut lever ValueError pour rejeter l'élément)
+    - `query` : requête Cypher commençant par `UNWIND $rows AS row` et
+      retournant `row.key AS key` pour chaque ligne écrite
+    - `missing_message` : erreur rapportée pour une ligne non retournée
+      (nœud référencé introuvable)
+    - `dedupe_key` : clé d'une ligne ; une ligne dont la clé a déjà été vue
+      n'est pas envoyée et reçoit le rapport de la première
+    - `on_written` : appelé avec chaque record retourné, dans l'ordre des lignes
+
+    Retourne un rapport par élément, dans l'ordre de `items`.
+    """
+    results = [None] * len(items)
+    rows = []
+    first_by_key = {}
+    duplicates = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            results[index] = {'index': index, 'status': 'error',
+                              'message': 'Élément JSON invalide'}
+            continue
+        try:
+            row = build_row(schema.validate(item))
+        except ValueError as e:
+            results[index] = {'index': index, 'status': 'error', 'message': str(e)}
+            continue
+        row['key'] = index
+        if dedupe_key is not None:
+            first = first_by_key.setdefault(dedupe_key(row), index)
+            if first != index:
+                duplicates.append((index, first))
+                continue
+        rows.append(row)
+
+    written = set()
+    for batch in batches(rows, batch_size):
+        for record in db.run(query, rows=batch):
+            written.add(record['key'])
+            if on_written is not None:
+                on_written(record)
+
+    for row in rows:
+        index = row['key']
+        if index in written:
+            results[index] = {'index': index, 'status': 'success'}
+            if 'id' in row:
+                results[index]['id'] = row['id']
+        else:
+            results[index] = {'index': index, 'status': 'error', 'message': missing_message}
+    for index, first in duplicates:
+        results[index] = {**results[first], 'index': index}
+
+    return results
+
+
+def get_bulk_params():
+    """Lit le corps d'une requête d'écriture en masse
+
+    Le corps est une liste JSON d'éléments ; la taille des lots vient de
+    `?batch_size=` ou de `BULK_BATCH_SIZE`. Lève ValueError si la requête
+    est invalide.
+    """
+    items = request.get_json(silent=True)
+    if not isinstance(items, list):
+        raise ValueError('Le corps de la requête doit être une liste JSON')
+
+    max_size = current_app.config.get('BULK_MAX_BATCH_SIZE', 10000)
+    batch_size = request.args.get('batch_size', current_app.config.get('BULK_BATCH_SIZE', 1000))
+    try:
+        batch_size = int(batch_size)
+    except (TypeError, ValueError):
+        raise ValueError(f"Paramètre batch_size invalide : {batch_size}")
+    if batch_size < 1:
+        raise ValueError("Le paramètre batch_size doit être supérieur à 0")
+    return items, min(batch_size, max_size)
+
+
+def bulk_response(results):
+    """Construit la réponse d'une écriture en masse à partir du rapport
+
+    201 si tous les éléments ont été écrits, 207 sinon.
+    """
+    failed = sum(1 for result in results if result['status'] == 'error')
+    return jsonify({
+        'status': 'success' if not failed else 'partial',
+        'created': len(results) - failed,
+        'failed': failed,
+        'results': results
+    }), 201 if not failed else 207
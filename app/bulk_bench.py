@@ -0,0 +1,127 @@
+﻿# Mesure des écritures en masse face aux routes unitaires
+#
+#   DB_BACKEND=memory python -m app.bulk_bench --items 1000 --latency-ms 1
+#
+# Pour chaque type d'entité, écrit `items` éléments avec la route unitaire
+# (une requête HTTP par élément) puis avec la route /bulk (une seule requête
+# HTTP), via le client de test Flask, et compare les entités écrites par
+# seconde et le nombre de requêtes Cypher par entité.
+#
+# Les données sont écrites dans la base configurée : sur Neo4j, utiliser une
+# base de test. Avec le backend mémoire, `--latency-ms` ajoute un délai à
+# chaque requête Cypher pour tenir compte de l'aller-retour vers Neo4j, qui
+# domine le coût des routes unitaires.
+import argparse
+import json
+import time
+from . import create_app, db
+
+
+class LatencyGraph:
+    """Graphe qui attend `latency` secondes avant chaque requête et les compte"""
+
+    def __init__(self, graph, latency=0.0):
+        self.graph = graph
+        self.latency = latency
+        self.queries = 0
+
+    def run(self, query, **params):
+        self.queries += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return self.graph.run(query, **params)
+
+    def stream(self, query, **params):
+        yield from self.run(query, **params)
+
+
+def _post_ok(client, path, body, expected=(201,)):
+    response = client.post(path, json=body)
+    if response.status_code not in expected:
+        raise RuntimeError(f"POST {path} : {response.status_code} {response.get_json()}")
+    return response.get_json()
+
+
+def _bulk_ids(client, path, items):
+    return [result['id'] for result in _post_ok(client, path, items)['results']]
+
+
+def _measure(graph, write):
+    """Durée (s) et requêtes Cypher de `write()`"""
+    queries = graph.queries
+    start = time.perf_counter()
+    write()
+    return time.perf_counter() - start, graph.queries - queries
+
+
+def run_bench(items=1000, latency_ms=0.0, batch_size=None):
+    """Retourne, par type d'entité, le débit et les requêtes Cypher des deux variantes"""
+    app = create_app()
+    client = app.test_client()
+    db.connect(force=False)
+    graph = LatencyGraph(db.graph, latency_ms / 1000)
+    db.graph = graph
+    query_string = f'?batch_size={batch_size}' if batch_size else ''
+
+    try:
+        # Auteurs, posts et commentaires existants, écrits hors mesure
+        user_ids = _bulk_ids(client, '/users/bulk', [
+            {'name': f'bench {index}', 'email': f'bench{index}@example.com'} for index in range(items + 2)])
+        post_ids = _bulk_ids(client, '/posts/bulk', [
+            {'title': 'bench', 'content': 'bench', 'user_id': user_id} for user_id in user_ids[:2]])
+        pairs = list(zip(user_ids, user_ids[1:]))[:items]
+        shifted = list(zip(user_ids, user_ids[2:]))[:items]
+
+        cases = {
+            'users': (
+                lambda index: _post_ok(client, '/users', {'name': f'u{index}', 'email': f'u{index}@example.com'}),
+                '/users/bulk',
+                [{'name': f'b{index}', 'email': f'b{index}@example.com'} for index in range(items)]),
+            'posts': (
+                lambda index: _post_ok(client, f'/posts/users/{user_ids[index]}/posts',
+                                       {'title': 't', 'content': 'c'}),
+                '/posts/bulk',
+                [{'title': 't', 'content': 'c', 'user_id': user_ids[index]} for index in range(items)]),
+            'comments': (
+                lambda index: _post_ok(client, f'/comments/posts/{post_ids[0]}/comments',
+                                       {'content': 'c', 'user_id': user_ids[index]}),
+                '/comments/bulk',
+                [{'content': 'c', 'user_id': user_ids[index], 'post_id': post_ids[1]} for index in range(items)]),
+            'likes': (
+                lambda index: _post_ok(client, f'/posts/{post_ids[0]}/like', {'user_id': user_ids[index]}),
+                '/likes/bulk',
+                [{'user_id': user_ids[index], 'post_id': post_ids[1]} for index in range(items)]),
+            'friendships': (
+                lambda index: _post_ok(client, f'/users/{pairs[index][0]}/friends',
+                                       {'friend_id': pairs[index][1]}),
+                '/friendships/bulk',
+                [{'user_id': user_id, 'friend_id': friend_id} for user_id, friend_id in shifted])
+        }
+
+        results = {}
+        for name, (write_one, bulk_path, bulk_items) in cases.items():
+            single_s, single_queries = _measure(graph, lambda: [write_one(index) for index in range(items)])
+            bulk_s, bulk_queries = _measure(graph, lambda: _post_ok(client, bulk_path + query_string, bulk_items))
+            results[name] = {
+                'single_per_s': round(items / single_s),
+                'bulk_per_s': round(items / bulk_s),
+                'speedup': round(single_s / bulk_s, 1),
+                'single_queries_per_item': round(single_queries / items, 2),
+                'bulk_queries': bulk_queries
+            }
+        return results
+    finally:
+        db.graph = graph.graph
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Mesure des écritures en masse")
+    parser.add_argument('--items', type=int, default=1000, help="entités écrites par variante")
+    parser.add_argument('--latency-ms', type=float, default=0.0,
+                        help="délai ajouté à chaque requête Cypher (backend mémoire)")
+    parser.add_argument('--batch-size', type=int, default=None, help="lignes par requête UNWIND")
+    args = parser.parse_args()
+    results = run_bench(args.items, args.latency_ms, args.batch_size)
+    print(json.dumps(results, indent=2))
+    for name, result in results.items():
+        print(f"{name} : {result['speedup']} x plus d'entités par seconde en masse")
@@ -0,0 +1,213 @@
+﻿# Caches de lecture des entités (find_by_id)
+from collections import OrderedDict
+from contextvars import ContextVar
+import threading
+import time
+from flask import g, has_request_context, request
+from .config import Config
+
+
+class EntityCache:
+    """Cache LRU des entités lues par ID, partagé par les threads du processus
+
+    Les valeurs sont des dictionnaires (`to_dict()` des modèles) : chaque
+    lecture reconstruit un objet neuf, de sorte qu'une modification faite
+    par une route avant `save()` ne fuit pas vers les autres requêtes.
+
+    Une entrée peut porter l'état des versions sous lequel elle a été lue
+    (voir app.conditional) : une lecture qui précise `version` ignore les
+    entrées lues sous un autre état.
+
+    Chaque invalidation prend un numéro de génération. Un lecteur note la
+    génération avant de lire la base et la passe à `set` : si l'entité a
+    été invalidée entre-temps, la ligne lue est peut-être antérieure à
+    l'écriture et n'est pas gardée. Seules les `max_size` dernières
+    invalidations sont retenues ; au-delà, une lecture commencée avant la
+    plus ancienne n'est pas gardée non plus.
+    """
+
+    def __init__(self, max_size=10000, ttls=None, enabled=True):
+        self.max_size = max_size
+        self.ttls = ttls or {}
+        self.enabled = enabled
+        self._entries = OrderedDict()
+        self._invalidated = OrderedDict()  # clé -> génération de sa dernière invalidation
+        self._generation = 0
+        self._forgotten = 0  # génération la plus récente sortie de _invalidated
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.stale_sets = 0
+
+    def get(self, kind, entity_id, version=None):
+        """Retourne la valeur en cache, ou None (absente, expirée, d'une autre version ou cache contourné)"""
+        if not self._active():
+            return None
+        key = (kind, entity_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic() or (version is not None and entry[2] != version):
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[1])
+
+    def generation(self):
+        """Génération courante, à noter avant de lire une entité en base"""
+        with self._lock:
+            return self._generation
+
+    def set(self, kind, entity_id, value, version=None, generation=None):
+        """Garde une entité lue en base
+
+        Avec `generation` (voir `generation()`), l'entité n'est pas gardée si
+        elle a pu être invalidée depuis le début de la lecture.
+        """
+        if not self.enabled or self.max_size <= 0:
+            return
+        expires_at = time.monotonic() + self.ttls.get(kind, 60)
+        key = (kind, entity_id)
+        with self._lock:
+            if generation is not None and (self._invalidated.get(key, 0) > generation
+                                           or self._forgotten > generation):
+                self.stale_sets += 1
+                return
+            self._entries[key] = (expires_at, dict(value), version)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, kind, entity_id):
+        key = (kind, entity_id)
+        with self._lock:
+            self._generation += 1
+            self._invalidated[key] = self._generation
+            self._invalidated.move_to_end(key)
+            while len(self._invalidated) > max(self.max_size, 1):
+                _, self._forgotten = self._invalidated.popitem(last=False)
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._invalidated.clear()
+            self._forgotten = self._generation
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'stale_sets': self.stale_sets
+            }
+
+    def _active(self):
+        """Le cache est contourné pour les requêtes qui exigent une lecture à jour
+
+        (`Cache-Control: no-cache` ou `?consistent=1`).
+        """
+        if not self.enabled:
+            return False
+        if has_request_context():
+            if 'no-cache' in request.headers.get('Cache-Control', ''):
+                return False
+            if request.args.get('consistent', '').lower() in ('1', 'true', 't'):
+                return False
+        return True
+
+
+entity_cache = EntityCache(
+    max_size=Config.ENTITY_CACHE_SIZE,
+    ttls={
+        'user': Config.ENTITY_CACHE_TTL_USER,
+        'post': Config.ENTITY_CACHE_TTL_POST,
+        'comment': Config.ENTITY_CACHE_TTL_COMMENT
+    },
+    enabled=Config.ENTITY_CACHE_ENABLED
+)
+
+
+# État des versions de la vue conditionnelle asynchrone en cours (voir
+# app.conditional) ; les vues synchrones le gardent dans `flask.g`
+async_entity_version = ContextVar('async_entity_version', default=None)
+
+
+# Marqueur d'une entité pas encore lue dans la requête courante
+NOT_LOADED = object()
+
+
+class IdentityMap:
+    """Carte d'identité propre à une requête HTTP (stockée dans `flask.g`)
+
+    Chaque entité est lue au plus une fois par requête ; la route et les
+    modèles partagent alors le même objet. Hors requête, rien n'est gardé.
+    """
+
+    def _entries(self):
+        if not has_request_context():
+            return None
+        if '_identity_map' not in g:
+            g._identity_map = {}
+        return g._identity_map
+
+    def get(self, kind, entity_id):
+        entries = self._entries()
+        if entries is None:
+            return NOT_LOADED
+        return entries.get((kind, entity_id), NOT_LOADED)
+
+    def add(self, kind, entity_id, entity):
+        entries = self._entries()
+        if entries is not None:
+            entries[(kind, entity_id)] = entity
+
+    def discard(self, kind, entity_id):
+        entries = self._entries()
+        if entries is not None:
+            entries.pop((kind, entity_id), None)
+
+
+identity_map = IdentityMap()
+
+
+def find_entity(kind, entity_id, build, load):
+    """Résout une entité : carte d'identité de la requête, cache d'entités, puis base
+
+    `build(snapshot)` reconstruit l'objet depuis le cache, `load(entity_id)`
+    le lit en base (None s'il n'existe pas).
+    """
+    entity = identity_map.get(kind, entity_id)
+    if entity is not NOT_LOADED:
+        return entity
+
+    # Dans une vue conditionnelle, état des versions de son ETag (voir app.conditional)
+    version = g.get('_entity_version') if has_request_context() else None
+    snapshot = entity_cache.get(kind, entity_id, version)
+    if snapshot is not None:
+        entity = build(snapshot)
+    else:
+        generation = entity_cache.generation()
+        entity = load(entity_id)
+        if entity is not None:
+            entity_cache.set(kind, entity_id, entity.to_dict(), version, generation)
+
+    identity_map.add(kind, entity_id, entity)
+    return entity
+
+
+def invalidate_entity(kind, entity_id):
+    """Oublie une entité modifiée (cache d'entités et carte d'identité)"""
+    entity_cache.invalidate(kind, entity_id)
+    identity_map.discard(kind, entity_id)
@@ -0,0 +1,82 @@
+﻿# Réponses conditionnelles des routes de lecture (ETag / Last-Modified / 304)
+from datetime import datetime, timezone
+from functools import wraps
+from flask import current_app, g, make_response, request
+from .cache import async_entity_version
+from .versions import validators, versions
+
+
+def _variant(request):
+    """Ce qui distingue deux réponses d'une même ressource : paramètres et format"""
+    return request.query_string + b'|' + request.headers.get('Accept', '').encode('latin-1')
+
+
+def _is_fresh(request, etag, last_modified):
+    """Le client a déjà cette version (If-None-Match, sinon If-Modified-Since)"""
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since:
+        return int(last_modified) <= request.if_modified_since.timestamp()
+    return False
+
+
+def _with_validators(response, etag, last_modified):
+    if response.status_code in (200, 304):
+        response.set_etag(etag)
+        response.last_modified = datetime.fromtimestamp(int(last_modified), timezone.utc)
+        # Les caches intermédiaires revalident à chaque fois (la revalidation coûte peu)
+        response.cache_control.no_cache = True
+    return response
+
+
+def conditional(keys):
+    """Rend une route de lecture conditionnelle
+
+    `keys(**view_args)` retourne les clés de version dont dépend la réponse
+    (voir app.versions). Si le client a déjà la version courante, la vue
+    n'est pas exécutée : réponse 304, sans requête à la base. Les versions
+    sont lues avant la vue : une écriture concurrente donne au pire une
+    ETag plus ancienne que le contenu, jamais l'inverse.
+
+    Dans la vue, le cache d'entités n'accepte que les entrées lues sous le
+    même état des versions (`g._entity_version`) : une écriture faite par
+    un autre processus, qui change l'ETag, écarte aussi les entrées de ce
+    processus, et un contenu périmé n'est jamais servi sous une ETag neuve.
+    """
+    def decorator(view):
+        if versions is None:
+            return view
+
+        @wraps(view)
+        def wrapper(**kwargs):
+            etag, last_modified, state = validators(keys(**kwargs), _variant(request))
+            if _is_fresh(request, etag, last_modified):
+                return _with_validators(current_app.response_class(status=304), etag, last_modified)
+            g._entity_version = state
+            return _with_validators(make_response(view(**kwargs)), etag, last_modified)
+        return wrapper
+    return decorator
+
+
+def async_conditional(keys):
+    """Équivalent de `conditional` pour les routes Quart (voir app.aio)
+
+    L'état des versions est passé au cache d'entités par `async_entity_version`.
+    """
+    def decorator(view):
+        if versions is None:
+            return view
+
+        @wraps(view)
+        async def wrapper(**kwargs):
+            from quart import current_app, make_response, request
+            etag, last_modified, state = validators(keys(**kwargs), _variant(request))
+            if _is_fresh(request, etag, last_modified):
+                return _with_validators(current_app.response_class('', status=304), etag, last_modified)
+            token = async_entity_version.set(state)
+            try:
+                return _with_validators(await make_response(await view(**kwargs)), etag, last_modified)
+            finally:
+                async_entity_version.reset(token)
+        return wrapper
+    return decorator
@@ -5,11 +5,103 @@ from dotenv import load_dotenv
 load_dotenv()
 
 class Config:
+    # Backend de stockage : 'neo4j' ou 'memory' (graphe en mémoire, sans serveur)
+    DB_BACKEND = os.getenv('DB_BACKEND', 'neo4j').lower()
+    
     # Configuration Neo4j
     NEO4J_URI = os.getenv('NEO4J_URI', 'bolt://localhost:7687')
     NEO4J_USER = os.getenv('NEO4J_USER', 'neo4j')
     NEO4J_PASSWORD = os.getenv('NEO4J_PASSWORD', 'password')
+    # Créer les contraintes et index au démarrage de l'application
+    NEO4J_INIT_SCHEMA = os.getenv('NEO4J_INIT_SCHEMA', 'True').lower() in ('true', '1', 't')
+    # Connexions Bolt au plus (pool de py2neo et du pilote asynchrone), qui bornent
+    # aussi les requêtes Cypher en cours par processus (voir ConcurrencyLimiter) ;
+    # attente maximale d'une place (s), durée de vie des connexions (s) et
+    # vérification après inactivité (s)
+    NEO4J_POOL_MAX_SIZE = int(os.getenv('NEO4J_POOL_MAX_SIZE', '50'))
+    NEO4J_POOL_ACQUIRE_TIMEOUT = float(os.getenv('NEO4J_POOL_ACQUIRE_TIMEOUT', '30'))
+    NEO4J_POOL_MAX_LIFETIME = float(os.getenv('NEO4J_POOL_MAX_LIFETIME', '3600'))
+    NEO4J_POOL_LIVENESS_CHECK = float(os.getenv('NEO4J_POOL_LIVENESS_CHECK', '60'))
+    # Lignes lues par aller-retour pour les listes parcourues en flux (pilote neo4j)
+    NEO4J_STREAM_FETCH_SIZE = int(os.getenv('NEO4J_STREAM_FETCH_SIZE', '1000'))
+    
+    # Serveur de production (python -m app.serve, voir app.serve)
+    SERVE_BIND = os.getenv('SERVE_BIND', '0.0.0.0:5000')
+    # 'gthread' (threads) ou 'gevent' (threads verts)
+    SERVE_WORKER_CLASS = os.getenv('SERVE_WORKER_CLASS', 'gthread').lower()
+    # Nombre de processus, 0 = selon le nombre de CPU
+    SERVE_WORKERS = int(os.getenv('SERVE_WORKERS', '0'))
+    # Threads par processus (gthread) et connexions simultanées par processus (gevent)
+    SERVE_THREADS = int(os.getenv('SERVE_THREADS', '8'))
+    SERVE_WORKER_CONNECTIONS = int(os.getenv('SERVE_WORKER_CONNECTIONS', '1000'))
+    # Délais (s) : requête bloquée, arrêt gracieux d'un processus, keep-alive
+    SERVE_TIMEOUT = int(os.getenv('SERVE_TIMEOUT', '30'))
+    SERVE_GRACEFUL_TIMEOUT = int(os.getenv('SERVE_GRACEFUL_TIMEOUT', '30'))
+    SERVE_KEEPALIVE = int(os.getenv('SERVE_KEEPALIVE', '5'))
+    # Recyclage des processus après N requêtes (0 = jamais), avec une part aléatoire
+    SERVE_MAX_REQUESTS = int(os.getenv('SERVE_MAX_REQUESTS', '0'))
+    SERVE_MAX_REQUESTS_JITTER = int(os.getenv('SERVE_MAX_REQUESTS_JITTER', '0'))
+    # Charger l'application une seule fois dans le processus maître avant le fork
+    SERVE_PRELOAD = os.getenv('SERVE_PRELOAD', 'True').lower() in ('true', '1', 't')
+    SERVE_PIDFILE = os.getenv('SERVE_PIDFILE', 'serve.pid')
     
     # Configuration Flask
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev_key_should_be_changed_in_production')
     DEBUG = os.getenv('DEBUG', 'True').lower() in ('true', '1', 't')
+    
+    # Mesures (GET /metrics, format Prometheus) et journal des requêtes Cypher
+    # plus lentes que SLOW_QUERY_MS (0 = pas de journal)
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() in ('true', '1', 't')
+    SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '100'))
+    
+    # Capture des plans d'exécution d'une fraction des requêtes Cypher (diagnostic, voir app.plans) :
+    # 'profile' (exécution profilée, db hits par opérateur) ou 'explain' (plan estimé)
+    PLAN_CAPTURE_ENABLED = os.getenv('PLAN_CAPTURE_ENABLED', 'False').lower() in ('true', '1', 't')
+    PLAN_CAPTURE_MODE = os.getenv('PLAN_CAPTURE_MODE', 'profile').lower()
+    PLAN_CAPTURE_SAMPLE = float(os.getenv('PLAN_CAPTURE_SAMPLE', '0.01'))
+    
+    # Encodage JSON : 'orjson', 'default' (bibliothèque standard) ou 'module:Classe'
+    JSON_PROVIDER = os.getenv('JSON_PROVIDER', 'orjson')
+    
+    # Pagination des listes (?limit=&after=)
+    PAGE_DEFAULT_LIMIT = int(os.getenv('PAGE_DEFAULT_LIMIT', '50'))
+    PAGE_MAX_LIMIT = int(os.getenv('PAGE_MAX_LIMIT', '500'))
+    
+    # Écritures en masse (lignes par requête UNWIND)
+    BULK_BATCH_SIZE = int(os.getenv('BULK_BATCH_SIZE', '1000'))
+    BULK_MAX_BATCH_SIZE = int(os.getenv('BULK_MAX_BATCH_SIZE', '10000'))
+    
+    # Cache d'entités pour find_by_id (taille en entrées, TTL en secondes)
+    ENTITY_CACHE_ENABLED = os.getenv('ENTITY_CACHE_ENABLED', 'True').lower() in ('true', '1', 't')
+    ENTITY_CACHE_SIZE = int(os.getenv('ENTITY_CACHE_SIZE', '10000'))
+    ENTITY_CACHE_TTL_USER = float(os.getenv('ENTITY_CACHE_TTL_USER', '300'))
+    ENTITY_CACHE_TTL_POST = float(os.getenv('ENTITY_CACHE_TTL_POST', '60'))
+    ENTITY_CACHE_TTL_COMMENT = float(os.getenv('ENTITY_CACHE_TTL_COMMENT', '60'))
+    
+    # Fils d'actualité matérialisés (fan-out à l'écriture, voir app.timeline)
+    TIMELINE_ENABLED = os.getenv('TIMELINE_ENABLED', 'False').lower() in ('true', '1', 't')
+    # 'memory', 'sqlite' ou 'module:Classe'
+    TIMELINE_STORE = os.getenv('TIMELINE_STORE', 'memory')
+    TIMELINE_SQLITE_PATH = os.getenv('TIMELINE_SQLITE_PATH', 'timelines.db')
+    TIMELINE_MAX_ENTRIES = int(os.getenv('TIMELINE_MAX_ENTRIES', '1000'))
+    # Au-delà de ce nombre d'amis, les posts d'un auteur sont fusionnés à la lecture
+    TIMELINE_CELEBRITY_THRESHOLD = int(os.getenv('TIMELINE_CELEBRITY_THRESHOLD', '5000'))
+    
+    # Réponses conditionnelles (ETag / Last-Modified / 304) des lectures, voir app.versions
+    CONDITIONAL_GET_ENABLED = os.getenv('CONDITIONAL_GET_ENABLED', 'True').lower() in ('true', '1', 't')
+    # 'memory' (un seul processus), 'sqlite' (processus d'une machine) ou 'module:Classe'
+    VERSION_STORE = os.getenv('VERSION_STORE', 'memory')
+    VERSION_SQLITE_PATH = os.getenv('VERSION_SQLITE_PATH', 'versions.db')
+    VERSION_MAX_KEYS = int(os.getenv('VERSION_MAX_KEYS', '100000'))
+    
+    # Index d'adjacence des amitiés en mémoire, chargé au démarrage (voir app.adjacency).
+    # Propre à chaque processus, sans invalidation entre eux : avec plusieurs
+    # workers, les amitiés écrites par les autres workers n'y apparaissent
+    # qu'après un rechargement (POST /cache/friendship-index/rebuild)
+    FRIENDSHIP_INDEX_ENABLED = os.getenv('FRIENDSHIP_INDEX_ENABLED', 'False').lower() in ('true', '1', 't')
+    
+    # Recommandations d'amis (amis d'amis classés par nombre d'amis en commun)
+    RECOMMENDATIONS_TOP_K = int(os.getenv('RECOMMENDATIONS_TOP_K', '50'))
+    # Délai (s) avant l'application groupée des changements de scores dus aux
+    # ajouts et retraits d'amis (0 = appliqués tout de suite, dans la requête)
+    RECOMMENDATIONS_FLUSH_INTERVAL = float(os.getenv('RECOMMENDATIONS_FLUSH_INTERVAL', '1'))
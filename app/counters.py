@@ -0,0 +1,61 @@
+﻿# Compteurs dénormalisés du graphe
+#
+# `like_count` (Post, Comment), `comment_count` (Post) et `friend_count`
+# (User) sont des propriétés des nœuds, mises à jour par les requêtes qui
+# créent ou suppriment les relations correspondantes : lire un compteur ne
+# parcourt plus les relations. La réparation ci-dessous les recalcule à
+# partir des relations, par lots d'IDs, pour les données importées avant
+# leur introduction ou après une écriture faite hors des modèles.
+
+from .database import Query
+
+# (label, requête) - chaque requête traite les `batch_size` nœuds suivant
+# `after_id` dans l'ordre des IDs et retourne le dernier ID traité
+REPAIRS = [
+    ("User", Query("counters.repair_users", """
+    MATCH (u:User)
+    WHERE $after_id IS NULL OR u.id > $after_id
+    WITH u ORDER BY u.id LIMIT $batch_size
+    SET u.friend_count = COUNT { (u)-[:FRIENDS_WITH]-(:User) }
+    RETURN count(u) AS updated, max(u.id) AS last_id
+    """)),
+    ("Post", Query("counters.repair_posts", """
+    MATCH (p:Post)
+    WHERE $after_id IS NULL OR p.id > $after_id
+    WITH p ORDER BY p.id LIMIT $batch_size
+    SET p.like_count = COUNT { (:User)-[:LIKES]->(p) },
+        p.comment_count = COUNT { (p)-[:HAS_COMMENT]->(:Comment) }
+    RETURN count(p) AS updated, max(p.id) AS last_id
+    """)),
+    ("Comment", Query("counters.repair_comments", """
+    MATCH (c:Comment)
+    WHERE $after_id IS NULL OR c.id > $after_id
+    WITH c ORDER BY c.id LIMIT $batch_size
+    SET c.like_count = COUNT { (:User)-[:LIKES]->(c) }
+    RETURN count(c) AS updated, max(c.id) AS last_id
+    """)),
+]
+
+
+def repair_counters(graph, batch_size=10000):
+    """Recalcule tous les compteurs, une transaction par lot de nœuds
+
+    Retourne le nombre de nœuds traités par label.
+    """
+    report = {}
+    if graph is None:
+        return report
+
+    for label, query in REPAIRS:
+        report[label] = 0
+        after_id = None
+        while True:
+            result = graph.run(query, batch_size=batch_size, after_id=after_id).data()
+            updated = result[0].get('updated') if result else 0
+            if not updated:
+                break
+            report[label] += updated
+            after_id = result[0].get('last_id')
+            print(f"  {label} : {report[label]} compteurs recalculés")
+
+    return report
@@ -1,22 +1,327 @@
-﻿from py2neo import Graph
+﻿import os
+import threading
+import time
 from .config import Config
+from .metrics import query_metrics
+from .plans import plan_capture
+
+
+class Query(str):
+    """Requête Cypher identifiée par un nom stable
+
+    S'utilise comme une chaîne (le texte Cypher est passé tel quel à
+    py2neo) ; le nom permet aux backends qui n'exécutent pas de Cypher,
+    comme le backend mémoire, de retrouver l'opération demandée.
+    """
+
+    def __new__(cls, name, cypher):
+        query = super().__new__(cls, cypher)
+        query.name = name
+        return query
+
+
+class LimiterTimeout(Exception):
+    """Trop de requêtes en cours : aucune place libre dans le délai NEO4J_POOL_ACQUIRE_TIMEOUT"""
+
+
+class BoltStream:
+    """Lecture paresseuse des résultats avec le pilote neo4j (réponses en flux)
+
+    py2neo lit toutes les lignes d'une requête avant de rendre la main (voir
+    ConcurrencyLimiter.run) ; le pilote neo4j les récupère par paquets de
+    `fetch_size` lignes, à mesure du parcours. La session est gardée jusqu'à
+    la fin du parcours ou la fermeture du générateur.
+    """
+
+    def __init__(self, driver, fetch_size=1000):
+        self.driver = driver
+        self.fetch_size = fetch_size
+
+    def stream(self, query, **params):
+        with self.driver.session(fetch_size=self.fetch_size, default_access_mode='READ') as session:
+            for record in session.run(str(query), params):
+                yield record.data()
+
+
+class ConcurrencyLimiter:
+    """Limiteur de requêtes concurrentes devant le graphe (py2neo ou backend mémoire)
+
+    S'utilise comme un `Graph` (`db.run(query, **params)`). Ce n'est pas un
+    pool de sessions : les connexions Bolt sont gérées par py2neo, avec une
+    taille maximale de `max_size` et une durée de vie de `max_lifetime`
+    secondes. Le limiteur borne seulement le nombre de requêtes en cours
+    dans le processus : au plus `max_size` à la fois, au-delà une requête
+    attend au plus `acquire_timeout` secondes puis lève LimiterTimeout, au
+    lieu d'attendre sans fin une connexion de py2neo. Une place est prise
+    pour la durée de `run` (py2neo lit toutes les lignes d'une requête en
+    auto-commit avant de rendre sa connexion), et non pour toute la requête
+    HTTP ; pour la durée du parcours avec `stream`.
+
+    La connexion est ouverte au premier usage, et non à la création du
+    limiteur : importer l'application ne fait aucune entrée/sortie. Elle est
+    propre à chaque processus : après un fork (serveur multi-processus),
+    le processus enfant oublie la connexion héritée et ouvre la sienne au
+    premier usage (`reconnect_after_fork=False` garde le graphe hérité,
+    pour le backend mémoire dont les données sont le graphe).
+
+    `stream` parcourt une requête sans la lire en entier : avec le graphe
+    s'il a une méthode `stream` (backend mémoire), sinon avec l'objet créé
+    par `connect_stream()` au premier usage (voir BoltStream).
+    """
+
+    def __init__(self, connect, max_size=50, acquire_timeout=30.0, liveness_check_interval=60.0,
+                 reconnect_after_fork=True, connect_stream=None):
+        self._connect = connect
+        self._connect_stream = connect_stream
+        self._streamer = None
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.liveness_check_interval = liveness_check_interval
+        self.reconnect_after_fork = reconnect_after_fork
+        self.graph = None
+        self._connect_hooks = []
+        self._reset()
+
+    def _reset(self):
+        """État propre au processus courant (verrous, places prises, statistiques)"""
+        self._pid = os.getpid()
+        self._slots = threading.BoundedSemaphore(self.max_size)
+        self._lock = threading.Lock()
+        self._connect_lock = threading.Lock()
+        self._hooks_pending = True
+        self._last_used = None
+        self.in_use = 0
+        self.waiting = 0
+        self.acquired = 0
+        self.timeouts = 0
+        self.reconnects = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _check_process(self):
+        """Après un fork, repart d'un état neuf dans le processus enfant"""
+        if self._pid == os.getpid():
+            return
+        self._reset()
+        if self.reconnect_after_fork:
+            # La socket Bolt héritée est partagée avec le parent : ne jamais l'utiliser
+            self.graph = None
+            self._streamer = None
+        else:
+            self._hooks_pending = False
+
+    @property
+    def connected(self):
+        self._check_process()
+        return self.graph is not None
+
+    def on_connect(self, hook):
+        """Enregistre `hook(graph)`, appelé une fois par processus à la première connexion
+
+        Si la connexion est déjà ouverte, `hook` est appelé tout de suite.
+        """
+        if hook in self._connect_hooks:
+            return
+        self._connect_hooks.append(hook)
+        if self.connected and not self._hooks_pending:
+            self._run_hook(hook, self.graph)
+
+    @staticmethod
+    def _run_hook(hook, graph):
+        try:
+            hook(graph)
+        except Exception as e:
+            print(f"Connection hook {hook.__name__} failed: {e}")
+
+    def connect(self, force=True):
+        """Ouvre (ou rouvre) la connexion au graphe ; retourne False en cas d'échec
+
+        Avec `force=False`, ne fait rien si la connexion est déjà ouverte
+        (premier usage simultané dans plusieurs threads).
+        """
+        self._check_process()
+        with self._connect_lock:
+            if not force and self.graph is not None:
+                return True
+            graph = self._connect()
+            with self._lock:
+                self.graph = graph
+                self._last_used = time.monotonic()
+            if graph is not None and self._hooks_pending:
+                self._hooks_pending = False
+                for hook in self._connect_hooks:
+                    self._run_hook(hook, graph)
+            return graph is not None
+
+    # Places des requêtes en cours
+
+    def acquire(self):
+        self._check_process()
+        start = time.monotonic()
+        with self._lock:
+            self.waiting += 1
+        acquired = self._slots.acquire(timeout=self.acquire_timeout)
+        waited = time.monotonic() - start
+        with self._lock:
+            self.waiting -= 1
+            if not acquired:
+                self.timeouts += 1
+            else:
+                self.in_use += 1
+                self.acquired += 1
+                self.wait_seconds += waited
+                self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        if not acquired:
+            raise LimiterTimeout(f"Aucune place libre après {self.acquire_timeout}s "
+                                 f"({self.max_size} requêtes en cours)")
+
+    def release(self):
+        with self._lock:
+            self.in_use -= 1
+        self._slots.release()
+
+    def _ensure_alive(self):
+        """Vérifie la connexion si elle est restée inutilisée trop longtemps"""
+        if self.graph is None:
+            if not self.connect(force=False):
+                raise ConnectionError("Base de données indisponible")
+            return
+        idle = time.monotonic() - (self._last_used or 0)
+        if self.liveness_check_interval is not None and idle > self.liveness_check_interval:
+            try:
+                self.graph.run(Query("db.ping", "RETURN 1 AS ok")).data()
+            except Exception as e:
+                print(f"Neo4j connection check failed, reconnecting: {e}")
+                self.reconnects += 1
+                if not self.connect():
+                    raise ConnectionError("Base de données indisponible")
+
+    def run(self, query, **params):
+        """Exécute une requête en occupant une place du limiteur pendant son exécution
+
+        La requête est mesurée sous son nom (voir app.metrics) et, si elle est
+        tirée, son plan d'exécution est capturé (voir app.plans).
+        """
+        self.acquire()
+        try:
+            self._ensure_alive()
+            self._last_used = time.monotonic()
+            return query_metrics.run(self._execute, query, params)
+        finally:
+            self.release()
+
+    def stream(self, query, **params):
+        """Parcourt les lignes d'une requête au fur et à mesure de leur lecture
+
+        Contrairement à `run`, le résultat n'est jamais lu en entier : une
+        place du limiteur (et, avec Neo4j, une session du pilote) est gardée
+        jusqu'à la fin du parcours ou la fermeture du générateur, par exemple
+        quand le client d'une réponse en flux se déconnecte. Les plans
+        d'exécution ne sont pas capturés.
+        """
+        self.acquire()
+        try:
+            self._ensure_alive()
+            self._last_used = time.monotonic()
+            yield from query_metrics.run(self._stream, query, params)
+        finally:
+            self.release()
+
+    def _stream(self, query, **params):
+        if hasattr(self.graph, 'stream'):
+            return self.graph.stream(query, **params)
+        with self._connect_lock:
+            if self._streamer is None:
+                self._streamer = self._connect_stream()
+        return self._streamer.stream(query, **params)
+
+    def _execute(self, query, **params):
+        if plan_capture is not None:
+            return plan_capture.run(self.graph.run, query, params)
+        return self.graph.run(query, **params)
+
+    def stats(self):
+        self._check_process()
+        with self._lock:
+            stats = {
+                'backend': Config.DB_BACKEND,
+                'connected': self.connected,
+                'max_size': self.max_size,
+                'in_use': self.in_use,
+                'idle': self.max_size - self.in_use,
+                'waiting': self.waiting,
+                'acquired': self.acquired,
+                'timeouts': self.timeouts,
+                'reconnects': self.reconnects,
+                'wait_ms_total': round(self.wait_seconds * 1000, 3),
+                'wait_ms_avg': round(self.wait_seconds * 1000 / self.acquired, 3) if self.acquired else 0,
+                'wait_ms_max': round(self.max_wait_seconds * 1000, 3)
+            }
+        # Connexions Bolt réellement ouvertes par py2neo
+        connector = getattr(getattr(self.graph, 'service', None), 'connector', None)
+        if connector is not None:
+            stats['bolt_in_use'] = sum(connector.in_use.values())
+        return stats
+
 
 class Database:
+    """Point d'accès unique au graphe (créé une seule fois, même entre threads)
+
+    Créer le limiteur n'ouvre aucune connexion (voir ConcurrencyLimiter).
+    """
     _instance = None
-    
+    _instance_lock = threading.Lock()
+
     def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super(Database, cls).__new__(cls)
-            try:
-                cls._instance.graph = Graph(
-                    Config.NEO4J_URI, 
-                    auth=(Config.NEO4J_USER, Config.NEO4J_PASSWORD)
+        with cls._instance_lock:
+            if cls._instance is None:
+                instance = super(Database, cls).__new__(cls)
+                instance.limiter = ConcurrencyLimiter(
+                    cls._connect,
+                    max_size=Config.NEO4J_POOL_MAX_SIZE,
+                    acquire_timeout=Config.NEO4J_POOL_ACQUIRE_TIMEOUT,
+                    liveness_check_interval=Config.NEO4J_POOL_LIVENESS_CHECK,
+                    reconnect_after_fork=Config.DB_BACKEND != 'memory',
+                    connect_stream=cls._connect_stream
                 )
-                print("Connected to Neo4j database")
-            except Exception as e:
-                print(f"Failed to connect to Neo4j: {e}")
-                cls._instance.graph = None
+                cls._instance = instance
         return cls._instance
 
+    @staticmethod
+    def _connect():
+        """Crée le backend de stockage choisi par Config.DB_BACKEND"""
+        if Config.DB_BACKEND == 'memory':
+            from .backends.memory import MemoryGraph
+            print("Using in-memory graph backend")
+            return MemoryGraph()
+
+        from py2neo import Graph
+        try:
+            graph = Graph(
+                Config.NEO4J_URI,
+                auth=(Config.NEO4J_USER, Config.NEO4J_PASSWORD),
+                max_size=Config.NEO4J_POOL_MAX_SIZE,
+                max_age=Config.NEO4J_POOL_MAX_LIFETIME
+            )
+            print("Connected to Neo4j database")
+            return graph
+        except Exception as e:
+            print(f"Failed to connect to Neo4j: {e}")
+            return None
+
+    @staticmethod
+    def _connect_stream():
+        """Crée le pilote neo4j des lectures en flux (voir BoltStream)"""
+        from neo4j import GraphDatabase
+        driver = GraphDatabase.driver(
+            Config.NEO4J_URI,
+            auth=(Config.NEO4J_USER, Config.NEO4J_PASSWORD),
+            max_connection_pool_size=Config.NEO4J_POOL_MAX_SIZE,
+            connection_acquisition_timeout=Config.NEO4J_POOL_ACQUIRE_TIMEOUT,
+            max_connection_lifetime=Config.NEO4J_POOL_MAX_LIFETIME,
+            liveness_check_timeout=Config.NEO4J_POOL_LIVENESS_CHECK
+        )
+        return BoltStream(driver, Config.NEO4J_STREAM_FETCH_SIZE)
+
     def get_db(self):
-        return self.graph
+        return self.limiter
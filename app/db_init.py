@@ -1,8 +1,21 @@
 ﻿# app/db_init.py
 from app import create_app, db
+from app.database import Query
+from app.schema import init_schema
+from app.counters import repair_counters
+from app.timeline import timelines
+from app.versions import bump_all
+from app.recommendations import build_recommendations
+from app.config import Config
 from app.models.user import User
 from app.models.post import Post
 from app.models.comment import Comment
+from array import array
+import argparse
+import itertools
+import json
+import os
+import random
 import uuid
 import time
 
@@ -11,13 +24,18 @@ def init_db():
     print("Initialisation de la base de données avec des données de test...")
     
     # Réinitialiser la base de données
-    query = """
+    query = Query("db.reset", """
     MATCH (n)
     DETACH DELETE n
-    """
+    """)
     db.run(query)
     print("Base de données réinitialisée.")
     
+    # Créer les contraintes et index
+    report = init_schema(db)
+    print(f"Contraintes et index créés : {report['created']}")
+    print(f"Contraintes et index déjà présents : {report['existing']}")
+    
     # Créer des utilisateurs
     alice = User(name="Alice Martin", email="alice@example.com")
     bob = User(name="Bob Dupont", email="bob@example.com")
@@ -156,7 +174,286 @@ def init_db():
         }
     }
 
+# Génération de graphes synthétiques à grande échelle
+
+# Période couverte par les dates de création générées (un an, en ms)
+GENERATED_SPAN_MS = 365 * 24 * 3600 * 1000
+# Exposant de la loi de puissance des degrés et de l'activité
+POWER_LAW_ALPHA = 2.5
+
+
+def _generated_id(seed, kind, index):
+    """ID déterministe : une reprise régénère exactement les mêmes nœuds"""
+    return str(uuid.uuid5(uuid.NAMESPACE_OID, f"{seed}:{kind}:{index}"))
+
+
+def _load_checkpoint(path, params):
+    """Charge l'avancement d'une génération précédente avec les mêmes paramètres"""
+    if path and os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            checkpoint = json.load(f)
+        if checkpoint.get('params') == params:
+            return checkpoint
+        print("Point de reprise ignoré : paramètres différents.")
+    return {'params': params, 'done': {}}
+
+
+def _save_checkpoint(path, checkpoint):
+    if not path:
+        return
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+def _write_phase(name, items, total, write, batch_size, checkpoint, checkpoint_path):
+    """Écrit une phase de la génération par lots en affichant le débit
+
+    Les `done` premiers éléments, déjà écrits lors d'une exécution
+    précédente, sont régénérés puis ignorés.
+    """
+    done = checkpoint['done'].get(name, 0)
+    if done >= total:
+        print(f"{name} : déjà généré ({total})")
+        return
+    if done:
+        print(f"{name} : reprise à {done}/{total}")
+
+    items = itertools.islice(items, done, None)
+    start = time.time()
+    written = 0
+    failed = 0
+    while True:
+        batch = list(itertools.islice(items, batch_size))
+        if not batch:
+            break
+        results = write(batch, batch_size=batch_size)
+        failed += sum(1 for result in results if result['status'] == 'error')
+        written += len(batch)
+        checkpoint['done'][name] = done + written
+        _save_checkpoint(checkpoint_path, checkpoint)
+
+        rate = written / max(time.time() - start, 1e-6)
+        print(f"\r{name} : {done + written}/{total} ({rate:,.0f}/s)", end='', flush=True)
+
+    print(f"\r{name} : {done + written}/{total} en {time.time() - start:.1f}s"
+          + (f", {failed} en échec" if failed else ""))
+
+
+def _reset_db(batch_size):
+    """Vide la base par lots pour ne pas charger tout le graphe dans une transaction"""
+    query = Query("db.reset_batch", """
+    MATCH (n)
+    WITH n LIMIT $batch_size
+    DETACH DELETE n
+    RETURN count(n) as deleted
+    """)
+    while db.run(query, batch_size=batch_size).data()[0].get('deleted'):
+        pass
+
+
+def generate_db(users, avg_friends=20, posts_per_user=5, comments_per_post=2,
+                likes_per_post=5, seed=42, batch_size=10000, reset=False,
+                checkpoint_path='.db_init_checkpoint.json'):
+    """Génère un réseau social synthétique reproductible
+
+    Les degrés d'amitié et l'activité des utilisateurs suivent une loi de
+    puissance (modèle de Chung-Lu) ; la popularité des posts est fortement
+    asymétrique. Les nœuds sont écrits par lots UNWIND via les méthodes
+    `bulk_*` des modèles, et l'avancement est enregistré après chaque lot
+    dans `checkpoint_path` pour pouvoir reprendre après une interruption.
+    """
+    params = {
+        'users': users, 'avg_friends': avg_friends, 'posts_per_user': posts_per_user,
+        'comments_per_post': comments_per_post, 'likes_per_post': likes_per_post,
+        'seed': seed
+    }
+    checkpoint = _load_checkpoint(checkpoint_path, params)
+    if reset:
+        print("Réinitialisation de la base de données...")
+        _reset_db(batch_size)
+        checkpoint = {'params': params, 'done': {}}
+        _save_checkpoint(checkpoint_path, checkpoint)
+
+    report = init_schema(db)
+    print(f"Contraintes et index créés : {report['created']}")
+
+    # Poids des utilisateurs (degré et activité), tirés selon une loi de puissance
+    rng = random.Random(f"{seed}:weights")
+    weights = array('d', (rng.paretovariate(POWER_LAW_ALPHA) for _ in range(users)))
+    mean_weight = sum(weights) / users
+    cum_weights = array('d', itertools.accumulate(weights))
+    population = range(users)
+
+    # Nombre de posts par utilisateur, proportionnel à son activité
+    post_counts = array('l', (round(w / mean_weight * posts_per_user) for w in weights))
+    post_offsets = array('l', itertools.accumulate(post_counts, initial=0))
+    total_posts = post_offsets[-1]
+    base_time = int(time.time() * 1000) - GENERATED_SPAN_MS
+
+    def post_created_at(index):
+        return base_time + index * GENERATED_SPAN_MS // max(total_posts, 1)
+
+    def popular_post(rng):
+        # Les posts de rang faible concentrent l'essentiel de l'engagement
+        return int(total_posts * rng.random() ** 3)
+
+    def generate_users():
+        rng = random.Random(f"{seed}:users")
+        for i in population:
+            yield {
+                'id': _generated_id(seed, 'user', i),
+                'name': f"User {i}",
+                'email': f"user{i}@example.com",
+                'created_at': base_time + rng.randrange(GENERATED_SPAN_MS)
+            }
+
+    # Chaque arête compte pour les deux extrémités
+    edge_factor = avg_friends / 2 / mean_weight if users > 1 else 0
+    total_friendships = sum(round(w * edge_factor) for w in weights)
+
+    def generate_friendships():
+        rng = random.Random(f"{seed}:friendships")
+        for i in population:
+            degree = round(weights[i] * edge_factor)
+            for j in rng.choices(population, cum_weights=cum_weights, k=degree):
+                if i == j:
+                    # Pas d'amitié avec soi-même : prendre le voisin suivant
+                    j = (i + 1) % users
+                yield {
+                    'user_id': _generated_id(seed, 'user', i),
+                    'friend_id': _generated_id(seed, 'user', j)
+                }
+
+    def generate_posts():
+        for i in population:
+            for index in range(post_offsets[i], post_offsets[i + 1]):
+                yield {
+                    'id': _generated_id(seed, 'post', index),
+                    'title': f"Post {index}",
+                    'content': f"Contenu généré du post {index} par l'utilisateur {i}.",
+                    'user_id': _generated_id(seed, 'user', i),
+                    'created_at': post_created_at(index)
+                }
+
+    total_comments = total_posts * comments_per_post if users else 0
+
+    def generate_comments():
+        rng = random.Random(f"{seed}:comments")
+        for index in range(total_comments):
+            post_index = popular_post(rng)
+            author = rng.choices(population, cum_weights=cum_weights)[0]
+            yield {
+                'id': _generated_id(seed, 'comment', index),
+                'content': f"Commentaire généré {index}",
+                'user_id': _generated_id(seed, 'user', author),
+                'post_id': _generated_id(seed, 'post', post_index),
+                'created_at': post_created_at(post_index) + rng.randrange(24 * 3600 * 1000)
+            }
+
+    total_likes = total_posts * likes_per_post if users else 0
+
+    def generate_likes():
+        rng = random.Random(f"{seed}:likes")
+        for _ in range(total_likes):
+            user = rng.choices(population, cum_weights=cum_weights)[0]
+            yield {
+                'user_id': _generated_id(seed, 'user', user),
+                'post_id': _generated_id(seed, 'post', popular_post(rng))
+            }
+
+    print(f"Génération : {users} utilisateurs, ~{total_friendships} amitiés, "
+          f"{total_posts} posts, {total_comments} commentaires, {total_likes} likes")
+    phases = [
+        ('users', generate_users(), users, User.bulk_create),
+        ('friendships', generate_friendships(), total_friendships, User.bulk_add_friends),
+        ('posts', generate_posts(), total_posts, Post.bulk_create),
+        ('comments', generate_comments(), total_comments, Comment.bulk_create),
+        ('likes', generate_likes(), total_likes, Post.bulk_like),
+    ]
+    start = time.time()
+    for name, items, total, write in phases:
+        _write_phase(name, items, total, write, batch_size, checkpoint, checkpoint_path)
+
+    print(f"Génération terminée en {time.time() - start:.1f}s")
+    return checkpoint['done']
+
+
+def rebuild_timelines(batch_size=10000):
+    """Reconstruit le fil matérialisé de chaque utilisateur, par pages d'utilisateurs"""
+    if timelines is None:
+        print("Fils d'actualité matérialisés désactivés (TIMELINE_ENABLED=False)")
+        return 0
+    start = time.time()
+    rebuilt = 0
+    after = None
+    while True:
+        users = User.find_all(limit=batch_size, after=after)
+        for user in users:
+            Post.rebuild_timeline(user.id)
+        rebuilt += len(users)
+        if len(users) < batch_size:
+            break
+        after = (users[-1].created_at, users[-1].id)
+        print(f"  {rebuilt} fils reconstruits")
+    print(f"{rebuilt} fils reconstruits en {time.time() - start:.1f}s")
+    return rebuilt
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Initialise la base de données avec des données de test "
+                    "ou génère un graphe synthétique (--users)")
+    parser.add_argument('--users', type=int, help="nombre d'utilisateurs à générer")
+    parser.add_argument('--avg-friends', type=int, default=20)
+    parser.add_argument('--posts-per-user', type=int, default=5)
+    parser.add_argument('--comments-per-post', type=int, default=2)
+    parser.add_argument('--likes-per-post', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--reset', action='store_true', help="vider la base avant la génération")
+    parser.add_argument('--checkpoint', default='.db_init_checkpoint.json',
+                        help="fichier d'avancement utilisé pour la reprise")
+    parser.add_argument('--repair-counters', action='store_true',
+                        help="recalculer les compteurs de likes, commentaires et amis")
+    parser.add_argument('--rebuild-timelines', action='store_true',
+                        help="reconstruire les fils d'actualité matérialisés (TIMELINE_ENABLED)")
+    parser.add_argument('--build-recommendations', action='store_true',
+                        help="recalculer la table des amis suggérés")
+    return parser.parse_args(argv)
+
+
 if __name__ == "__main__":
+    args = parse_args()
     app = create_app()
     with app.app_context():
-        init_db()
+        if args.repair_counters:
+            print("Recalcul des compteurs...")
+            report = repair_counters(db, batch_size=args.batch_size)
+            print(f"Compteurs recalculés : {report}")
+        elif args.rebuild_timelines:
+            rebuild_timelines(batch_size=args.batch_size)
+        elif args.build_recommendations:
+            print("Calcul des recommandations d'amis...")
+            start = time.time()
+            count = build_recommendations(
+                db, top_k=Config.RECOMMENDATIONS_TOP_K, batch_size=args.batch_size,
+                progress=lambda written, total: print(f"  {written}/{total} utilisateurs"))
+            print(f"Recommandations calculées pour {count} utilisateurs en {time.time() - start:.1f}s")
+        elif args.users is None:
+            init_db()
+        else:
+            generate_db(
+                args.users,
+                avg_friends=args.avg_friends,
+                posts_per_user=args.posts_per_user,
+                comments_per_post=args.comments_per_post,
+                likes_per_post=args.likes_per_post,
+                seed=args.seed,
+                batch_size=args.batch_size,
+                reset=args.reset,
+                checkpoint_path=args.checkpoint
+            )
+        # Écritures faites hors des routes : invalider les ETag déjà émises
+        bump_all()
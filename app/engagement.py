@@ -0,0 +1,68 @@
+﻿# Données d'engagement des listes de posts et de commentaires
+#
+# `?include=likes_count,comment_count` ajoute les compteurs à chaque élément
+# (ils sont lus avec le nœud, voir app.counters) et `?viewer=<user_id>`
+# ajoute `liked_by_me`, calculé dans la requête de la page elle-même.
+from flask import request
+
+# Champ demandé dans ?include= -> attribut du modèle
+INCLUDE_FIELDS = {
+    'likes_count': 'like_count',
+    'comment_count': 'comment_count'
+}
+
+
+def get_engagement_params(allowed, args=None):
+    """Lit les paramètres ?include= et ?viewer= de la requête courante
+
+    Retourne un tuple (include, viewer_id). Lève ValueError si un champ
+    de `include` ne fait pas partie de `allowed`. `args` remplace les
+    paramètres de la requête Flask courante.
+    """
+    args = request.args if args is None else args
+    include = [field.strip() for field in args.get('include', '').split(',') if field.strip()]
+    unknown = [field for field in include if field not in allowed]
+    if unknown:
+        raise ValueError(f"Paramètre include invalide : {', '.join(unknown)} "
+                         f"(valeurs possibles : {', '.join(allowed)})")
+    return include, args.get('viewer') or None
+
+
+def liked_by_clause(var, viewer_id):
+    """Construit la colonne `liked_by_me` d'une requête de liste
+
+    Retourne un tuple (colonne, paramètres) à ajouter au RETURN ; rien
+    si aucun lecteur n'est précisé.
+    """
+    if viewer_id is None:
+        return "", {}
+    column = f", EXISTS {{ (:User {{id: $viewer_id}})-[:LIKES]->({var}) }} AS liked_by_me"
+    return column, {"viewer_id": viewer_id}
+
+
+def liked_by_field(var, viewer_id):
+    """Construit l'entrée `liked_by_me` d'une projection de liste (voir `liked_by_clause`)"""
+    if viewer_id is None:
+        return "", {}
+    field = f", liked_by_me: EXISTS {{ (:User {{id: $viewer_id}})-[:LIKES]->({var}) }}"
+    return field, {"viewer_id": viewer_id}
+
+
+def engagement_dict(item, include=(), viewer_id=None):
+    """Sérialise un post ou un commentaire avec les données demandées"""
+    data = item.to_dict()
+    for field in include:
+        data[field] = getattr(item, INCLUDE_FIELDS[field])
+    if viewer_id is not None:
+        data['liked_by_me'] = bool(item.liked_by_me)
+    return data
+
+
+def engagement_row(row, include=()):
+    """Équivalent d'`engagement_dict` pour une ligne déjà projetée par la requête
+
+    La ligne contient déjà les compteurs et, avec un lecteur, `liked_by_me`.
+    """
+    for field in include:
+        row[field] = row[INCLUDE_FIELDS[field]]
+    return row
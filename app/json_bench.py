@@ -0,0 +1,82 @@
+﻿# Mesure de l'encodage et du décodage JSON
+#
+#   python -m app.json_bench --items 10000
+#
+# Compare les fournisseurs JSON (voir app.json_provider) sur une réponse de
+# liste de `items` posts (jsonify, comme les routes) et sur le décodage d'un
+# corps d'écriture en masse de `items` posts, puis mesure la validation de
+# ce corps par son schéma.
+import argparse
+import json
+import time
+import uuid
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from .json_provider import OrjsonProvider, orjson
+from .schemas import POST_BULK_ITEM
+
+
+def sample_posts(count):
+    """Lignes de posts de la forme de `Post.to_dict()` (avec `liked_by_me`)"""
+    now = int(time.time() * 1000)
+    return [{
+        'id': str(uuid.uuid4()),
+        'title': f'Post numéro {index}',
+        'content': 'Contenu du post, avec quelques caractères accentués : éàü. ' * 4,
+        'created_at': now - index,
+        'user_id': str(uuid.uuid4()),
+        'like_count': index % 97,
+        'comment_count': index % 13,
+        'liked_by_me': index % 2 == 0
+    } for index in range(count)]
+
+
+def best_ms(func, repeat):
+    """Meilleur temps de `repeat` exécutions, en millisecondes"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best * 1000, 2)
+
+
+def run_bench(items=10000, repeat=20):
+    """Retourne les temps par fournisseur : {'default': {...}, 'orjson': {...}, 'validate_ms'}"""
+    posts = sample_posts(items)
+    body = json.dumps([{key: post[key] for key in ('id', 'title', 'content', 'user_id', 'created_at')}
+                       for post in posts]).encode()
+    providers = {'default': DefaultJSONProvider}
+    if orjson is not None:
+        providers['orjson'] = OrjsonProvider
+
+    results = {}
+    for name, provider_class in providers.items():
+        app = Flask(__name__)
+        app.json = provider_class(app)
+        with app.app_context():
+            response = app.json.response(status='success', posts=posts, next_cursor=None)
+            results[name] = {
+                'encode_ms': best_ms(lambda: app.json.response(status='success', posts=posts,
+                                                               next_cursor=None), repeat),
+                'decode_ms': best_ms(lambda: app.json.loads(body), repeat),
+                'response_bytes': len(response.get_data())
+            }
+
+    decoded = json.loads(body)
+    results['validate_ms'] = best_ms(lambda: [POST_BULK_ITEM.validate(item) for item in decoded], repeat)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Mesure des fournisseurs JSON")
+    parser.add_argument('--items', type=int, default=10000, help="éléments par réponse ou corps")
+    parser.add_argument('--repeat', type=int, default=20, help="exécutions par mesure (meilleur temps)")
+    args = parser.parse_args()
+    results = run_bench(args.items, args.repeat)
+    print(json.dumps(results, indent=2))
+    if 'orjson' in results:
+        for field in ('encode_ms', 'decode_ms'):
+            speedup = results['default'][field] / results['orjson'][field]
+            print(f"{field} : orjson {speedup:.1f} x plus rapide")
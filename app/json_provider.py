@@ -0,0 +1,71 @@
+﻿# Encodage JSON des réponses et décodage des corps de requête
+#
+# Le fournisseur est choisi par JSON_PROVIDER :
+#   'orjson'        encodage et décodage en C (paquet orjson), par défaut
+#   'default'       module json de la bibliothèque standard (Flask par défaut)
+#   'module:Classe' sous-classe de flask.json.provider.JSONProvider
+import importlib
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class OrjsonProvider(JSONProvider):
+    """Fournisseur JSON de Flask basé sur orjson
+
+    orjson encode directement en bytes, sans passer par une chaîne Python.
+    Les types non natifs (dates, Decimal...) sont convertis comme par le
+    fournisseur par défaut. Comme lui, les réponses sont indentées en mode
+    debug ; les clés ne sont triées que si `sort_keys` est vrai.
+    """
+
+    sort_keys = False
+    compact = None
+    mimetype = 'application/json'
+
+    def _options(self, indent=False):
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps_bytes(self, obj, indent=False):
+        return orjson.dumps(obj, default=DefaultJSONProvider.default, option=self._options(indent))
+
+    def dumps(self, obj, **kwargs):
+        return self.dumps_bytes(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        return self._app.response_class(self.dumps_bytes(obj, indent) + b'\n', mimetype=self.mimetype)
+
+
+def create_json_provider(app, name):
+    """Construit le fournisseur JSON `name` pour `app` (None : celui de Flask)"""
+    if name == 'default':
+        return None
+    if name == 'orjson':
+        if orjson is None:
+            print("orjson non installé : encodage JSON de la bibliothèque standard")
+            return None
+        return OrjsonProvider(app)
+    module_name, _, class_name = name.partition(':')
+    if not class_name:
+        raise ValueError(f"Fournisseur JSON inconnu : {name}")
+    return getattr(importlib.import_module(module_name), class_name)(app)
+
+
+def init_json(app):
+    """Installe sur `app` le fournisseur JSON configuré (JSON_PROVIDER)"""
+    provider = create_json_provider(app, app.config.get('JSON_PROVIDER', 'orjson'))
+    if provider is not None:
+        app.json = provider
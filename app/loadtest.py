@@ -0,0 +1,120 @@
+﻿# Mesure de débit d'un serveur en cours d'exécution
+#
+#   python -m app.loadtest --url http://127.0.0.1:5000 --concurrency 64 --duration 30
+#
+# Charge de travail fixe, identique pour chaque modèle de processus : des
+# lectures mélangées (utilisateur, post, fil d'actualité, page de posts,
+# commentaires d'un post) sur des IDs lus au démarrage. Chaque client garde
+# sa connexion HTTP ouverte (keep-alive). Le serveur doit contenir des
+# données (python -m app.db_init --users ...).
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+# (poids, gabarit d'URL) ; {user} et {post} sont tirés au hasard
+WORKLOAD = [
+    (30, '/users/{user}'),
+    (30, '/posts/{post}'),
+    (20, '/users/{user}/feed?limit=20'),
+    (10, '/posts?limit=20'),
+    (10, '/comments/posts/{post}/comments')
+]
+
+
+def _connection(url):
+    parts = urlsplit(url)
+    connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+    return connection_class(parts.hostname, parts.port, timeout=60)
+
+
+def _get_json(url, path):
+    connection = _connection(url)
+    connection.request('GET', path)
+    response = connection.getresponse()
+    data = json.loads(response.read())
+    connection.close()
+    return data
+
+
+def load_ids(url, sample=1000):
+    """Lit des IDs d'utilisateurs et de posts existants"""
+    users = _get_json(url, f'/users?limit={sample}').get('users', [])
+    posts = _get_json(url, f'/posts?limit={sample}').get('posts', [])
+    if not users or not posts:
+        raise ValueError("Le serveur ne contient aucun utilisateur ou aucun post")
+    return [user['id'] for user in users], [post['id'] for post in posts]
+
+
+def run_load(url, concurrency=64, duration=30.0, warmup=5.0, seed=42):
+    """Envoie la charge pendant `warmup + duration` secondes
+
+    Seules les réponses reçues après l'échauffement sont comptées.
+    Retourne {'requests', 'errors', 'rps', 'p50_ms', 'p99_ms'}.
+    """
+    user_ids, post_ids = load_ids(url)
+    weights = [weight for weight, _ in WORKLOAD]
+    templates = [template for _, template in WORKLOAD]
+    start = time.monotonic()
+    measure_from = start + warmup
+    stop_at = measure_from + duration
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def client(index):
+        rng = random.Random(seed + index)
+        connection = _connection(url)
+        local_latencies, local_errors = [], 0
+        while True:
+            now = time.monotonic()
+            if now >= stop_at:
+                break
+            path = rng.choices(templates, weights)[0].format(
+                user=rng.choice(user_ids), post=rng.choice(post_ids))
+            try:
+                connection.request('GET', path)
+                response = connection.getresponse()
+                response.read()
+                failed = response.status >= 500
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = _connection(url)
+                failed = True
+            end = time.monotonic()
+            if now >= measure_from:
+                local_latencies.append(end - now)
+                local_errors += failed
+        connection.close()
+        with lock:
+            latencies.extend(local_latencies)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    count = len(latencies)
+    return {
+        'requests': count,
+        'errors': errors[0],
+        'rps': round(count / duration, 1),
+        'p50_ms': round(latencies[count // 2] * 1000, 2) if count else None,
+        'p99_ms': round(latencies[min(count - 1, int(count * 0.99))] * 1000, 2) if count else None
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Mesure de débit de l'API")
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--concurrency', type=int, default=64, help="clients simultanés")
+    parser.add_argument('--duration', type=float, default=30, help="durée mesurée (s)")
+    parser.add_argument('--warmup', type=float, default=5, help="échauffement non compté (s)")
+    args = parser.parse_args()
+    print(json.dumps(run_load(args.url, args.concurrency, args.duration, args.warmup)))
@@ -0,0 +1,279 @@
+﻿# Mesures de la couche base de données et des routes, exposées au format Prometheus
+#
+#   GET /metrics     format texte Prometheus (METRICS_ENABLED)
+#   GET /db/stats    résumé JSON par requête nommée
+#
+# Chaque requête Cypher est mesurée sous son nom stable (Query.name) :
+# durée jusqu'à la dernière ligne lue, lignes retournées, erreurs. Une
+# requête plus lente que SLOW_QUERY_MS est journalisée, paramètres masqués.
+# Les mesures sont propres à chaque processus (un processus par scrape).
+import threading
+import time
+from flask import Response, g, has_request_context, request
+from .config import Config
+
+DB_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 1000)
+
+PROMETHEUS_MIMETYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _labels(names, values):
+    return ','.join(f'{name}="{value}"' for name, value in zip(names, values))
+
+
+class Histogram:
+    """Histogramme cumulatif par jeu de valeurs d'étiquettes"""
+
+    def __init__(self, name, help, labels, buckets):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_values, value):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0, 0.0]
+            counts = series[0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            series[1] += 1
+            series[2] += value
+
+    def series(self):
+        """{valeurs d'étiquettes : (nombre, somme)}"""
+        with self._lock:
+            return {label_values: (series[1], series[2]) for label_values, series in self._series.items()}
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for label_values, (counts, count, total) in sorted(self._series.items()):
+                labels = _labels(self.labels, label_values)
+                prefix = labels + ',' if labels else ''
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {bucket_count}')
+                lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {count}')
+                lines.append(f'{self.name}_sum{{{labels}}} {total}')
+                lines.append(f'{self.name}_count{{{labels}}} {count}')
+        return lines
+
+
+class Counter:
+    """Compteur par jeu de valeurs d'étiquettes"""
+
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def values(self):
+        with self._lock:
+            return dict(self._values)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        for label_values, value in sorted(self.values().items()):
+            lines.append(f'{self.name}{{{_labels(self.labels, label_values)}}} {value}')
+        return lines
+
+
+def redact(params):
+    """Paramètres d'une requête sans leurs valeurs : type et taille seulement"""
+    redacted = {}
+    for key, value in params.items():
+        if isinstance(value, (str, list, tuple, dict)):
+            redacted[key] = f'<{type(value).__name__}:{len(value)}>'
+        else:
+            redacted[key] = f'<{type(value).__name__}>'
+    return redacted
+
+
+class TimedCursor:
+    """Curseur qui enregistre la requête une fois lu (liste complète, fin ou arrêt du parcours)
+
+    Un curseur jamais lu est enregistré à sa destruction, avec la durée
+    mesurée au retour de `run`.
+    """
+
+    def __init__(self, cursor, metrics, name, params, start):
+        self._cursor = cursor
+        self._metrics = metrics
+        self._name = name
+        self._params = params
+        self._start = start
+        self._returned_at = time.perf_counter()
+        self._done = False
+
+    def _finish(self, rows, end=None):
+        if not self._done:
+            self._done = True
+            self._metrics.record(self._name, (end or time.perf_counter()) - self._start, rows, self._params)
+
+    def __iter__(self):
+        rows = 0
+        try:
+            for record in self._cursor:
+                rows += 1
+                yield record
+        finally:
+            self._finish(rows)
+
+    def data(self):
+        data = self._cursor.data()
+        self._finish(len(data))
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __del__(self):
+        if not self.__dict__.get('_done', True):
+            self._finish(0, self._returned_at)
+
+
+class QueryMetrics:
+    """Mesures des requêtes Cypher, par nom de requête"""
+
+    def __init__(self, slow_query_ms=100):
+        self.slow_query_ms = slow_query_ms
+        self.duration = Histogram('db_query_duration_seconds', "Durée des requêtes Cypher",
+                                  ('query',), DB_BUCKETS)
+        self.rows = Counter('db_query_rows_total', "Lignes retournées par les requêtes Cypher", ('query',))
+        self.errors = Counter('db_query_errors_total', "Requêtes Cypher en erreur", ('query',))
+        self.slow = Counter('db_slow_queries_total', "Requêtes plus lentes que SLOW_QUERY_MS", ('query',))
+
+    def run(self, run, query, params):
+        """Exécute `run(query, **params)` et retourne un curseur mesuré"""
+        name = getattr(query, 'name', 'unnamed')
+        if has_request_context():
+            g._db_queries = g.get('_db_queries', 0) + 1
+        start = time.perf_counter()
+        try:
+            cursor = run(query, **params)
+        except Exception as e:
+            self.errors.inc((name,))
+            print(f"Requête {name} en erreur ({type(e).__name__}) : {e} ; paramètres {redact(params)}")
+            raise
+        return TimedCursor(cursor, self, name, params, start)
+
+    def record(self, name, seconds, rows, params):
+        self.duration.observe((name,), seconds)
+        self.rows.inc((name,), rows)
+        if self.slow_query_ms and seconds * 1000 >= self.slow_query_ms:
+            self.slow.inc((name,))
+            print(f"Requête lente {name} : {seconds * 1000:.1f} ms, {rows} lignes, paramètres {redact(params)}")
+
+    def summary(self):
+        """Résumé par requête, de la plus coûteuse (temps total) à la moins coûteuse"""
+        rows = self.rows.values()
+        errors = self.errors.values()
+        summary = [{
+            'query': label_values[0],
+            'count': count,
+            'total_ms': round(total * 1000, 3),
+            'avg_ms': round(total * 1000 / count, 3) if count else 0,
+            'rows': rows.get(label_values, 0),
+            'errors': errors.get(label_values, 0)
+        } for label_values, (count, total) in self.duration.series().items()]
+        return sorted(summary, key=lambda entry: entry['total_ms'], reverse=True)
+
+    def render(self):
+        return self.duration.render() + self.rows.render() + self.errors.render() + self.slow.render()
+
+
+class RequestMetrics:
+    """Mesures des requêtes HTTP, par route (endpoint Flask)"""
+
+    def __init__(self):
+        self.duration = Histogram('http_request_duration_seconds', "Durée des requêtes HTTP",
+                                  ('endpoint', 'method', 'status'), HTTP_BUCKETS)
+        self.queries = Histogram('http_request_db_queries', "Requêtes Cypher par requête HTTP",
+                                 ('endpoint',), COUNT_BUCKETS)
+
+    def render(self):
+        return self.duration.render() + self.queries.render()
+
+
+class RecommendationMetrics:
+    """Lots de deltas de recommandations appliqués hors des requêtes (voir app.recommendations)"""
+
+    def __init__(self):
+        self.flushes = Counter('recommendations_flushes_total',
+                               "Lots de deltas de recommandations appliqués ou en erreur", ('result',))
+        self.dropped = Counter('recommendations_dropped_deltas_total',
+                               "Deltas de recommandations perdus (corrigés par --build-recommendations)",
+                               ('reason',))
+
+    def render(self):
+        return self.flushes.render() + self.dropped.render()
+
+
+def render_limiter(stats):
+    """Statistiques du limiteur de requêtes (db.stats()) au format Prometheus"""
+    gauges = (('db_limiter_max_size', 'max_size', "Requêtes Cypher en cours au plus"),
+              ('db_limiter_in_use', 'in_use', "Requêtes Cypher en cours"),
+              ('db_limiter_waiting', 'waiting', "Requêtes en attente d'une place"),
+              ('db_limiter_connected', 'connected', "Connexion ouverte (1) ou non (0)"))
+    counters = (('db_limiter_acquired_total', 'acquired', "Places prises depuis le démarrage"),
+                ('db_limiter_timeouts_total', 'timeouts', "Attentes de place abandonnées"),
+                ('db_limiter_reconnects_total', 'reconnects', "Reconnexions après une connexion perdue"))
+    lines = []
+    for kind, metrics in (('gauge', gauges), ('counter', counters)):
+        for name, key, help in metrics:
+            lines += [f'# HELP {name} {help}', f'# TYPE {name} {kind}', f'{name} {int(stats[key])}']
+    lines += ['# HELP db_limiter_wait_seconds_total Attente cumulée des places',
+              '# TYPE db_limiter_wait_seconds_total counter',
+              f"db_limiter_wait_seconds_total {stats['wait_ms_total'] / 1000}"]
+    return lines
+
+
+query_metrics = QueryMetrics(slow_query_ms=Config.SLOW_QUERY_MS)
+request_metrics = RequestMetrics()
+recommendation_metrics = RecommendationMetrics()
+
+
+def _start_request():
+    g._request_started = time.perf_counter()
+
+
+def _record_request(response):
+    started = g.get('_request_started')
+    if started is not None:
+        request_metrics.duration.observe(
+            (request.endpoint or 'unmatched', request.method, str(response.status_code)),
+            time.perf_counter() - started)
+    return response
+
+
+def _record_queries(exception=None):
+    # Après la fin des réponses en flux : toutes leurs requêtes sont comptées
+    if '_request_started' in g:
+        request_metrics.queries.observe((request.endpoint or 'unmatched',), g.get('_db_queries', 0))
+
+
+def init_metrics(app, db):
+    """Mesure les routes de `app` et ajoute GET /metrics"""
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    app.before_request(_start_request)
+    app.after_request(_record_request)
+    app.teardown_request(_record_queries)
+
+    @app.route('/metrics')
+    def metrics():
+        lines = (query_metrics.render() + request_metrics.render() + recommendation_metrics.render()
+                 + render_limiter(db.stats()))
+        return Response('\n'.join(lines) + '\n', content_type=PROMETHEUS_MIMETYPE)
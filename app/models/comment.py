@@ -1,16 +1,97 @@
 ﻿from app import db
-from py2neo import Node, Relationship
+from app.database import Query
 import uuid
 import time
-from .user import User
+from app.pagination import keyset_clause, limit_clause
+from app.engagement import liked_by_field
+from app.bulk import bulk_write
+from app.schemas import COMMENT_BULK_ITEM, COMMENT_LIKE_BULK_ITEM
+from app.cache import find_entity, invalidate_entity
+from app.status import CREATED, ALREADY_EXISTED, REMOVED
+from app.versions import POSTS, bump, bump_all, comments_key, post_key
+
+# Requêtes partagées avec l'application asynchrone (voir app.aio.models)
+
+FIND_BY_ID_QUERY = Query("comment.find_by_id", """
+MATCH (c:Comment {id: $comment_id})
+OPTIONAL MATCH (u:User)-[:CREATED]->(c)
+OPTIONAL MATCH (p:Post)-[:HAS_COMMENT]->(c)
+RETURN c, u.id as user_id, p.id as post_id
+""")
+
+ADD_LIKE_QUERY = Query("comment.add_like", """
+OPTIONAL MATCH (u:User {id: $user_id})
+OPTIONAL MATCH (c:Comment {id: $comment_id})
+OPTIONAL MATCH (p:Post)-[:HAS_COMMENT]->(c)
+FOREACH (_ IN CASE WHEN u IS NOT NULL AND c IS NOT NULL THEN [1] ELSE [] END |
+    MERGE (u)-[r:LIKES]->(c)
+    ON CREATE SET r._new = true, c.like_count = coalesce(c.like_count, 0) + 1)
+WITH u, c, p
+OPTIONAL MATCH (u)-[r:LIKES]->(c)
+WITH u, c, p, collect(r) AS likes
+WITH u, c, p, likes, any(r IN likes WHERE r._new) AS created
+FOREACH (r IN likes | REMOVE r._new)
+RETURN CASE
+    WHEN u IS NULL THEN 'user_missing'
+    WHEN c IS NULL THEN 'target_missing'
+    WHEN created THEN 'created'
+    ELSE 'already_existed'
+END AS status, p.id AS post_id
+""")
+
+REMOVE_LIKE_QUERY = Query("comment.remove_like", """
+OPTIONAL MATCH (u:User {id: $user_id})
+OPTIONAL MATCH (c:Comment {id: $comment_id})
+OPTIONAL MATCH (u)-[r:LIKES]->(c)
+OPTIONAL MATCH (p:Post)-[:HAS_COMMENT]->(c)
+WITH u, c, p, r, r IS NOT NULL AS existed
+DELETE r
+FOREACH (_ IN CASE WHEN existed THEN [1] ELSE [] END |
+    SET c.like_count = CASE WHEN c.like_count > 0 THEN c.like_count - 1 ELSE 0 END)
+RETURN CASE
+    WHEN u IS NULL THEN 'user_missing'
+    WHEN c IS NULL THEN 'target_missing'
+    WHEN existed THEN 'removed'
+    ELSE 'not_found'
+END AS status, p.id AS post_id
+""")
+
+
+def comment_projection(viewer_id=None):
+    """Projection d'un commentaire `c` (auteur `u`, post `p`) vers le dictionnaire de `to_dict()`
+
+    Avec `viewer_id`, la ligne contient aussi `liked_by_me`. Retourne
+    (projection, paramètres).
+    """
+    liked_by, params = liked_by_field("c", viewer_id)
+    projection = (f"c {{.id, .content, .created_at, user_id: u.id, post_id: p.id, "
+                  f"like_count: coalesce(c.like_count, 0){liked_by}}}")
+    return projection, params
+
+
+def find_by_post_query(post_id, viewer_id=None):
+    """Requête des commentaires d'un post : retourne (requête, paramètres)"""
+    projection, projection_params = comment_projection(viewer_id)
+    query = Query("comment.find_by_post", f"""
+    MATCH (p:Post {{id: $post_id}})-[:HAS_COMMENT]->(c:Comment)
+    MATCH (u:User)-[:CREATED]->(c)
+    RETURN {projection} AS comment
+    ORDER BY c.created_at DESC
+    """)
+    return query, {'post_id': post_id, **projection_params}
+
 
 class Comment:
+    __slots__ = ('content', 'user_id', 'post_id', 'id', 'created_at', 'like_count', 'liked_by_me')
+    
     def __init__(self, content=None, user_id=None, post_id=None, comment_id=None):
         self.content = content
         self.user_id = user_id
         self.post_id = post_id
         self.id = comment_id or str(uuid.uuid4())
         self.created_at = int(time.time() * 1000)  # timestamp en millisecondes
+        self.like_count = 0  # compteur maintenu en base (voir app.counters)
+        self.liked_by_me = None  # renseigné par les listes lues avec ?viewer=
     
     def to_dict(self):
         return {
@@ -18,63 +99,75 @@ class Comment:
             "content": self.content,
             "user_id": self.user_id,
             "post_id": self.post_id,
-            "created_at": self.created_at
+            "created_at": self.created_at,
+            "like_count": self.like_count
         }
     
     @staticmethod
     def from_node(node):
-        """Convertit un nœud Neo4j en objet Comment"""
+        """Convertit un nœud Neo4j, une ligne projetée ou un instantané du cache en objet Comment
+
+        L'objet est construit sans passer par `__init__`, qui générerait un
+        UUID et un horodatage aussitôt remplacés.
+        """
         if not node:
             return None
-        comment = Comment()
+        comment = Comment.__new__(Comment)
         comment.id = node.get("id")
         comment.content = node.get("content")
         comment.created_at = node.get("created_at")
+        comment.user_id = node.get("user_id")
+        comment.post_id = node.get("post_id")
+        comment.like_count = node.get("like_count") or 0
+        comment.liked_by_me = node.get("liked_by_me")
         return comment
     
     def save(self):
-        """Crée ou met à jour un commentaire dans la base de données"""
-        # Vérifier si l'utilisateur et le post existent
-        from .post import Post
-        
-        user = User.find_by_id(self.user_id)
-        post = Post.find_by_id(self.post_id)
+        """Crée ou met à jour un commentaire dans la base de données
+
+        La vérification de l'auteur et du post, l'écriture du commentaire et
+        ses deux relations sont faites en une seule requête, donc dans une
+        seule transaction : aucun commentaire orphelin ne peut être créé.
+        """
+        query = Query("comment.save", """
+        OPTIONAL MATCH (u:User {id: $user_id})
+        OPTIONAL MATCH (p:Post {id: $post_id})
+        FOREACH (_ IN CASE WHEN u IS NOT NULL AND p IS NOT NULL THEN [1] ELSE [] END |
+            MERGE (c:Comment {id: $comment_id})
+            ON CREATE SET c.created_at = $created_at, c.like_count = 0
+            SET c.content = $content
+            MERGE (u)-[:CREATED]->(c)
+            MERGE (p)-[:HAS_COMMENT]->(c)
+            ON CREATE SET p.comment_count = coalesce(p.comment_count, 0) + 1)
+        WITH u, p
+        OPTIONAL MATCH (c:Comment {id: $comment_id})
+        RETURN u IS NOT NULL AS user_found, p IS NOT NULL AS post_found, c
+        """)
+        result = db.run(query, user_id=self.user_id, post_id=self.post_id, comment_id=self.id,
+                        content=self.content, created_at=self.created_at).data()[0]
         
-        if not user:
+        if not result.get('user_found'):
             raise ValueError(f"Utilisateur avec l'ID {self.user_id} non trouvé")
-        if not post:
+        if not result.get('post_found'):
             raise ValueError(f"Post avec l'ID {self.post_id} non trouvé")
         
-        # Créer ou mettre à jour le commentaire
-        comment_node = Node("Comment", 
-                           id=self.id, 
-                           content=self.content, 
-                           created_at=self.created_at)
-        
-        # Fusionner le nœud du commentaire en utilisant l'ID comme clé
-        db.merge(comment_node, "Comment", "id")
-        
-        # Créer les relations entre l'utilisateur, le post et le commentaire
-        query = """
-        MATCH (u:User {id: }), (p:Post {id: }), (c:Comment {id: })
-        MERGE (u)-[r1:CREATED]->(c)
-        MERGE (p)-[r2:HAS_COMMENT]->(c)
-        RETURN r1, r2
-        """
-        db.run(query, user_id=self.user_id, post_id=self.post_id, comment_id=self.id)
+        self.created_at = result.get('c').get('created_at')
+        self.like_count = result.get('c').get('like_count') or 0
+        invalidate_entity('comment', self.id)
+        invalidate_entity('post', self.post_id)
+        bump(POSTS, post_key(self.post_id), comments_key(self.post_id))
         
         return self
     
     @staticmethod
     def find_by_id(comment_id):
-        """Trouve un commentaire par son ID"""
-        query = """
-        MATCH (c:Comment {id: })
-        OPTIONAL MATCH (u:User)-[:CREATED]->(c)
-        OPTIONAL MATCH (p:Post)-[:HAS_COMMENT]->(c)
-        RETURN c, u.id as user_id, p.id as post_id
-        """
-        result = db.run(query, comment_id=comment_id).data()
+        """Trouve un commentaire par son ID (carte d'identité, cache d'entités, puis base)"""
+        return find_entity('comment', comment_id, Comment.from_node, Comment._load)
+    
+    @staticmethod
+    def _load(comment_id):
+        """Lit un commentaire, son auteur et son post dans la base"""
+        result = db.run(FIND_BY_ID_QUERY, comment_id=comment_id).data()
         if result:
             comment = Comment.from_node(result[0].get('c'))
             comment.user_id = result[0].get('user_id')
@@ -83,75 +176,160 @@ class Comment:
         return None
     
     @staticmethod
-    def find_all():
-        """Récupère tous les commentaires"""
-        query = """
-        MATCH (u:User)-[:CREATED]->(c:Comment)<-[:HAS_COMMENT]-(p:Post)
-        RETURN c, u.id as user_id, p.id as post_id
-        ORDER BY c.created_at DESC
+    def iter_all(limit=None, after=None, viewer_id=None):
+        """Parcourt les commentaires, du plus récent au plus ancien, sans
+        charger tout le résultat en mémoire
+
+        `after` est une position (created_at, id) : seuls les commentaires
+        situés après cette position sont retournés. Avec `viewer_id`, chaque
+        commentaire indique dans `liked_by_me` si ce lecteur l'a aimé.
         """
-        results = db.run(query).data()
-        comments = []
-        for record in results:
-            comment = Comment.from_node(record.get('c'))
-            comment.user_id = record.get('user_id')
-            comment.post_id = record.get('post_id')
-            comments.append(comment)
-        return comments
+        for row in Comment.iter_all_rows(limit=limit, after=after, viewer_id=viewer_id):
+            yield Comment.from_node(row)
     
     @staticmethod
-    def find_by_post(post_id):
-        """Récupère tous les commentaires d'un post"""
-        query = """
-        MATCH (p:Post {id: })-[:HAS_COMMENT]->(c:Comment)
-        MATCH (u:User)-[:CREATED]->(c)
-        RETURN c, u.id as user_id
-        ORDER BY c.created_at DESC
+    def iter_all_rows(limit=None, after=None, viewer_id=None):
+        """Comme `iter_all`, mais retourne les dictionnaires projetés par la requête
+
+        Chaque ligne a la forme de `to_dict()` (plus `liked_by_me` avec un
+        lecteur) et peut être sérialisée telle quelle, sans objet Comment.
         """
-        results = db.run(query, post_id=post_id).data()
-        comments = []
-        for record in results:
-            comment = Comment.from_node(record.get('c'))
-            comment.user_id = record.get('user_id')
-            comment.post_id = post_id
-            comments.append(comment)
-        return comments
+        where, params = keyset_clause("c", after)
+        projection, projection_params = comment_projection(viewer_id)
+        query = Query("comment.find_all", f"""
+        MATCH (u:User)-[:CREATED]->(c:Comment)<-[:HAS_COMMENT]-(p:Post)
+        {where}
+        RETURN {projection} AS comment
+        ORDER BY c.created_at DESC, c.id DESC
+        {limit_clause(limit)}
+        """)
+        for record in db.stream(query, limit=limit, **params, **projection_params):
+            yield record['comment']
+    
+    @staticmethod
+    def find_all(limit=None, after=None, viewer_id=None):
+        """Récupère les commentaires, du plus récent au plus ancien"""
+        return list(Comment.iter_all(limit=limit, after=after, viewer_id=viewer_id))
+    
+    @staticmethod
+    def iter_by_post(post_id, viewer_id=None):
+        """Parcourt les commentaires d'un post sans charger tout le résultat en mémoire"""
+        for row in Comment.iter_by_post_rows(post_id, viewer_id=viewer_id):
+            yield Comment.from_node(row)
+    
+    @staticmethod
+    def iter_by_post_rows(post_id, viewer_id=None):
+        """Comme `iter_by_post`, avec les lignes projetées (voir `iter_all_rows`)"""
+        query, params = find_by_post_query(post_id, viewer_id=viewer_id)
+        for record in db.stream(query, **params):
+            yield record['comment']
+    
+    @staticmethod
+    def find_by_post(post_id, viewer_id=None):
+        """Récupère tous les commentaires d'un post"""
+        return list(Comment.iter_by_post(post_id, viewer_id=viewer_id))
+    
+    @staticmethod
+    def bulk_create(items, batch_size=1000):
+        """Crée ou met à jour des commentaires par lots (une requête UNWIND par lot)"""
+        def build_row(item):
+            row = Comment(content=item['content'], user_id=item['user_id'],
+                          post_id=item['post_id'], comment_id=item.get('id')).to_dict()
+            row['created_at'] = item.get('created_at') or row['created_at']
+            return row
+        
+        query = Query("comment.bulk_create", """
+        UNWIND $rows AS row
+        MATCH (u:User {id: row.user_id}), (p:Post {id: row.post_id})
+        MERGE (c:Comment {id: row.id})
+        ON CREATE SET c.created_at = row.created_at, c.like_count = 0
+        SET c.content = row.content
+        MERGE (u)-[r1:CREATED]->(c)
+        MERGE (p)-[r2:HAS_COMMENT]->(c)
+        ON CREATE SET p.comment_count = coalesce(p.comment_count, 0) + 1
+        RETURN row.key AS key
+        """)
+        results = bulk_write(items, COMMENT_BULK_ITEM, build_row, query,
+                             "Utilisateur ou post non trouvé", batch_size)
+        for result in results:
+            if 'id' in result:
+                invalidate_entity('comment', result['id'])
+                invalidate_entity('post', items[result['index']]['post_id'])
+        bump_all()
+        return results
+    
+    @staticmethod
+    def bulk_like(items, batch_size=1000):
+        """Ajoute des likes sur des commentaires par lots (une requête UNWIND par lot)"""
+        def build_row(item):
+            return {'user_id': item['user_id'], 'comment_id': item['comment_id']}
+        
+        query = Query("comment.bulk_like", """
+        UNWIND $rows AS row
+        MATCH (u:User {id: row.user_id}), (c:Comment {id: row.comment_id})
+        MERGE (u)-[r:LIKES]->(c)
+        ON CREATE SET c.like_count = coalesce(c.like_count, 0) + 1
+        RETURN row.key AS key
+        """)
+        results = bulk_write(items, COMMENT_LIKE_BULK_ITEM, build_row, query,
+                             "Utilisateur ou commentaire non trouvé", batch_size)
+        for result in results:
+            if result['status'] == 'success':
+                invalidate_entity('comment', items[result['index']]['comment_id'])
+        bump_all()
+        return results
     
     @staticmethod
     def delete(comment_id):
-        """Supprime un commentaire et toutes ses relations"""
-        query = """
-        MATCH (c:Comment {id: })
-        OPTIONAL MATCH (c)-[r]-()
-        DELETE r, c
+        """Supprime un commentaire et toutes ses relations
+
+        Le compteur `comment_count` du post est décrémenté dans la même requête.
         """
-        db.run(query, comment_id=comment_id)
+        query = Query("comment.delete", """
+        MATCH (c:Comment {id: $comment_id})
+        OPTIONAL MATCH (p:Post)-[:HAS_COMMENT]->(c)
+        SET p.comment_count = CASE WHEN p.comment_count > 0 THEN p.comment_count - 1 ELSE 0 END
+        WITH c, p.id AS post_id
+        DETACH DELETE c
+        RETURN post_id
+        """)
+        result = db.run(query, comment_id=comment_id).data()
+        invalidate_entity('comment', comment_id)
+        if result and result[0].get('post_id'):
+            post_id = result[0]['post_id']
+            invalidate_entity('post', post_id)
+            bump(POSTS, post_key(post_id), comments_key(post_id))
         return True
     
+    @staticmethod
+    def add_like(comment_id, user_id):
+        """Ajoute un like en une seule requête et retourne un statut (voir app.status)"""
+        result = db.run(ADD_LIKE_QUERY, user_id=user_id, comment_id=comment_id).data()
+        invalidate_entity('comment', comment_id)
+        status = result[0].get('status')
+        if status == CREATED:
+            bump(comments_key(result[0].get('post_id')))
+        return status
+    
+    @staticmethod
+    def remove_like(comment_id, user_id):
+        """Retire un like en une seule requête et retourne un statut (voir app.status)"""
+        result = db.run(REMOVE_LIKE_QUERY, user_id=user_id, comment_id=comment_id).data()
+        invalidate_entity('comment', comment_id)
+        status = result[0].get('status')
+        if status == REMOVED:
+            bump(comments_key(result[0].get('post_id')))
+        return status
+    
     def like(self, user_id):
         """Ajoute un like à un commentaire"""
-        query = """
-        MATCH (u:User {id: }), (c:Comment {id: })
-        MERGE (u)-[r:LIKES]->(c)
-        RETURN r
-        """
-        result = db.run(query, user_id=user_id, comment_id=self.id).data()
-        return bool(result)
+        return Comment.add_like(self.id, user_id) in (CREATED, ALREADY_EXISTED)
     
     def unlike(self, user_id):
         """Retire un like d'un commentaire"""
-        query = """
-        MATCH (u:User {id: })-[r:LIKES]->(c:Comment {id: })
-        DELETE r
-        """
-        db.run(query, user_id=user_id, comment_id=self.id)
+        Comment.remove_like(self.id, user_id)
         return True
     
     def get_likes_count(self):
-        """Récupère le nombre de likes d'un commentaire"""
-        query = """
-        MATCH (u:User)-[:LIKES]->(c:Comment {id: })
-        RETURN count(u) as likes_count
-        """
-        result = db.run(query, comment_id=self.id).data()
-        return result[0].get('likes_count') if result else 0
+        """Nombre de likes d'un commentaire (compteur lu avec le nœud, sans requête)"""
+        return self.like_count
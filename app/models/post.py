@@ -1,16 +1,157 @@
 ﻿from app import db
-from py2neo import Node, Relationship
+from app.database import Query
+from app.config import Config
+import heapq
+from itertools import islice
 import uuid
 import time
+from app.pagination import keyset_clause, limit_clause
+from app.engagement import liked_by_clause, liked_by_field
+from app.bulk import bulk_write
+from app.schemas import POST_BULK_ITEM, POST_LIKE_BULK_ITEM
+from app.cache import find_entity, invalidate_entity
+from app.status import CREATED, ALREADY_EXISTED, REMOVED
+from app.versions import POSTS, bump, bump_all, comments_key, post_key
+from app.timeline import timelines
 from .user import User
 
+# Requêtes partagées avec l'application asynchrone (voir app.aio.models)
+
+FIND_BY_ID_QUERY = Query("post.find_by_id", """
+MATCH (p:Post {id: $post_id})
+OPTIONAL MATCH (u:User)-[:CREATED]->(p)
+RETURN p, u.id as user_id
+""")
+
+ADD_LIKE_QUERY = Query("post.add_like", """
+OPTIONAL MATCH (u:User {id: $user_id})
+OPTIONAL MATCH (p:Post {id: $post_id})
+FOREACH (_ IN CASE WHEN u IS NOT NULL AND p IS NOT NULL THEN [1] ELSE [] END |
+    MERGE (u)-[r:LIKES]->(p)
+    ON CREATE SET r._new = true, p.like_count = coalesce(p.like_count, 0) + 1)
+WITH u, p
+OPTIONAL MATCH (u)-[r:LIKES]->(p)
+WITH u, p, collect(r) AS likes
+WITH u, p, likes, any(r IN likes WHERE r._new) AS created
+FOREACH (r IN likes | REMOVE r._new)
+RETURN CASE
+    WHEN u IS NULL THEN 'user_missing'
+    WHEN p IS NULL THEN 'target_missing'
+    WHEN created THEN 'created'
+    ELSE 'already_existed'
+END AS status
+""")
+
+REMOVE_LIKE_QUERY = Query("post.remove_like", """
+OPTIONAL MATCH (u:User {id: $user_id})
+OPTIONAL MATCH (p:Post {id: $post_id})
+OPTIONAL MATCH (u)-[r:LIKES]->(p)
+WITH u, p, r, r IS NOT NULL AS existed
+DELETE r
+FOREACH (_ IN CASE WHEN existed THEN [1] ELSE [] END |
+    SET p.like_count = CASE WHEN p.like_count > 0 THEN p.like_count - 1 ELSE 0 END)
+RETURN CASE
+    WHEN u IS NULL THEN 'user_missing'
+    WHEN p IS NULL THEN 'target_missing'
+    WHEN existed THEN 'removed'
+    ELSE 'not_found'
+END AS status
+""")
+
+
+def post_projection(author, viewer_id=None):
+    """Projection d'un post `p` vers le dictionnaire de `Post.to_dict()`
+
+    `author` est l'expression Cypher de l'ID de l'auteur. Avec `viewer_id`,
+    la ligne contient aussi `liked_by_me`. Retourne (projection, paramètres).
+    """
+    liked_by, params = liked_by_field("p", viewer_id)
+    projection = (f"p {{.id, .title, .content, .created_at, user_id: {author}, "
+                  f"like_count: coalesce(p.like_count, 0), "
+                  f"comment_count: coalesce(p.comment_count, 0){liked_by}}}")
+    return projection, params
+
+
+def find_all_query(limit=None, after=None, viewer_id=None):
+    """Requête d'une page de tous les posts : retourne (requête, paramètres)"""
+    where, params = keyset_clause("p", after)
+    projection, projection_params = post_projection("u.id", viewer_id)
+    query = Query("post.find_all", f"""
+    MATCH (u:User)-[:CREATED]->(p:Post)
+    {where}
+    RETURN {projection} AS post
+    ORDER BY p.created_at DESC, p.id DESC
+    {limit_clause(limit)}
+    """)
+    return query, {'limit': limit, **params, **projection_params}
+
+
+def find_by_user_query(user_id, viewer_id=None):
+    """Requête des posts d'un utilisateur : retourne (requête, paramètres)"""
+    projection, projection_params = post_projection("u.id", viewer_id)
+    query = Query("post.find_by_user", f"""
+    MATCH (u:User {{id: $user_id}})-[:CREATED]->(p:Post)
+    RETURN {projection} AS post
+    ORDER BY p.created_at DESC
+    """)
+    return query, {'user_id': user_id, **projection_params}
+
+
+def feed_query(user_id, limit=None, after=None, viewer_id=None):
+    """Requête d'une page du fil d'actualité : retourne (requête, paramètres)
+
+    Fusion bornée par la page : pour chaque ami, les `limit` premiers posts
+    après `after` sont lus dans l'index (author_id, created_at), déjà triés,
+    puis fusionnés. Le travail est de l'ordre de amis × `limit`, quel que
+    soit le nombre de posts de chaque ami.
+    """
+    cypher, params = authors_posts_cypher("MATCH (:User {id: $user_id})-[:FRIENDS_WITH]-(f:User)",
+                                          limit, after, viewer_id)
+    return Query("post.feed", cypher), {'user_id': user_id, **params}
+
+
+def authors_posts_cypher(authors, limit=None, after=None, viewer_id=None):
+    """Cypher des posts les plus récents d'un ensemble d'auteurs `f`, fusionnés
+
+    `authors` est le motif Cypher qui lie les auteurs `f`. Chaque auteur
+    est lu par l'index (author_id, created_at) : le tri par auteur suit
+    l'ordre de l'index et s'arrête après `limit` posts (author_id, constant
+    par auteur, figure dans l'ORDER BY pour que l'index fournisse l'ordre).
+    Retourne (cypher, paramètres).
+    """
+    where, params = keyset_clause("p", after)
+    projection, projection_params = post_projection("f.id", viewer_id)
+    cypher = f"""
+    {authors}
+    WITH DISTINCT f
+    CALL {{
+        WITH f
+        MATCH (p:Post {{author_id: f.id}})
+        {where}
+        RETURN p
+        ORDER BY p.author_id DESC, p.created_at DESC, p.id DESC
+        {limit_clause(limit)}
+    }}
+    RETURN {projection} AS post
+    ORDER BY p.created_at DESC, p.id DESC
+    {limit_clause(limit)}
+    """
+    return cypher, {'limit': limit, **params, **projection_params}
+
+
 class Post:
+    __slots__ = ('title', 'content', 'user_id', 'id', 'created_at', 'like_count', 'comment_count',
+                 'liked_by_me')
+    
     def __init__(self, title=None, content=None, user_id=None, post_id=None):
         self.title = title
         self.content = content
         self.user_id = user_id
         self.id = post_id or str(uuid.uuid4())
         self.created_at = int(time.time() * 1000)  # timestamp en millisecondes
+        self.like_count = 0  # compteurs maintenus en base (voir app.counters)
+        self.comment_count = 0
+        self.liked_by_me = None  # renseigné par les listes lues avec ?viewer=
     
     def to_dict(self):
         return {
@@ -18,57 +159,74 @@ class Post:
             "title": self.title,
             "content": self.content,
             "user_id": self.user_id,
-            "created_at": self.created_at
+            "created_at": self.created_at,
+            "like_count": self.like_count,
+            "comment_count": self.comment_count
         }
     
     @staticmethod
     def from_node(node):
-        """Convertit un nœud Neo4j en objet Post"""
+        """Convertit un nœud Neo4j, une ligne projetée ou un instantané du cache en objet Post
+
+        L'objet est construit sans passer par `__init__`, qui générerait un
+        UUID et un horodatage aussitôt remplacés.
+        """
         if not node:
             return None
-        post = Post()
+        post = Post.__new__(Post)
         post.id = node.get("id")
         post.title = node.get("title")
         post.content = node.get("content")
         post.created_at = node.get("created_at")
+        post.user_id = node.get("user_id")
+        post.like_count = node.get("like_count") or 0
+        post.comment_count = node.get("comment_count") or 0
+        post.liked_by_me = node.get("liked_by_me")
         return post
     
     def save(self):
-        """Crée ou met à jour un post dans la base de données"""
-        # Vérifier si l'utilisateur existe
-        user = User.find_by_id(self.user_id)
-        if not user:
+        """Crée ou met à jour un post dans la base de données
+
+        La vérification de l'auteur, l'écriture du post et le lien CREATED
+        sont faits en une seule requête, donc dans une seule transaction.
+        Un nouveau post est ensuite diffusé dans les fils matérialisés.
+        """
+        query = Query("post.save", """
+        MATCH (u:User {id: $user_id})
+        OPTIONAL MATCH (existing:Post {id: $post_id})
+        WITH u, existing IS NULL AS created
+        MERGE (p:Post {id: $post_id})
+        ON CREATE SET p.created_at = $created_at, p.like_count = 0, p.comment_count = 0,
+                      p.author_id = u.id
+        SET p.title = $title, p.content = $content
+        MERGE (u)-[r:CREATED]->(p)
+        RETURN p, created
+        """)
+        result = db.run(query, user_id=self.user_id, post_id=self.id, title=self.title,
+                        content=self.content, created_at=self.created_at).data()
+        if not result:
             raise ValueError(f"Utilisateur avec l'ID {self.user_id} non trouvé")
         
-        # Créer ou mettre à jour le post
-        post_node = Node("Post", 
-                         id=self.id, 
-                         title=self.title, 
-                         content=self.content, 
-                         created_at=self.created_at)
-        
-        # Fusionner le nœud du post en utilisant l'ID comme clé
-        db.merge(post_node, "Post", "id")
-        
-        # Créer la relation entre l'utilisateur et le post s'il s'agit d'un nouveau post
-        query = """
-        MATCH (u:User {id: }), (p:Post {id: })
-        MERGE (u)-[r:CREATED]->(p)
-        RETURN r
-        """
-        db.run(query, user_id=self.user_id, post_id=self.id)
+        node = result[0].get('p')
+        self.created_at = node.get('created_at')
+        self.like_count = node.get('like_count') or 0
+        self.comment_count = node.get('comment_count') or 0
+        invalidate_entity('post', self.id)
+        bump(POSTS, post_key(self.id))
+        if result[0].get('created'):
+            Post._fan_out(self.user_id, [(self.created_at, self.id)])
         
         return self
     
     @staticmethod
     def find_by_id(post_id):
-        """Trouve un post par son ID"""
-        query = """
-        MATCH (p:Post {id: })
-        OPTIONAL MATCH (u:User)-[:CREATED]->(p)
-        RETURN p, u.id as user_id
-        """
-        result = db.run(query, post_id=post_id).data()
+        """Trouve un post par son ID (carte d'identité, cache d'entités, puis base)"""
+        return find_entity('post', post_id, Post.from_node, Post._load)
+    
+    @staticmethod
+    def _load(post_id):
+        """Lit un post et son auteur dans la base"""
+        result = db.run(FIND_BY_ID_QUERY, post_id=post_id).data()
         if result:
             post = Post.from_node(result[0].get('p'))
             post.user_id = result[0].get('user_id')
@@ -76,81 +234,303 @@ class Post:
         return None
     
     @staticmethod
-    def find_all():
-        """Récupère tous les posts"""
-        query = """
-        MATCH (u:User)-[:CREATED]->(p:Post)
-        RETURN p, u.id as user_id
-        ORDER BY p.created_at DESC
+    def iter_all(limit=None, after=None, viewer_id=None):
+        """Parcourt les posts, du plus récent au plus ancien, sans
+        charger tout le résultat en mémoire
+
+        `after` est une position (created_at, id) : seuls les posts situés
+        après cette position sont retournés. Avec `viewer_id`, chaque post
+        indique dans `liked_by_me` si ce lecteur l'a aimé.
         """
-        results = db.run(query).data()
-        posts = []
-        for record in results:
-            post = Post.from_node(record.get('p'))
-            post.user_id = record.get('user_id')
-            posts.append(post)
-        return posts
+        for row in Post.iter_all_rows(limit=limit, after=after, viewer_id=viewer_id):
+            yield Post.from_node(row)
     
     @staticmethod
-    def find_by_user(user_id):
+    def iter_all_rows(limit=None, after=None, viewer_id=None):
+        """Comme `iter_all`, mais retourne les dictionnaires projetés par la requête
+
+        Chaque ligne a la forme de `to_dict()` (plus `liked_by_me` avec un
+        lecteur) et peut être sérialisée telle quelle, sans objet Post.
+        """
+        query, params = find_all_query(limit=limit, after=after, viewer_id=viewer_id)
+        for record in db.stream(query, **params):
+            yield record['post']
+    
+    @staticmethod
+    def find_all(limit=None, after=None, viewer_id=None):
+        """Récupère les posts, du plus récent au plus ancien"""
+        return list(Post.iter_all(limit=limit, after=after, viewer_id=viewer_id))
+    
+    @staticmethod
+    def iter_by_user(user_id, viewer_id=None):
+        """Parcourt les posts d'un utilisateur sans charger tout le résultat en mémoire"""
+        for row in Post.iter_by_user_rows(user_id, viewer_id=viewer_id):
+            yield Post.from_node(row)
+    
+    @staticmethod
+    def iter_by_user_rows(user_id, viewer_id=None):
+        """Comme `iter_by_user`, avec les lignes projetées (voir `iter_all_rows`)"""
+        query, params = find_by_user_query(user_id, viewer_id=viewer_id)
+        for record in db.stream(query, **params):
+            yield record['post']
+    
+    @staticmethod
+    def find_by_user(user_id, viewer_id=None):
         """Récupère tous les posts d'un utilisateur"""
-        query = """
-        MATCH (u:User {id: })-[:CREATED]->(p:Post)
-        RETURN p
-        ORDER BY p.created_at DESC
+        return list(Post.iter_by_user(user_id, viewer_id=viewer_id))
+    
+    @staticmethod
+    def iter_feed(user_id, limit=None, after=None, viewer_id=None):
+        """Parcourt les posts des amis d'un utilisateur, du plus récent au plus ancien
+
+        Une seule requête (voir `feed_query`) : le travail dépend du nombre
+        d'amis et de la taille de la page, pas du nombre de posts de chacun.
+        """
+        for row in Post.iter_feed_rows(user_id, limit=limit, after=after, viewer_id=viewer_id):
+            yield Post.from_node(row)
+    
+    @staticmethod
+    def iter_feed_rows(user_id, limit=None, after=None, viewer_id=None):
+        """Comme `iter_feed`, avec les lignes projetées (voir `iter_all_rows`)"""
+        query, params = feed_query(user_id, limit=limit, after=after, viewer_id=viewer_id)
+        for record in db.stream(query, **params):
+            yield record['post']
+    
+    @staticmethod
+    def find_feed(user_id, limit=None, after=None, viewer_id=None):
+        """Récupère le fil d'actualité d'un utilisateur (posts de ses amis)"""
+        return list(Post.iter_feed(user_id, limit=limit, after=after, viewer_id=viewer_id))
+    
+    @staticmethod
+    def find_by_ids(post_ids, viewer_id=None):
+        """Récupère des posts par leurs IDs en une requête, dans l'ordre de `post_ids`
+
+        Les posts supprimés entre-temps sont ignorés.
+        """
+        if not post_ids:
+            return []
+        liked_by, liked_params = liked_by_clause("p", viewer_id)
+        query = Query("post.find_by_ids", f"""
+        MATCH (u:User)-[:CREATED]->(p:Post)
+        WHERE p.id IN $post_ids
+        RETURN p, u.id as user_id{liked_by}
+        """)
+        posts = {}
+        for record in db.run(query, post_ids=list(post_ids), **liked_params):
+            post = Post.from_node(record['p'])
+            post.user_id = record['user_id']
+            post.liked_by_me = record.get('liked_by_me')
+            posts[post.id] = post
+        return [posts[post_id] for post_id in post_ids if post_id in posts]
+    
+    @staticmethod
+    def find_by_users(user_ids, limit=None, after=None, viewer_id=None):
+        """Récupère les posts les plus récents d'un ensemble d'auteurs, fusionnés
+
+        Même plan que `iter_feed`, pour une liste d'auteurs donnée.
+        """
+        if not user_ids:
+            return []
+        cypher, params = authors_posts_cypher("UNWIND $user_ids AS author_id MATCH (f:User {id: author_id})",
+                                              limit, after, viewer_id)
+        query = Query("post.find_by_users", cypher)
+        return [Post.from_node(record['post']) for record in db.run(query, user_ids=list(user_ids), **params)]
+    
+    @staticmethod
+    def _fan_out(author_id, entries):
+        """Ajoute des posts (created_at, id) aux fils matérialisés des amis de l'auteur
+
+        Les auteurs très connectés ne sont pas diffusés : leurs posts sont
+        fusionnés à la lecture (voir `find_timeline`).
+        """
+        if timelines is None:
+            return
+        friend_count = User.count_friends(author_id)
+        if friend_count is None or friend_count > Config.TIMELINE_CELEBRITY_THRESHOLD:
+            return
+        friend_ids = User.get_friend_ids(author_id)
+        for entry in entries:
+            timelines.push(friend_ids, entry)
+    
+    @staticmethod
+    def rebuild_timeline(user_id):
+        """Reconstruit le fil matérialisé d'un utilisateur à partir des posts de ses amis
+
+        Retourne le nombre d'entrées gardées (None si l'utilisateur n'existe pas).
         """
-        results = db.run(query, user_id=user_id).data()
+        user = User.find_by_id(user_id)
+        if user is None or timelines is None:
+            return None
+        entries = []
+        for friend in user.get_friends():
+            if friend.friend_count > Config.TIMELINE_CELEBRITY_THRESHOLD:
+                continue
+            # find_by_user est trié du plus récent au plus ancien
+            for post in islice(Post.iter_by_user(friend.id), timelines.max_entries):
+                entries.append((post.created_at, post.id))
+        entries = heapq.nlargest(timelines.max_entries, set(entries))
+        timelines.replace(user_id, entries)
+        return len(entries)
+    
+    @staticmethod
+    def find_timeline(user_id, limit, after=None, viewer_id=None):
+        """Récupère une page du fil d'actualité depuis le fil matérialisé
+
+        Les posts des amis très connectés sont lus et fusionnés à la lecture.
+        Au-delà des entrées gardées (fil tronqué), la page est complétée par
+        la requête de `find_feed`. Sans fils matérialisés, équivaut à `find_feed`.
+        """
+        if timelines is None:
+            return Post.find_feed(user_id, limit=limit, after=after, viewer_id=viewer_id)
+        if not timelines.exists(user_id):
+            Post.rebuild_timeline(user_id)
+        
         posts = []
-        for record in results:
-            post = Post.from_node(record.get('p'))
-            post.user_id = user_id
-            posts.append(post)
-        return posts
+        position = after
+        while len(posts) < limit:
+            wanted = limit - len(posts)
+            entries = timelines.read(user_id, wanted, position)
+            if entries:
+                posts += Post.find_by_ids([post_id for _, post_id in entries], viewer_id=viewer_id)
+                position = entries[-1]
+            if len(entries) < wanted:
+                # Fil épuisé : s'il est tronqué, les posts plus anciens sont lus en base
+                if timelines.size(user_id) >= timelines.max_entries:
+                    posts += Post.find_feed(user_id, limit=limit - len(posts), after=position,
+                                            viewer_id=viewer_id)
+                break
+        
+        celebrity_ids = User.get_celebrity_friend_ids(user_id, Config.TIMELINE_CELEBRITY_THRESHOLD)
+        posts += Post.find_by_users(celebrity_ids, limit=limit, after=after, viewer_id=viewer_id)
+        
+        unique = {post.id: post for post in posts}
+        return sorted(unique.values(), key=lambda post: (post.created_at, post.id), reverse=True)[:limit]
+    
+    @staticmethod
+    def bulk_create(items, batch_size=1000):
+        """Crée ou met à jour des posts par lots (une requête UNWIND par lot)"""
+        created_at_by_id = {}
+        
+        def build_row(item):
+            row = Post(title=item['title'], content=item['content'],
+                       user_id=item['user_id'], post_id=item.get('id')).to_dict()
+            row['created_at'] = item.get('created_at') or row['created_at']
+            created_at_by_id[row['id']] = row['created_at']
+            return row
+        
+        query = Query("post.bulk_create", """
+        UNWIND $rows AS row
+        MATCH (u:User {id: row.user_id})
+        MERGE (p:Post {id: row.id})
+        ON CREATE SET p._new = true, p.created_at = row.created_at, p.like_count = 0,
+                      p.comment_count = 0, p.author_id = u.id
+        SET p.title = row.title, p.content = row.content
+        MERGE (u)-[r:CREATED]->(p)
+        WITH row, p, p._new IS NOT NULL AS created
+        REMOVE p._new
+        RETURN row.key AS key, created
+        """)
+        created_keys = set()
+        
+        def on_written(record):
+            if record['created']:
+                created_keys.add(record['key'])
+        
+        results = bulk_write(items, POST_BULK_ITEM, build_row, query,
+                             "Utilisateur non trouvé", batch_size, on_written=on_written)
+        # Seuls les nouveaux posts sont diffusés : une mise à jour garde sa place dans les fils
+        entries_by_author = {}
+        for result in results:
+            if 'id' in result:
+                invalidate_entity('post', result['id'])
+                if result['index'] in created_keys:
+                    entries_by_author.setdefault(items[result['index']]['user_id'], []).append(
+                        (created_at_by_id[result['id']], result['id']))
+        bump_all()
+        if timelines is not None:
+            for author_id, entries in entries_by_author.items():
+                Post._fan_out(author_id, entries)
+        return results
+    
+    @staticmethod
+    def bulk_like(items, batch_size=1000):
+        """Ajoute des likes sur des posts par lots (une requête UNWIND par lot)"""
+        def build_row(item):
+            return {'user_id': item['user_id'], 'post_id': item['post_id']}
+        
+        query = Query("post.bulk_like", """
+        UNWIND $rows AS row
+        MATCH (u:User {id: row.user_id}), (p:Post {id: row.post_id})
+        MERGE (u)-[r:LIKES]->(p)
+        ON CREATE SET p.like_count = coalesce(p.like_count, 0) + 1
+        RETURN row.key AS key
+        """)
+        results = bulk_write(items, POST_LIKE_BULK_ITEM, build_row, query,
+                             "Utilisateur ou post non trouvé", batch_size)
+        for result in results:
+            if result['status'] == 'success':
+                invalidate_entity('post', items[result['index']]['post_id'])
+        bump_all()
+        return results
     
     @staticmethod
     def delete(post_id):
-        """Supprime un post et toutes ses relations"""
-        query = """
-        MATCH (p:Post {id: })
-        OPTIONAL MATCH (p)-[r]-()
-        DELETE r, p
-        """
-        db.run(query, post_id=post_id)
+        """Supprime un post, ses commentaires et toutes leurs relations"""
+        query = Query("post.delete", """
+        MATCH (p:Post {id: $post_id})
+        OPTIONAL MATCH (p)-[:HAS_COMMENT]->(c:Comment)
+        WITH p, collect(c) AS comments
+        WITH p, comments, [c IN comments | c.id] AS comment_ids
+        FOREACH (c IN comments | DETACH DELETE c)
+        DETACH DELETE p
+        RETURN comment_ids
+        """)
+        result = db.run(query, post_id=post_id).data()
+        invalidate_entity('post', post_id)
+        if result:
+            for comment_id in result[0].get('comment_ids') or []:
+                invalidate_entity('comment', comment_id)
+        bump(POSTS, post_key(post_id), comments_key(post_id))
         return True
     
+    @staticmethod
+    def add_like(post_id, user_id):
+        """Ajoute un like en une seule requête et retourne un statut (voir app.status)"""
+        result = db.run(ADD_LIKE_QUERY, user_id=user_id, post_id=post_id).data()
+        invalidate_entity('post', post_id)
+        status = result[0].get('status')
+        if status == CREATED:
+            bump(POSTS, post_key(post_id))
+        return status
+    
+    @staticmethod
+    def remove_like(post_id, user_id):
+        """Retire un like en une seule requête et retourne un statut (voir app.status)"""
+        result = db.run(REMOVE_LIKE_QUERY, user_id=user_id, post_id=post_id).data()
+        invalidate_entity('post', post_id)
+        status = result[0].get('status')
+        if status == REMOVED:
+            bump(POSTS, post_key(post_id))
+        return status
+    
     def like(self, user_id):
         """Ajoute un like à un post"""
-        query = """
-        MATCH (u:User {id: }), (p:Post {id: })
-        MERGE (u)-[r:LIKES]->(p)
-        RETURN r
-        """
-        result = db.run(query, user_id=user_id, post_id=self.id).data()
-        return bool(result)
+        return Post.add_like(self.id, user_id) in (CREATED, ALREADY_EXISTED)
     
     def unlike(self, user_id):
         """Retire un like d'un post"""
-        query = """
-        MATCH (u:User {id: })-[r:LIKES]->(p:Post {id: })
-        DELETE r
-        """
-        db.run(query, user_id=user_id, post_id=self.id)
+        Post.remove_like(self.id, user_id)
         return True
     
     def get_likes_count(self):
-        """Récupère le nombre de likes d'un post"""
-        query = """
-        MATCH (u:User)-[:LIKES]->(p:Post {id: })
-        RETURN count(u) as likes_count
-        """
-        result = db.run(query, post_id=self.id).data()
-        return result[0].get('likes_count') if result else 0
+        """Nombre de likes d'un post (compteur lu avec le nœud, sans requête)"""
+        return self.like_count
     
     def get_liked_by(self):
         """Récupère les utilisateurs qui ont aimé ce post"""
-        query = """
-        MATCH (u:User)-[:LIKES]->(p:Post {id: })
+        query = Query("post.liked_by", """
+        MATCH (u:User)-[:LIKES]->(p:Post {id: $post_id})
         RETURN u
-        """
+        """)
         results = db.run(query, post_id=self.id).data()
         return [User.from_node(record.get('u')) for record in results]
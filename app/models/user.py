@@ -1,123 +1,518 @@
 ﻿from app import db
-from py2neo import Node, Relationship
+from app.database import Query
 import uuid
 import time
+from app.pagination import keyset_clause, limit_clause
+from app.bulk import bulk_write
+from app.schemas import USER_BULK_ITEM, FRIENDSHIP_BULK_ITEM
+from app.cache import find_entity, invalidate_entity
+from app.status import CREATED, ALREADY_EXISTED, REMOVED, EXISTS, NOT_FOUND
+from app.timeline import timelines
+from app.adjacency import friendship_index
+from app.versions import bump, bump_all, friends_key, versions
+from app.recommendations import recommendation_queue
+
+# Requêtes partagées avec l'application asynchrone (voir app.aio.models)
+
+FIND_BY_ID_QUERY = Query("user.find_by_id", """
+MATCH (u:User {id: $user_id})
+RETURN u
+""")
+
+FIND_BY_IDS_QUERY = Query("user.find_by_ids", """
+MATCH (u:User)
+WHERE u.id IN $user_ids
+RETURN u
+""")
+
+FRIENDSHIP_STATUS_QUERY = Query("user.friendship_status", """
+OPTIONAL MATCH (u1:User {id: $user_id})
+OPTIONAL MATCH (u2:User {id: $friend_id})
+OPTIONAL MATCH (u1)-[r:FRIENDS_WITH]-(u2)
+WITH u1, u2, count(r) AS rel_count
+RETURN CASE
+    WHEN u1 IS NULL THEN 'user_missing'
+    WHEN u2 IS NULL THEN 'target_missing'
+    WHEN rel_count > 0 THEN 'exists'
+    ELSE 'not_found'
+END AS status
+""")
+
+MUTUAL_FRIENDS_QUERY = Query("user.mutual_friends", """
+MATCH (u1:User {id: $user_id})-[:FRIENDS_WITH]-(mutual:User)-[:FRIENDS_WITH]-(u2:User {id: $other_id})
+RETURN mutual
+""")
+
+# Projection d'un utilisateur `u` vers le dictionnaire de `User.to_dict()`
+USER_PROJECTION = "u {.id, .name, .email, .created_at, friend_count: coalesce(u.friend_count, 0)}"
+
 
 class User:
+    __slots__ = ('name', 'email', 'id', 'created_at', 'friend_count')
+    
     def __init__(self, name=None, email=None, user_id=None):
         self.name = name
         self.email = email
         self.id = user_id or str(uuid.uuid4())
         self.created_at = int(time.time() * 1000)  # timestamp en millisecondes
+        self.friend_count = 0  # compteur maintenu en base (voir app.counters)
     
     def to_dict(self):
         return {
             "id": self.id,
             "name": self.name,
             "email": self.email,
-            "created_at": self.created_at
+            "created_at": self.created_at,
+            "friend_count": self.friend_count
         }
     
     @staticmethod
     def from_node(node):
-        """Convertit un nœud Neo4j en objet User"""
+        """Convertit un nœud Neo4j, une ligne projetée ou un instantané du cache en objet User
+
+        L'objet est construit sans passer par `__init__`, qui générerait un
+        UUID et un horodatage aussitôt remplacés.
+        """
         if not node:
             return None
-        user = User()
+        user = User.__new__(User)
         user.id = node.get("id")
         user.name = node.get("name")
         user.email = node.get("email")
         user.created_at = node.get("created_at")
+        user.friend_count = node.get("friend_count") or 0
         return user
     
     def save(self):
-        """Crée ou met à jour un utilisateur dans la base de données"""
-        user_node = Node("User", 
-                        id=self.id, 
-                        name=self.name, 
-                        email=self.email, 
-                        created_at=self.created_at)
-        db.merge(user_node, "User", "id")
+        """Crée ou met à jour un utilisateur dans la base de données (une seule requête)"""
+        query = Query("user.save", """
+        MERGE (u:User {id: $user_id})
+        ON CREATE SET u.created_at = $created_at, u.friend_count = 0
+        WITH u, u.name IS NOT NULL AND (coalesce(u.name, '') <> coalesce($name, '')
+                                        OR coalesce(u.email, '') <> coalesce($email, '')) AS changed
+        SET u.name = $name, u.email = $email
+        RETURN u, changed
+        """)
+        result = db.run(query, user_id=self.id, name=self.name, email=self.email,
+                        created_at=self.created_at).data()
+        self.created_at = result[0].get('u').get('created_at')
+        self.friend_count = result[0].get('u').get('friend_count') or 0
+        invalidate_entity('user', self.id)
+        friendship_index.add_user(self.id)
+        # Les listes d'amis affichent le nom et l'email : rien à invalider à
+        # la création (aucun ami) ni si ni l'un ni l'autre n'a changé
+        if result[0].get('changed'):
+            User._touch_friend_lists(self.id)
         return self
     
     @staticmethod
     def find_by_id(user_id):
-        """Trouve un utilisateur par son ID"""
-        query = """
-        MATCH (u:User {id: })
-        RETURN u
-        """
-        result = db.run(query, user_id=user_id).data()
+        """Trouve un utilisateur par son ID (carte d'identité, cache d'entités, puis base)"""
+        return find_entity('user', user_id, User.from_node, User._load)
+    
+    @staticmethod
+    def _load(user_id):
+        """Lit un utilisateur dans la base"""
+        result = db.run(FIND_BY_ID_QUERY, user_id=user_id).data()
         if result:
             return User.from_node(result[0].get('u'))
         return None
     
     @staticmethod
-    def find_all():
-        """Récupère tous les utilisateurs"""
-        query = """
+    def iter_all(limit=None, after=None):
+        """Parcourt les utilisateurs, du plus récent au plus ancien, sans
+        charger tout le résultat en mémoire
+
+        `after` est une position (created_at, id) : seuls les utilisateurs
+        situés après cette position sont retournés.
+        """
+        for row in User.iter_all_rows(limit=limit, after=after):
+            yield User.from_node(row)
+    
+    @staticmethod
+    def iter_all_rows(limit=None, after=None):
+        """Comme `iter_all`, mais retourne les dictionnaires projetés par la requête
+
+        Chaque ligne a la forme de `to_dict()` et peut être sérialisée telle
+        quelle, sans objet User.
+        """
+        where, params = keyset_clause("u", after)
+        query = Query("user.find_all", f"""
         MATCH (u:User)
-        RETURN u
-        ORDER BY u.created_at DESC
+        {where}
+        RETURN {USER_PROJECTION} AS user
+        ORDER BY u.created_at DESC, u.id DESC
+        {limit_clause(limit)}
+        """)
+        for record in db.stream(query, limit=limit, **params):
+            yield record['user']
+    
+    @staticmethod
+    def find_all(limit=None, after=None):
+        """Récupère les utilisateurs, du plus récent au plus ancien"""
+        return list(User.iter_all(limit=limit, after=after))
+    
+    @staticmethod
+    def bulk_create(items, batch_size=1000):
+        """Crée ou met à jour des utilisateurs par lots (une requête UNWIND par lot)"""
+        def build_row(item):
+            row = User(name=item['name'], email=item['email'], user_id=item.get('id')).to_dict()
+            row['created_at'] = item.get('created_at') or row['created_at']
+            return row
+        
+        query = Query("user.bulk_create", """
+        UNWIND $rows AS row
+        MERGE (u:User {id: row.id})
+        ON CREATE SET u.created_at = row.created_at, u.friend_count = 0
+        SET u.name = row.name, u.email = row.email
+        RETURN row.key AS key
+        """)
+        results = bulk_write(items, USER_BULK_ITEM, build_row, query,
+                             "Utilisateur non enregistré", batch_size)
+        for result in results:
+            if 'id' in result:
+                invalidate_entity('user', result['id'])
+                friendship_index.add_user(result['id'])
+        bump_all()
+        return results
+    
+    @staticmethod
+    def bulk_add_friends(items, batch_size=1000):
+        """Crée des relations d'amitié par lots (une requête UNWIND par lot)
+
+        Comme pour `create_friendship`, la relation va du plus petit id vers
+        le plus grand et les compteurs `friend_count` ne sont incrémentés
+        qu'à sa création. Les paires répétées dans la liste, dans un sens ou
+        dans l'autre, ne sont envoyées qu'une fois. Les amitiés créées
+        abandonnent les fils matérialisés et mettent en file les deltas de
+        recommandations, comme un ajout unitaire.
         """
-        results = db.run(query).data()
-        return [User.from_node(record.get('u')) for record in results]
+        def build_row(item):
+            if item['user_id'] == item['friend_id']:
+                raise ValueError('Un utilisateur ne peut pas s\'ajouter lui-même comme ami')
+            low, high = sorted((item['user_id'], item['friend_id']))
+            return {'user_id': low, 'friend_id': high}
+        
+        query = Query("user.bulk_add_friends", """
+        UNWIND $rows AS row
+        MATCH (u1:User {id: row.user_id}), (u2:User {id: row.friend_id})
+        OPTIONAL MATCH (u1)-[existing:FRIENDS_WITH]-(u2)
+        WITH row, u1, u2, count(existing) AS existing_count
+        WITH row, u1, u2, existing_count,
+             [(u1)-[:FRIENDS_WITH]-(x:User) | x.id] AS user_friend_ids,
+             [(u2)-[:FRIENDS_WITH]-(x:User) | x.id] AS friend_friend_ids
+        FOREACH (_ IN CASE WHEN existing_count = 0 THEN [1] ELSE [] END |
+            MERGE (u1)-[r:FRIENDS_WITH]->(u2)
+            ON CREATE SET r._new = true,
+                u1.friend_count = coalesce(u1.friend_count, 0) + 1,
+                u2.friend_count = coalesce(u2.friend_count, 0) + 1)
+        WITH row, u1, u2, user_friend_ids, friend_friend_ids
+        OPTIONAL MATCH (u1)-[r:FRIENDS_WITH]->(u2)
+        WITH row, user_friend_ids, friend_friend_ids, collect(r) AS rels
+        WITH row, user_friend_ids, friend_friend_ids, rels, any(r IN rels WHERE r._new) AS created
+        FOREACH (r IN rels | REMOVE r._new)
+        RETURN row.key AS key, row.user_id AS user_id, row.friend_id AS friend_id, created,
+               user_friend_ids, friend_friend_ids
+        """)
+        created = []
+        
+        def on_written(record):
+            if record['created']:
+                created.append(record)
+        
+        results = bulk_write(items, FRIENDSHIP_BULK_ITEM, build_row, query,
+                             "Utilisateur ou ami non trouvé", batch_size,
+                             dedupe_key=lambda row: (row['user_id'], row['friend_id']),
+                             on_written=on_written)
+        for result in results:
+            if result['status'] == 'success':
+                item = items[result['index']]
+                invalidate_entity('user', item['user_id'])
+                invalidate_entity('user', item['friend_id'])
+        
+        # Les amis lus par un lot peuvent précéder ses propres écritures :
+        # les amitiés créées plus tôt dans l'appel y sont ajoutées
+        added = {}
+        for record in created:
+            user_id, friend_id = record['user_id'], record['friend_id']
+            user_friends = set(record['user_friend_ids']) | added.get(user_id, set())
+            friend_friends = set(record['friend_friend_ids']) | added.get(friend_id, set())
+            friendship_index.add_friendship(user_id, friend_id)
+            User._drop_timelines(user_id, friend_id)
+            User.update_recommendations(user_id, friend_id, 1, user_friends, friend_friends)
+            added.setdefault(user_id, set()).add(friend_id)
+            added.setdefault(friend_id, set()).add(user_id)
+        bump_all()
+        return results
     
     @staticmethod
     def delete(user_id):
-        """Supprime un utilisateur et toutes ses relations"""
-        query = """
-        MATCH (u:User {id: })
-        OPTIONAL MATCH (u)-[r]-()
-        DELETE r, u
+        """Supprime un utilisateur et toutes ses relations
+
+        Les compteurs de ses amis et des posts et commentaires qu'il aimait
+        sont décrémentés dans la même requête ; les recommandations entre ses
+        anciens amis le sont ensuite, hors de la requête HTTP.
         """
-        db.run(query, user_id=user_id)
+        query = Query("user.delete", """
+        MATCH (u:User {id: $user_id})
+        OPTIONAL MATCH (u)-[:FRIENDS_WITH]-(f:User)
+        WITH u, collect(DISTINCT f) AS friends
+        OPTIONAL MATCH (u)-[:LIKES]->(x)
+        WITH u, friends, collect(x) AS liked
+        FOREACH (f IN friends |
+            SET f.friend_count = CASE WHEN f.friend_count > 0 THEN f.friend_count - 1 ELSE 0 END)
+        FOREACH (x IN liked |
+            SET x.like_count = CASE WHEN x.like_count > 0 THEN x.like_count - 1 ELSE 0 END)
+        WITH u, [f IN friends | f.id] AS friend_ids,
+             [x IN liked WHERE x:Post | x.id] AS post_ids,
+             [x IN liked WHERE x:Comment | x.id] AS comment_ids
+        DETACH DELETE u
+        RETURN friend_ids, post_ids, comment_ids
+        """)
+        result = db.run(query, user_id=user_id).data()
+        invalidate_entity('user', user_id)
+        friendship_index.remove_user(user_id)
+        bump_all()
+        if result:
+            # Ses anciens amis perdent un ami en commun entre eux
+            recommendation_queue.add_removed_user(result[0].get('friend_ids') or [])
+        if timelines is not None:
+            timelines.drop(user_id)
+        if result:
+            for kind, key in (('user', 'friend_ids'), ('post', 'post_ids'), ('comment', 'comment_ids')):
+                for entity_id in result[0].get(key) or []:
+                    invalidate_entity(kind, entity_id)
         return True
     
+    @staticmethod
+    def create_friendship(user_id, friend_id):
+        """Crée une amitié en une seule requête et retourne un statut (voir app.status).
+        La relation va toujours du plus petit id vers le plus grand : deux demandes
+        croisées (A vers B, B vers A) fusionnent sur la même relation, et les
+        compteurs ne sont incrémentés qu'à sa création."""
+        query = Query("user.create_friendship", """
+        OPTIONAL MATCH (u1:User {id: $user_id})
+        OPTIONAL MATCH (u2:User {id: $friend_id})
+        OPTIONAL MATCH (u1)-[existing:FRIENDS_WITH]-(u2)
+        WITH u1, u2, count(existing) AS existing_count
+        WITH u1, u2, existing_count,
+             CASE WHEN u1 IS NULL THEN [] ELSE [(u1)-[:FRIENDS_WITH]-(x:User) | x.id] END AS user_friend_ids,
+             CASE WHEN u2 IS NULL THEN [] ELSE [(u2)-[:FRIENDS_WITH]-(x:User) | x.id] END AS friend_friend_ids,
+             CASE WHEN u1.id < u2.id THEN u1 ELSE u2 END AS a,
+             CASE WHEN u1.id < u2.id THEN u2 ELSE u1 END AS b
+        FOREACH (_ IN CASE WHEN a IS NOT NULL AND b IS NOT NULL AND existing_count = 0 THEN [1] ELSE [] END |
+            MERGE (a)-[r:FRIENDS_WITH]->(b)
+            ON CREATE SET r._new = true,
+                a.friend_count = coalesce(a.friend_count, 0) + 1,
+                b.friend_count = coalesce(b.friend_count, 0) + 1)
+        WITH u1, u2, a, b, user_friend_ids, friend_friend_ids
+        OPTIONAL MATCH (a)-[r:FRIENDS_WITH]->(b)
+        WITH u1, u2, user_friend_ids, friend_friend_ids, collect(r) AS rels
+        WITH u1, u2, user_friend_ids, friend_friend_ids, rels, any(r IN rels WHERE r._new) AS created
+        FOREACH (r IN rels | REMOVE r._new)
+        RETURN CASE
+            WHEN u1 IS NULL THEN 'user_missing'
+            WHEN u2 IS NULL THEN 'target_missing'
+            WHEN created THEN 'created'
+            ELSE 'already_existed'
+        END AS status, user_friend_ids, friend_friend_ids
+        """)
+        result = db.run(query, user_id=user_id, friend_id=friend_id).data()
+        invalidate_entity('user', user_id)
+        invalidate_entity('user', friend_id)
+        status = result[0].get('status')
+        if status == CREATED:
+            User._after_friendship_change(user_id, friend_id, result[0], 1)
+        return status
+    
+    @staticmethod
+    def delete_friendship(user_id, friend_id):
+        """Supprime une amitié en une seule requête et retourne un statut (voir app.status)"""
+        query = Query("user.delete_friendship", """
+        OPTIONAL MATCH (u1:User {id: $user_id})
+        OPTIONAL MATCH (u2:User {id: $friend_id})
+        OPTIONAL MATCH (u1)-[r:FRIENDS_WITH]-(u2)
+        WITH u1, u2, collect(r) AS rels
+        WITH u1, u2, rels,
+             CASE WHEN u1 IS NULL THEN [] ELSE [(u1)-[:FRIENDS_WITH]-(x:User) | x.id] END AS user_friend_ids,
+             CASE WHEN u2 IS NULL THEN [] ELSE [(u2)-[:FRIENDS_WITH]-(x:User) | x.id] END AS friend_friend_ids
+        FOREACH (r IN rels | DELETE r)
+        FOREACH (_ IN CASE WHEN size(rels) > 0 THEN [1] ELSE [] END |
+            SET u1.friend_count = CASE WHEN u1.friend_count > 0 THEN u1.friend_count - 1 ELSE 0 END,
+                u2.friend_count = CASE WHEN u2.friend_count > 0 THEN u2.friend_count - 1 ELSE 0 END)
+        RETURN CASE
+            WHEN u1 IS NULL THEN 'user_missing'
+            WHEN u2 IS NULL THEN 'target_missing'
+            WHEN size(rels) > 0 THEN 'removed'
+            ELSE 'not_found'
+        END AS status, user_friend_ids, friend_friend_ids
+        """)
+        result = db.run(query, user_id=user_id, friend_id=friend_id).data()
+        invalidate_entity('user', user_id)
+        invalidate_entity('user', friend_id)
+        status = result[0].get('status')
+        if status == REMOVED:
+            User._after_friendship_change(user_id, friend_id, result[0], -1)
+        return status
+    
+    @staticmethod
+    def _after_friendship_change(user_id, friend_id, record, delta):
+        """Index, versions, fils et recommandations après l'ajout (+1) ou le retrait (-1) d'une amitié
+
+        `record` contient les amis de chacun avant le changement, lus par la
+        mutation elle-même : aucune requête de plus dans la requête HTTP.
+        """
+        user_friends = record.get('user_friend_ids') or []
+        friend_friends = record.get('friend_friend_ids') or []
+        if delta > 0:
+            friendship_index.add_friendship(user_id, friend_id)
+        else:
+            friendship_index.remove_friendship(user_id, friend_id)
+        User._touch_friend_lists(user_id, friend_id, friend_ids=[*user_friends, *friend_friends])
+        User._drop_timelines(user_id, friend_id)
+        User.update_recommendations(user_id, friend_id, delta, user_friends, friend_friends)
+    
+    @staticmethod
+    def _touch_friend_lists(*user_ids, friend_ids=None):
+        """Change la version des listes d'amis où ces utilisateurs apparaissent (voir app.versions)
+
+        Leur propre liste et celle de chacun de leurs amis, qui affiche leur
+        nom et leur nombre d'amis. `friend_ids`, s'il est donné, contient
+        déjà les amis de tous ces utilisateurs : ils ne sont pas relus.
+        """
+        if versions is None:
+            return
+        keys = {friends_key(user_id) for user_id in user_ids}
+        if friend_ids is None:
+            friend_ids = [friend_id for user_id in user_ids for friend_id in User.get_friend_ids(user_id)]
+        keys.update(friends_key(friend_id) for friend_id in friend_ids)
+        bump(*keys)
+    
+    @staticmethod
+    def _drop_timelines(*user_ids):
+        """Abandonne les fils matérialisés devenus faux après un changement d'amitié"""
+        if timelines is not None:
+            for user_id in user_ids:
+                timelines.drop(user_id)
+    
+    @staticmethod
+    def friendship_status(user_id, friend_id):
+        """Vérifie une amitié et retourne un statut (voir app.status)
+
+        Répond depuis l'index d'adjacence s'il connaît les deux utilisateurs,
+        sinon en une seule requête.
+        """
+        are_friends = friendship_index.are_friends(user_id, friend_id)
+        if are_friends is not None:
+            return EXISTS if are_friends else NOT_FOUND
+        
+        result = db.run(FRIENDSHIP_STATUS_QUERY, user_id=user_id, friend_id=friend_id).data()
+        return result[0].get('status')
+    
     def add_friend(self, friend_id):
         """Ajoute une relation d'amitié avec un autre utilisateur"""
-        query = """
-        MATCH (u1:User {id: }), (u2:User {id: })
-        MERGE (u1)-[r:FRIENDS_WITH]->(u2)
-        RETURN r
-        """
-        result = db.run(query, user_id=self.id, friend_id=friend_id).data()
-        return bool(result)
+        return User.create_friendship(self.id, friend_id) in (CREATED, ALREADY_EXISTED)
     
     def remove_friend(self, friend_id):
         """Supprime une relation d'amitié"""
-        query = """
-        MATCH (u1:User {id: })-[r:FRIENDS_WITH]-(u2:User {id: })
-        DELETE r
-        """
-        db.run(query, user_id=self.id, friend_id=friend_id)
+        User.delete_friendship(self.id, friend_id)
         return True
     
     def get_friends(self):
         """Récupère la liste des amis de l'utilisateur"""
-        query = """
-        MATCH (u:User {id: })-[:FRIENDS_WITH]-(friend:User)
+        query = Query("user.get_friends", """
+        MATCH (u:User {id: $user_id})-[:FRIENDS_WITH]-(friend:User)
         RETURN friend
-        """
+        """)
         results = db.run(query, user_id=self.id).data()
         return [User.from_node(record.get('friend')) for record in results]
     
+    @staticmethod
+    def count_friends(user_id):
+        """Nombre d'amis d'un utilisateur (index d'adjacence, sinon compteur du nœud)"""
+        count = friendship_index.friend_count(user_id)
+        if count is not None:
+            return count
+        user = User.find_by_id(user_id)
+        return user.friend_count if user else None
+    
+    @staticmethod
+    def find_by_ids(user_ids):
+        """Récupère des utilisateurs par leurs IDs en une requête, dans l'ordre de `user_ids`"""
+        if not user_ids:
+            return []
+        users = {}
+        for record in db.run(FIND_BY_IDS_QUERY, user_ids=list(user_ids)):
+            user = User.from_node(record['u'])
+            users[user.id] = user
+        return [users[user_id] for user_id in user_ids if user_id in users]
+    
+    @staticmethod
+    def get_friend_ids(user_id):
+        """Récupère les IDs des amis d'un utilisateur (sans charger les nœuds)"""
+        friend_ids = friendship_index.friend_ids(user_id)
+        if friend_ids is not None:
+            return friend_ids
+        
+        query = Query("user.friend_ids", """
+        MATCH (u:User {id: $user_id})-[:FRIENDS_WITH]-(friend:User)
+        RETURN DISTINCT friend.id as id
+        """)
+        return [record['id'] for record in db.run(query, user_id=user_id)]
+    
+    @staticmethod
+    def get_celebrity_friend_ids(user_id, threshold):
+        """Récupère les IDs des amis qui ont plus de `threshold` amis"""
+        query = Query("user.celebrity_friend_ids", """
+        MATCH (u:User {id: $user_id})-[:FRIENDS_WITH]-(friend:User)
+        WHERE friend.friend_count > $threshold
+        RETURN DISTINCT friend.id as id
+        """)
+        return [record['id'] for record in db.run(query, user_id=user_id, threshold=threshold)]
+    
+    @staticmethod
+    def get_recommendations(user_id, limit=10):
+        """Récupère les amis suggérés, avec leur nombre d'amis en commun
+
+        Lit la table précalculée (voir app.recommendations) : retourne une
+        liste de tuples (User, mutual_count), du meilleur au moins bon.
+        """
+        query = Query("user.recommendations", """
+        MATCH (u:User {id: $user_id})-[r:RECOMMENDED]->(candidate:User)
+        WHERE NOT (u)-[:FRIENDS_WITH]-(candidate)
+        RETURN candidate, r.score as mutual_count
+        ORDER BY mutual_count DESC, candidate.id DESC
+        LIMIT $limit
+        """)
+        results = db.run(query, user_id=user_id, limit=limit).data()
+        return [(User.from_node(record.get('candidate')), record.get('mutual_count')) for record in results]
+    
+    @staticmethod
+    def update_recommendations(user_id, friend_id, delta, user_friends, friend_friends):
+        """Met à jour les recommandations après l'ajout (+1) ou le retrait (-1) d'une amitié
+
+        `user_friends` et `friend_friends` sont les amis de chacun avant le
+        changement. Les scores ne sont pas modifiés ici : les deltas sont
+        mis en file et appliqués par lots hors de la requête (voir
+        app.recommendations).
+        """
+        recommendation_queue.add_friendship_change(user_id, friend_id, user_friends, friend_friends, delta)
+    
     @staticmethod
     def check_friendship(user_id, friend_id):
         """Vérifie si deux utilisateurs sont amis"""
-        query = """
-        MATCH (u1:User {id: })-[r:FRIENDS_WITH]-(u2:User {id: })
-        RETURN r
-        """
-        result = db.run(query, user_id=user_id, friend_id=friend_id).data()
-        return bool(result)
+        return User.friendship_status(user_id, friend_id) == EXISTS
     
     @staticmethod
     def get_mutual_friends(user_id, other_id):
-        """Récupère les amis en commun entre deux utilisateurs"""
-        query = """
-        MATCH (u1:User {id: })-[:FRIENDS_WITH]-(mutual:User)-[:FRIENDS_WITH]-(u2:User {id: })
-        RETURN mutual
+        """Récupère les amis en commun entre deux utilisateurs
+
+        Avec l'index d'adjacence, l'intersection est calculée en mémoire et
+        seuls les nœuds des amis en commun sont lus.
         """
-        results = db.run(query, user_id=user_id, other_id=other_id).data()
+        mutual_ids = friendship_index.mutual_friend_ids(user_id, other_id)
+        if mutual_ids is not None:
+            return User.find_by_ids(mutual_ids)
+        
+        results = db.run(MUTUAL_FRIENDS_QUERY, user_id=user_id, other_id=other_id).data()
         return [User.from_node(record.get('mutual')) for record in results]
@@ -0,0 +1,95 @@
+﻿# Pagination par curseur (keyset) sur (created_at, id)
+import base64
+import json
+from flask import request, current_app
+
+
+def encode_cursor(created_at, entity_id):
+    """Encode une position (created_at, id) en curseur opaque"""
+    raw = json.dumps([created_at, entity_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Décode un curseur opaque en tuple (created_at, id)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, entity_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        raise ValueError(f"Curseur invalide : {cursor}")
+    return created_at, entity_id
+
+
+def get_page_params(bounded=True, args=None, config=None):
+    """Lit les paramètres ?limit= et ?after= de la requête courante
+
+    Retourne un tuple (limit, after) où `after` vaut None ou (created_at, id).
+    Avec `bounded=False` (réponses en flux), `limit` vaut None s'il n'est pas
+    précisé et n'est pas plafonné. `args` et `config` remplacent ceux de la
+    requête Flask courante (application asynchrone, voir app.aio).
+    Lève ValueError si les paramètres sont invalides.
+    """
+    args = request.args if args is None else args
+    config = current_app.config if config is None else config
+    default_limit = config.get('PAGE_DEFAULT_LIMIT', 50) if bounded else None
+    max_limit = config.get('PAGE_MAX_LIMIT', 500) if bounded else None
+    limit = get_limit_param(default_limit, max_limit, args=args)
+
+    after = args.get('after')
+    return limit, decode_cursor(after) if after else None
+
+
+def get_limit_param(default_limit, max_limit=None, args=None):
+    """Lit le paramètre ?limit= de la requête courante, plafonné à `max_limit`
+
+    Lève ValueError si le paramètre est invalide.
+    """
+    args = request.args if args is None else args
+    limit = args.get('limit', default_limit)
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except (TypeError, ValueError):
+            raise ValueError(f"Paramètre limit invalide : {limit}")
+        if limit < 1:
+            raise ValueError("Le paramètre limit doit être supérieur à 0")
+        if max_limit is not None:
+            limit = min(limit, max_limit)
+    return limit
+
+
+def keyset_clause(var, after):
+    """Construit la clause WHERE d'une page située après `after`
+
+    Le premier terme borne created_at seul : l'index sur created_at peut
+    alors être lu par une recherche de plage à partir du curseur, au lieu
+    d'un parcours complet filtré par le OU. Le second départage les
+    égalités par id. Retourne un tuple (clause, paramètres) à injecter dans
+    la requête Cypher.
+    """
+    if after is None:
+        return "", {}
+    clause = (
+        f"WHERE {var}.created_at <= $after_created_at "
+        f"AND ({var}.created_at < $after_created_at OR {var}.id < $after_id)"
+    )
+    return clause, {"after_created_at": after[0], "after_id": after[1]}
+
+
+def limit_clause(limit):
+    """Construit la clause LIMIT (aucune limite si `limit` vaut None)"""
+    return "LIMIT $limit" if limit is not None else ""
+
+
+def split_page(items, limit):
+    """Découpe une liste de `limit + 1` éléments en (page, next_cursor)
+
+    Les éléments sont des objets modèle ou des lignes (dictionnaires).
+    """
+    if len(items) <= limit:
+        return items, None
+    page = items[:limit]
+    last = page[-1]
+    if isinstance(last, dict):
+        return page, encode_cursor(last['created_at'], last['id'])
+    return page, encode_cursor(last.created_at, last.id)
@@ -0,0 +1,229 @@
+﻿# Capture des plans d'exécution des requêtes Cypher (diagnostic, PLAN_CAPTURE_ENABLED)
+#
+#   GET /db/plans              dernier plan de chaque requête nommée, signalés d'abord
+#   DELETE /db/plans           oublie les plans capturés
+#   python -m app.plans --url http://127.0.0.1:5000
+#                              rapport en ligne de commande ; code de sortie 1
+#                              si une requête est signalée
+#
+# Une fraction PLAN_CAPTURE_SAMPLE des requêtes est exécutée avec PROFILE
+# (la requête elle-même, une seule fois : lignes réelles et db hits par
+# opérateur) ou précédée d'un EXPLAIN (plan estimé, sans exécution ni db
+# hits, mais un aller-retour de plus). Les plans contenant un opérateur de
+# FLAGGED_OPERATORS sont signalés : parcours d'un label ou de tous les
+# nœuds, opérateur Eager, produit cartésien.
+#
+# Le backend mémoire n'exécute pas de Cypher : il n'a pas de plan. Les
+# plans sont propres à chaque processus, comme les mesures (app.metrics) :
+# pour un rapport complet, capturer avec un seul processus (SERVE_WORKERS=1).
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import zlib
+from urllib.error import HTTPError
+from urllib.request import urlopen
+from .config import Config
+
+MODES = ('profile', 'explain')
+
+FLAGGED_OPERATORS = {
+    'NodeByLabelScan': "parcours de tous les nœuds d'un label",
+    'AllNodesScan': "parcours de tous les nœuds du graphe",
+    'Eager': "matérialisation complète des lignes (lecture et écriture mêlées)",
+    'CartesianProduct': "produit cartésien entre motifs non reliés"
+}
+
+# Commandes sans plan d'exécution
+_NOT_PLANNABLE = ('CREATE CONSTRAINT', 'CREATE INDEX', 'DROP ', 'SHOW ', 'EXPLAIN', 'PROFILE')
+
+
+def _field(plan, *keys, default=None):
+    """Champ d'un plan py2neo (clés snake_case) ou du pilote neo4j (clés camelCase)"""
+    for key in keys:
+        value = plan.get(key) if hasattr(plan, 'get') else getattr(plan, key, None)
+        if value is not None:
+            return value
+    return default
+
+
+def operator_name(plan):
+    """Type d'opérateur sans le suffixe du runtime ('NodeByLabelScan@neo4j' -> 'NodeByLabelScan')"""
+    return str(_field(plan, 'operator_type', 'operatorType', default='?')).split('@')[0]
+
+
+def flatten_plan(plan, depth=0):
+    """Opérateurs du plan en ordre préfixe, avec leur profondeur"""
+    args = _field(plan, 'args', 'arguments', default={}) or {}
+    operators = [{
+        'operator': operator_name(plan),
+        'depth': depth,
+        'details': args.get('Details') or args.get('LegacyExpression'),
+        'identifiers': list(_field(plan, 'identifiers', default=[]) or []),
+        'estimated_rows': args.get('EstimatedRows'),
+        'rows': _field(plan, 'rows', 'records'),
+        'db_hits': _field(plan, 'db_hits', 'dbHits')
+    }]
+    for child in _field(plan, 'children', default=[]) or []:
+        operators += flatten_plan(child, depth + 1)
+    return operators
+
+
+def with_prefix(query, prefix):
+    """Même requête nommée, précédée de EXPLAIN ou PROFILE"""
+    text = f'{prefix} {query}'
+    name = getattr(query, 'name', None)
+    return type(query)(name, text) if name is not None else text
+
+
+class PlanCapture:
+    """Plans d'exécution échantillonnés, par nom de requête (le dernier plan de chaque requête)"""
+
+    def __init__(self, mode='profile', sample_rate=0.01, seed=None):
+        if mode not in MODES:
+            raise ValueError(f"Mode de capture inconnu : {mode} (valeurs possibles : {', '.join(MODES)})")
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self._random = random.Random(seed)
+        self._plans = {}
+        self._lock = threading.Lock()
+
+    def sample(self, query):
+        """Mode de capture pour cette exécution ('EXPLAIN', 'PROFILE') ou None"""
+        if self._random.random() >= self.sample_rate:
+            return None
+        if str(query).lstrip().upper().startswith(_NOT_PLANNABLE):
+            return None
+        return self.mode.upper()
+
+    def run(self, run, query, params):
+        """Exécute `run(query, **params)`, en capturant le plan si la requête est tirée
+
+        Avec PROFILE, le résultat est lu en entier avant d'être retourné (le
+        plan n'est connu qu'à la fin) ; avec EXPLAIN, la requête est
+        exécutée normalement après son plan.
+        """
+        mode = self.sample(query)
+        if mode is None:
+            return run(query, **params)
+        if mode == 'EXPLAIN':
+            try:
+                cursor = run(with_prefix(query, mode), **params)
+                cursor.data()
+                self.store(query, mode, cursor.plan())
+            except Exception as e:
+                print(f"Capture du plan de {getattr(query, 'name', 'unnamed')} impossible : {e}")
+            return run(query, **params)
+
+        cursor = run(with_prefix(query, mode), **params)
+        records = cursor.data()
+        try:
+            self.store(query, mode, cursor.plan())
+        except Exception as e:
+            print(f"Capture du plan de {getattr(query, 'name', 'unnamed')} impossible : {e}")
+        return PlannedCursor(records)
+
+    def store(self, query, mode, plan):
+        if not plan:
+            return
+        name = getattr(query, 'name', 'unnamed')
+        operators = flatten_plan(plan)
+        flags = sorted({operator['operator'] for operator in operators} & FLAGGED_OPERATORS.keys())
+        # Signature de la forme du plan : un changement signale une variation de plan
+        signature = zlib.crc32(' '.join(f"{operator['depth']}:{operator['operator']}"
+                                        for operator in operators).encode())
+        db_hits = [operator['db_hits'] for operator in operators if operator['db_hits'] is not None]
+        with self._lock:
+            previous = self._plans.get(name)
+            signatures = previous['_signatures'] if previous else set()
+            signatures.add(signature)
+            self._plans[name] = {
+                'query': name,
+                'mode': mode.lower(),
+                'captured_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                'samples': (previous['samples'] if previous else 0) + 1,
+                'variants': len(signatures),
+                'flags': flags,
+                'db_hits': sum(db_hits) if db_hits else None,
+                'rows': operators[0]['rows'],
+                'operators': operators,
+                'cypher': ' '.join(str(query).split()),
+                '_signatures': signatures
+            }
+
+    def report(self, flagged_only=False):
+        """Plans capturés : signalés d'abord, puis par db hits décroissants"""
+        with self._lock:
+            plans = [{key: value for key, value in plan.items() if not key.startswith('_')}
+                     for plan in self._plans.values()]
+        if flagged_only:
+            plans = [plan for plan in plans if plan['flags']]
+        return sorted(plans, key=lambda plan: (not plan['flags'], -(plan['db_hits'] or 0), plan['query']))
+
+    def clear(self):
+        with self._lock:
+            self._plans.clear()
+
+
+class PlannedCursor:
+    """Résultat déjà lu d'une requête profilée, avec l'interface du curseur py2neo"""
+
+    def __init__(self, records):
+        self._records = records
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def data(self):
+        return list(self._records)
+
+
+def create_plan_capture(config=Config):
+    """Capture des plans selon la configuration ; None si désactivée ou sans Cypher (backend mémoire)"""
+    if not config.PLAN_CAPTURE_ENABLED:
+        return None
+    if config.DB_BACKEND == 'memory':
+        print("Capture des plans ignorée : le backend mémoire n'exécute pas de Cypher")
+        return None
+    return PlanCapture(config.PLAN_CAPTURE_MODE, config.PLAN_CAPTURE_SAMPLE)
+
+
+plan_capture = create_plan_capture()
+
+
+def format_report(plans, ignore=()):
+    """Lignes du rapport texte ; retourne (lignes, nombre de requêtes signalées)"""
+    lines = []
+    flagged = 0
+    for plan in plans:
+        flags = [flag for flag in plan['flags'] if plan['query'] not in ignore]
+        flagged += bool(flags)
+        status = 'SIGNALÉE ' + ', '.join(flags) if flags else 'ok'
+        db_hits = plan['db_hits'] if plan['db_hits'] is not None else '-'
+        variants = f", {plan['variants']} variantes de plan" if plan['variants'] > 1 else ''
+        lines.append(f"{plan['query']} : {status} ({plan['mode']}, {db_hits} db hits, "
+                     f"{plan['samples']} captures{variants})")
+        for operator in plan['operators']:
+            if operator['operator'] in flags:
+                lines.append(f"    {operator['operator']} : {FLAGGED_OPERATORS[operator['operator']]}"
+                             + (f" [{operator['details']}]" if operator['details'] else ''))
+    return lines, flagged
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Rapport des plans d'exécution capturés par un serveur")
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--ignore', default='', help="requêtes dont les signalements sont acceptés (noms séparés par des virgules)")
+    args = parser.parse_args()
+    try:
+        with urlopen(f'{args.url.rstrip("/")}/db/plans') as response:
+            plans = json.loads(response.read())['plans']
+    except HTTPError as e:
+        print(json.loads(e.read()).get('message', e))
+        sys.exit(2)
+    lines, flagged = format_report(plans, {name for name in args.ignore.split(',') if name})
+    print('\n'.join(lines) if lines else "Aucun plan capturé")
+    print(f"{len(plans)} requêtes, {flagged} signalées")
+    sys.exit(1 if flagged else 0)
@@ -0,0 +1,280 @@
+﻿# Recommandations d'amis précalculées ("personnes que vous pourriez connaître")
+#
+# Pour chaque utilisateur, les RECOMMENDATIONS_TOP_K meilleurs candidats
+# (amis d'amis qui ne sont pas déjà amis, classés par nombre d'amis en
+# commun) sont stockés sous forme de relations (u)-[:RECOMMENDED {score}]->(c).
+# Le calcul complet se fait ici, hors ligne, par intersection d'ensembles sur
+# les listes d'adjacence ; les ajouts et suppressions d'amis mettent ensuite
+# à jour les scores concernés (voir User.update_recommendations).
+#
+# Ces mises à jour ne sont pas faites dans la requête HTTP : les deltas sont
+# mis en file (RecommendationQueue) et appliqués par lots, au plus tard
+# RECOMMENDATIONS_FLUSH_INTERVAL secondes après, par un thread du processus.
+# Les scores sont donc en retard d'autant ; sous des écritures concurrentes
+# ils peuvent dériver d'une unité ou deux (un score créé compte les chemins
+# présents au moment du lot). La file n'est pas durable : les deltas en
+# attente sont perdus si le processus est tué ou recyclé avant le lot, et
+# ceux d'un lot en erreur sont abandonnés (comptés dans
+# recommendations_dropped_deltas_total, voir GET /metrics). Un recalcul
+# complet périodique (python -m app.db_init --build-recommendations) est
+# donc nécessaire pour remettre les scores exacts.
+import atexit
+from collections import Counter, defaultdict
+import heapq
+import os
+import threading
+import time
+from .bulk import batches
+from .config import Config
+from .database import Query
+from .metrics import recommendation_metrics
+
+EDGES_QUERY = Query("recommendations.edges", """
+MATCH (a:User)-[:FRIENDS_WITH]->(b:User)
+RETURN a.id AS user_id, b.id AS friend_id
+""")
+
+REPLACE_QUERY = Query("recommendations.replace", """
+UNWIND $rows AS row
+MATCH (u:User {id: row.user_id})
+OPTIONAL MATCH (u)-[old:RECOMMENDED]->()
+DELETE old
+WITH DISTINCT u, row
+UNWIND row.candidates AS candidate
+MATCH (c:User {id: candidate.id})
+CREATE (u)-[:RECOMMENDED {score: candidate.score}]->(c)
+""")
+
+
+def load_adjacency(graph):
+    """Charge le graphe d'amitié non orienté : {user_id: {ids des amis}}"""
+    adjacency = defaultdict(set)
+    for record in graph.run(EDGES_QUERY):
+        user_id, friend_id = record['user_id'], record['friend_id']
+        adjacency[user_id].add(friend_id)
+        adjacency[friend_id].add(user_id)
+    return adjacency
+
+
+def top_candidates(adjacency, user_id, top_k):
+    """Meilleurs candidats d'un utilisateur : [(candidate_id, amis en commun)]
+
+    Chaque ami f apporte un ami en commun à chacun de ses propres amis ;
+    le compte obtenu est |amis(u) ∩ amis(c)| pour chaque candidat c.
+    """
+    friends = adjacency.get(user_id, set())
+    counts = Counter()
+    for friend_id in friends:
+        counts.update(adjacency[friend_id])
+    counts.pop(user_id, None)
+    for friend_id in friends:
+        counts.pop(friend_id, None)
+    return heapq.nlargest(top_k, counts.items(), key=lambda item: (item[1], item[0]))
+
+
+def build_recommendations(graph, top_k=50, batch_size=1000, progress=None):
+    """Recalcule toute la table de recommandations
+
+    `progress`, s'il est donné, est appelé avec (utilisateurs écrits, total)
+    après chaque lot. Retourne le nombre d'utilisateurs traités.
+    """
+    if graph is None:
+        return 0
+
+    adjacency = load_adjacency(graph)
+    rows = [{'user_id': user_id,
+             'candidates': [{'id': candidate_id, 'score': score}
+                            for candidate_id, score in top_candidates(adjacency, user_id, top_k)]}
+            for user_id in adjacency]
+
+    written = 0
+    for batch in batches(rows, batch_size):
+        graph.run(REPLACE_QUERY, rows=batch)
+        written += len(batch)
+        if progress is not None:
+            progress(written, len(rows))
+    return written
+
+
+APPLY_QUERY = Query("user.recommendations_apply", """
+UNWIND $rows AS row
+MATCH (s:User {id: row.source}), (t:User {id: row.target})
+MERGE (s)-[r:RECOMMENDED]->(t)
+ON CREATE SET r.score = COUNT { (s)-[:FRIENDS_WITH]-(:User)-[:FRIENDS_WITH]-(t) }
+ON MATCH SET r.score = r.score + row.delta
+WITH s, t, r
+WHERE r.score <= 0 OR (s)-[:FRIENDS_WITH]-(t)
+DELETE r
+""")
+
+TRIM_QUERY = Query("user.recommendations_trim", """
+UNWIND $user_ids AS user_id
+MATCH (s:User {id: user_id})-[r:RECOMMENDED]->()
+WITH s, r ORDER BY r.score DESC
+WITH s, collect(r) AS rels
+WHERE size(rels) > $top_k
+FOREACH (r IN rels[$top_k..] | DELETE r)
+""")
+
+# Recommandations existantes de ces utilisateurs (au plus top_k chacun)
+RECOMMENDED_QUERY = Query("user.recommendations_of", """
+UNWIND $user_ids AS user_id
+MATCH (s:User {id: user_id})-[:RECOMMENDED]->(t:User)
+RETURN s.id AS source, t.id AS target
+""")
+
+
+def friendship_deltas(user_id, friend_id, user_friends, friend_friends, delta):
+    """Changements de score dus à l'ajout (+1) ou au retrait (-1) de l'amitié user_id - friend_id
+
+    `user_friends` et `friend_friends` sont les amis de chacun avant le
+    changement. Seules les paires qui gagnent ou perdent un chemin de
+    longueur 2 passant par l'arête changent de score : (x, ami) pour chaque
+    ami x de l'utilisateur qui n'est pas ami avec `friend_id`, et
+    inversement. Retourne {(source, cible): delta}.
+    """
+    user_friends, friend_friends = set(user_friends), set(friend_friends)
+    pairs = [(other_id, friend_id) for other_id in user_friends - friend_friends - {friend_id}]
+    pairs += [(other_id, user_id) for other_id in friend_friends - user_friends - {user_id}]
+    deltas = {}
+    for pair in pairs:
+        deltas[pair] = delta
+        deltas[pair[::-1]] = delta
+    # Les deux utilisateurs eux-mêmes : retirés s'ils sont amis, sinon score exact
+    deltas[(user_id, friend_id)] = 0
+    deltas[(friend_id, user_id)] = 0
+    return deltas
+
+
+def apply_deltas(graph, deltas, top_k, batch_size=1000):
+    """Applique {(source, cible): delta} puis ramène chaque source à ses `top_k` meilleurs"""
+    rows = [{'source': source, 'target': target, 'delta': delta}
+            for (source, target), delta in deltas.items()]
+    for batch in batches(rows, batch_size):
+        graph.run(APPLY_QUERY, rows=batch)
+    sources = list({source for source, _ in deltas})
+    for batch in batches(sources, batch_size):
+        graph.run(TRIM_QUERY, user_ids=batch, top_k=top_k)
+
+
+class RecommendationQueue:
+    """Deltas de recommandations en attente, appliqués par lots hors des requêtes HTTP
+
+    Les deltas d'une même paire sont additionnés avant d'être appliqués.
+    Un thread du processus applique la file `flush_interval` secondes
+    après le premier delta en attente ; avec `flush_interval=0`, chaque
+    ajout est appliqué tout de suite, dans l'appelant. La file restante est
+    appliquée à la sortie du processus.
+    """
+
+    def __init__(self, flush_interval=1.0, top_k=50, batch_size=1000):
+        self.flush_interval = flush_interval
+        self.top_k = top_k
+        self.batch_size = batch_size
+        self._flush_lock = threading.Lock()
+        self._reset()
+        atexit.register(self.flush)
+
+    def _reset(self):
+        """État propre au processus courant (la file du parent n'est pas la sienne)"""
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._deltas = {}
+        self._removed = []
+        self._thread = None
+
+    def _check_process(self):
+        if self._pid != os.getpid():
+            self._reset()
+
+    @property
+    def pending(self):
+        self._check_process()
+        with self._lock:
+            return len(self._deltas) + len(self._removed)
+
+    def add_friendship_change(self, user_id, friend_id, user_friends, friend_friends, delta):
+        """Met en file les changements dus à l'ajout (+1) ou au retrait (-1) d'une amitié"""
+        deltas = friendship_deltas(user_id, friend_id, user_friends, friend_friends, delta)
+        self._check_process()
+        with self._lock:
+            for pair, change in deltas.items():
+                self._deltas[pair] = self._deltas.get(pair, 0) + change
+        self._schedule()
+
+    def add_removed_user(self, friend_ids):
+        """Met en file la suppression d'un utilisateur qui avait ces amis
+
+        Chaque paire de ses anciens amis perd un ami en commun : seules les
+        recommandations existantes entre eux sont décrémentées (au plus
+        top_k par ami, et non une ligne par paire d'amis).
+        """
+        if len(friend_ids) < 2:
+            return
+        self._check_process()
+        with self._lock:
+            self._removed.append(list(friend_ids))
+        self._schedule()
+
+    def _schedule(self):
+        if not self.flush_interval:
+            self.flush()
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._worker, name='recommendations', daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def _worker(self):
+        while True:
+            self._wake.wait()
+            # Laisser les deltas s'accumuler pour les appliquer en un lot
+            self._wake.clear()
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                # Déjà compté par flush (recommendations_dropped_deltas_total)
+                print(f"Mise à jour des recommandations abandonnée : {e} "
+                      f"(recalcul : python -m app.db_init --build-recommendations)")
+
+    def flush(self, graph=None):
+        """Applique la file maintenant ; retourne le nombre de paires mises à jour
+
+        Un lot en erreur n'est pas remis en file : ses deltas sont comptés
+        comme perdus et l'exception est propagée.
+        """
+        self._check_process()
+        with self._flush_lock:
+            with self._lock:
+                deltas, removed = self._deltas, self._removed
+                self._deltas, self._removed = {}, []
+            if not deltas and not removed:
+                return 0
+            if graph is None:
+                from app import db as graph
+            pending = len(deltas) + len(removed)
+            try:
+                for friend_ids in removed:
+                    former_friends = set(friend_ids)
+                    for batch in batches(friend_ids, self.batch_size):
+                        for record in graph.run(RECOMMENDED_QUERY, user_ids=batch):
+                            if record['target'] in former_friends:
+                                pair = (record['source'], record['target'])
+                                deltas[pair] = deltas.get(pair, 0) - 1
+                apply_deltas(graph, deltas, self.top_k, self.batch_size)
+            except Exception:
+                recommendation_metrics.flushes.inc(('failed',))
+                recommendation_metrics.dropped.inc(('flush_failed',), pending)
+                raise
+            recommendation_metrics.flushes.inc(('applied',))
+            return len(deltas)
+
+
+recommendation_queue = RecommendationQueue(
+    flush_interval=Config.RECOMMENDATIONS_FLUSH_INTERVAL,
+    top_k=Config.RECOMMENDATIONS_TOP_K,
+    batch_size=Config.BULK_BATCH_SIZE
+)
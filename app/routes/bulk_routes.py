@@ -0,0 +1,61 @@
+﻿from flask import Blueprint, jsonify
+from app.bulk import get_bulk_params, bulk_response
+from app.models.comment import Comment
+from app.models.post import Post
+from app.models.user import User
+
+bulk_bp = Blueprint('bulk_bp', __name__)
+
+@bulk_bp.route('/likes/bulk', methods=['POST'])
+def bulk_like():
+    """Route pour ajouter des likes en masse sur des posts ou des commentaires"""
+    try:
+        try:
+            items, batch_size = get_bulk_params()
+        except ValueError as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
+        
+        # Séparer les likes de commentaires des likes de posts
+        comment_indexes = [i for i, item in enumerate(items)
+                           if isinstance(item, dict) and 'comment_id' in item]
+        comment_set = set(comment_indexes)
+        post_indexes = [i for i in range(len(items)) if i not in comment_set]
+        
+        # Rapporter chaque résultat à sa position dans la requête
+        results = [None] * len(items)
+        for indexes, like_many in ((post_indexes, Post.bulk_like),
+                                   (comment_indexes, Comment.bulk_like)):
+            batch_results = like_many([items[i] for i in indexes], batch_size=batch_size)
+            for index, result in zip(indexes, batch_results):
+                result['index'] = index
+                results[index] = result
+        
+        return bulk_response(results)
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+@bulk_bp.route('/friendships/bulk', methods=['POST'])
+def bulk_add_friends():
+    """Route pour créer des relations d'amitié en masse"""
+    try:
+        try:
+            items, batch_size = get_bulk_params()
+        except ValueError as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
+        
+        results = User.bulk_add_friends(items, batch_size=batch_size)
+        return bulk_response(results)
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
@@ -1,18 +1,48 @@
-﻿from flask import Blueprint, jsonify, request
+﻿from flask import Blueprint, jsonify
+from app.pagination import get_page_params, split_page
+from app.streaming import wants_stream, ndjson_response
+from app.engagement import get_engagement_params, engagement_row
+from app.bulk import get_bulk_params, bulk_response
+from app.schemas import get_json_body, COMMENT_UPDATE, LIKE, COMMENT_CREATE
+from app.conditional import conditional
+from app.versions import comments_key
+from app.status import USER_MISSING, TARGET_MISSING, CREATED, REMOVED
 from app.models.comment import Comment
 from app.models.post import Post
-from app.models.user import User
 
 comment_bp = Blueprint('comment_bp', __name__)
 
 @comment_bp.route('', methods=['GET'])
 def get_comments():
-    """Route pour récupérer tous les commentaires"""
+    """Route pour récupérer les commentaires, paginés par curseur
+
+    `?include=` et `?viewer=` ajoutent les données d'engagement (voir app.engagement).
+    """
     try:
-        comments = Comment.find_all()
+        stream = wants_stream()
+        try:
+            limit, after = get_page_params(bounded=not stream)
+            include, viewer_id = get_engagement_params(('likes_count',))
+        except ValueError as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
+        
+        # En mode flux, envoyer chaque commentaire dès sa lecture
+        if stream:
+            return ndjson_response(Comment.iter_all_rows(limit=limit, after=after, viewer_id=viewer_id),
+                                   lambda row: engagement_row(row, include))
+        
+        # Récupérer une page de plus pour savoir s'il reste des résultats
+        # Lignes projetées par la requête : sérialisées sans objet Comment
+        comments = list(Comment.iter_all_rows(limit=limit + 1, after=after, viewer_id=viewer_id))
+        comments, next_cursor = split_page(comments, limit)
+        
         return jsonify({
             'status': 'success',
-            'comments': [comment.to_dict() for comment in comments]
+            'comments': [engagement_row(comment, include) for comment in comments],
+            'next_cursor': next_cursor
         }), 200
     except Exception as e:
         return jsonify({
@@ -20,6 +50,26 @@ def get_comments():
             'message': str(e)
         }), 500
 
+@comment_bp.route('/bulk', methods=['POST'])
+def bulk_create_comments():
+    """Route pour créer des commentaires en masse (liste JSON dans le body)"""
+    try:
+        try:
+            items, batch_size = get_bulk_params()
+        except ValueError as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
+        
+        results = Comment.bulk_create(items, batch_size=batch_size)
+        return bulk_response(results)
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
 @comment_bp.route('/<comment_id>', methods=['GET'])
 def get_comment(comment_id):
     """Route pour récupérer un commentaire par son ID"""
@@ -45,11 +95,12 @@ def get_comment(comment_id):
 def update_comment(comment_id):
     """Route pour mettre à jour un commentaire"""
     try:
-        data = request.get_json()
-        if not data:
+        try:
+            data = get_json_body(COMMENT_UPDATE)
+        except ValueError as e:
             return jsonify({
                 'status': 'error',
-                'message': 'Données JSON manquantes'
+                'message': str(e)
             }), 400
         
         # Vérifier que le commentaire existe
@@ -107,38 +158,36 @@ def delete_comment(comment_id):
 def like_comment(comment_id):
     """Route pour ajouter un like à un commentaire"""
     try:
-        data = request.get_json()
-        if not data or 'user_id' not in data:
+        try:
+            data = get_json_body(LIKE)
+        except ValueError as e:
             return jsonify({
                 'status': 'error',
-                'message': 'ID utilisateur manquant dans les données'
+                'message': str(e)
             }), 400
         
         user_id = data['user_id']
         
-        # Vérifier que l'utilisateur et le commentaire existent
-        user = User.find_by_id(user_id)
-        comment = Comment.find_by_id(comment_id)
+        # Vérifier les deux nœuds et ajouter le like en une seule requête
+        status = Comment.add_like(comment_id, user_id)
         
-        if not user:
+        if status == USER_MISSING:
             return jsonify({
                 'status': 'error',
                 'message': f'Utilisateur avec l\'ID {user_id} non trouvé'
             }), 404
         
-        if not comment:
+        if status == TARGET_MISSING:
             return jsonify({
                 'status': 'error',
                 'message': f'Commentaire avec l\'ID {comment_id} non trouvé'
             }), 404
         
-        # Ajouter le like
-        comment.like(user_id)
-        
         return jsonify({
             'status': 'success',
-            'message': f'Like ajouté au commentaire {comment_id} par l\'utilisateur {user_id}'
-        }), 201
+            'message': f'Like ajouté au commentaire {comment_id} par l\'utilisateur {user_id}',
+            'created': status == CREATED
+        }), 201 if status == CREATED else 200
     except Exception as e:
         return jsonify({
             'status': 'error',
@@ -149,37 +198,35 @@ def like_comment(comment_id):
 def unlike_comment(comment_id):
     """Route pour retirer un like d'un commentaire"""
     try:
-        data = request.get_json()
-        if not data or 'user_id' not in data:
+        try:
+            data = get_json_body(LIKE)
+        except ValueError as e:
             return jsonify({
                 'status': 'error',
-                'message': 'ID utilisateur manquant dans les données'
+                'message': str(e)
             }), 400
         
         user_id = data['user_id']
         
-        # Vérifier que l'utilisateur et le commentaire existent
-        user = User.find_by_id(user_id)
-        comment = Comment.find_by_id(comment_id)
+        # Vérifier les deux nœuds et retirer le like en une seule requête
+        status = Comment.remove_like(comment_id, user_id)
         
-        if not user:
+        if status == USER_MISSING:
             return jsonify({
                 'status': 'error',
                 'message': f'Utilisateur avec l\'ID {user_id} non trouvé'
             }), 404
         
-        if not comment:
+        if status == TARGET_MISSING:
             return jsonify({
                 'status': 'error',
                 'message': f'Commentaire avec l\'ID {comment_id} non trouvé'
             }), 404
         
-        # Retirer le like
-        comment.unlike(user_id)
-        
         return jsonify({
             'status': 'success',
-            'message': f'Like retiré du commentaire {comment_id} par l\'utilisateur {user_id}'
+            'message': f'Like retiré du commentaire {comment_id} par l\'utilisateur {user_id}',
+            'removed': status == REMOVED
         }), 200
     except Exception as e:
         return jsonify({
@@ -189,6 +236,7 @@ def unlike_comment(comment_id):
 
 # Routes pour les commentaires liés à un post
 @comment_bp.route('/posts/<post_id>/comments', methods=['GET'])
+@conditional(lambda post_id: [comments_key(post_id)])
 def get_post_comments(post_id):
     """Route pour récupérer les commentaires d'un post"""
     try:
@@ -200,12 +248,25 @@ def get_post_comments(post_id):
                 'message': f'Post avec l\'ID {post_id} non trouvé'
             }), 404
         
+        try:
+            include, viewer_id = get_engagement_params(('likes_count',))
+        except ValueError as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
+        
+        # En mode flux, envoyer chaque commentaire dès sa lecture
+        if wants_stream():
+            return ndjson_response(Comment.iter_by_post_rows(post_id, viewer_id=viewer_id),
+                                   lambda row: engagement_row(row, include))
+        
         # Récupérer les commentaires du post
-        comments = Comment.find_by_post(post_id)
+        comments = Comment.iter_by_post_rows(post_id, viewer_id=viewer_id)
         
         return jsonify({
             'status': 'success',
-            'comments': [comment.to_dict() for comment in comments]
+            'comments': [engagement_row(comment, include) for comment in comments]
         }), 200
     except Exception as e:
         return jsonify({
@@ -217,41 +278,25 @@ def get_post_comments(post_id):
 def create_comment(post_id):
     """Route pour ajouter un commentaire à un post"""
     try:
-        data = request.get_json()
-        if not data:
+        try:
+            data = get_json_body(COMMENT_CREATE)
+        except ValueError as e:
             return jsonify({
                 'status': 'error',
-                'message': 'Données JSON manquantes'
+                'message': str(e)
             }), 400
         
-        # Vérifier que les champs requis sont présents
-        if 'content' not in data or 'user_id' not in data:
+        # Créer et enregistrer le nouveau commentaire : save() vérifie
+        # l'utilisateur et le post dans la même requête
+        comment = Comment(content=data['content'], user_id=data['user_id'], post_id=post_id)
+        try:
+            comment.save()
+        except ValueError as e:
             return jsonify({
                 'status': 'error',
-                'message': 'Les champs content et user_id sont requis'
-            }), 400
-        
-        # Vérifier que l'utilisateur et le post existent
-        user_id = data['user_id']
-        user = User.find_by_id(user_id)
-        post = Post.find_by_id(post_id)
-        
-        if not user:
-            return jsonify({
-                'status': 'error',
-                'message': f'Utilisateur avec l\'ID {user_id} non trouvé'
+                'message': str(e)
             }), 404
         
-        if not post:
-            return jsonify({
-                'status': 'error',
-                'message': f'Post avec l\'ID {post_id} non trouvé'
-            }), 404
-        
-        # Créer et enregistrer le nouveau commentaire
-        comment = Comment(content=data['content'], user_id=user_id, post_id=post_id)
-        comment.save()
-        
         return jsonify({
             'status': 'success',
             'message': 'Commentaire créé avec succès',
@@ -1,17 +1,49 @@
-﻿from flask import Blueprint, jsonify, request
+﻿from flask import Blueprint, jsonify
+from app.pagination import get_page_params, split_page
+from app.streaming import wants_stream, ndjson_response
+from app.engagement import get_engagement_params, engagement_row
+from app.bulk import get_bulk_params, bulk_response
+from app.schemas import get_json_body, POST_UPDATE, LIKE, POST_CREATE
+from app.conditional import conditional
+from app.versions import POSTS, post_key
+from app.status import USER_MISSING, TARGET_MISSING, CREATED, REMOVED
 from app.models.post import Post
 from app.models.user import User
 
 post_bp = Blueprint('post_bp', __name__)
 
 @post_bp.route('', methods=['GET'])
+@conditional(lambda: [POSTS])
 def get_posts():
-    """Route pour récupérer tous les posts"""
+    """Route pour récupérer les posts, paginés par curseur
+
+    `?include=` et `?viewer=` ajoutent les données d'engagement (voir app.engagement).
+    """
     try:
-        posts = Post.find_all()
+        stream = wants_stream()
+        try:
+            limit, after = get_page_params(bounded=not stream)
+            include, viewer_id = get_engagement_params(('likes_count', 'comment_count'))
+        except ValueError as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
+        
+        # En mode flux, envoyer chaque post dès sa lecture
+        if stream:
+            return ndjson_response(Post.iter_all_rows(limit=limit, after=after, viewer_id=viewer_id),
+                                   lambda row: engagement_row(row, include))
+        
+        # Récupérer une page de plus pour savoir s'il reste des résultats
+        # Lignes projetées par la requête : sérialisées sans objet Post
+        posts = list(Post.iter_all_rows(limit=limit + 1, after=after, viewer_id=viewer_id))
+        posts, next_cursor = split_page(posts, limit)
+        
         return jsonify({
             'status': 'success',
-            'posts': [post.to_dict() for post in posts]
+            'posts': [engagement_row(post, include) for post in posts],
+            'next_cursor': next_cursor
         }), 200
     except Exception as e:
         return jsonify({
@@ -19,7 +51,28 @@ def get_posts():
             'message': str(e)
         }), 500
 
+@post_bp.route('/bulk', methods=['POST'])
+def bulk_create_posts():
+    """Route pour créer des posts en masse (liste JSON dans le body)"""
+    try:
+        try:
+            items, batch_size = get_bulk_params()
+        except ValueError as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
+        
+        results = Post.bulk_create(items, batch_size=batch_size)
+        return bulk_response(results)
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
 @post_bp.route('/<post_id>', methods=['GET'])
+@conditional(lambda post_id: [post_key(post_id)])
 def get_post(post_id):
     """Route pour récupérer un post par son ID"""
     try:
@@ -51,11 +104,12 @@ def get_post(post_id):
 def update_post(post_id):
     """Route pour mettre à jour un post"""
     try:
-        data = request.get_json()
-        if not data:
+        try:
+            data = get_json_body(POST_UPDATE)
+        except ValueError as e:
             return jsonify({
                 'status': 'error',
-                'message': 'Données JSON manquantes'
+                'message': str(e)
             }), 400
         
         # Vérifier que le post existe
@@ -115,38 +169,36 @@ def delete_post(post_id):
 def like_post(post_id):
     """Route pour ajouter un like à un post"""
     try:
-        data = request.get_json()
-        if not data or 'user_id' not in data:
+        try:
+            data = get_json_body(LIKE)
+        except ValueError as e:
             return jsonify({
                 'status': 'error',
-                'message': 'ID utilisateur manquant dans les données'
+                'message': str(e)
             }), 400
         
         user_id = data['user_id']
         
-        # Vérifier que l'utilisateur et le post existent
-        user = User.find_by_id(user_id)
-        post = Post.find_by_id(post_id)
+        # Vérifier les deux nœuds et ajouter le like en une seule requête
+        status = Post.add_like(post_id, user_id)
         
-        if not user:
+        if status == USER_MISSING:
             return jsonify({
                 'status': 'error',
                 'message': f'Utilisateur avec l\'ID {user_id} non trouvé'
             }), 404
         
-        if not post:
+        if status == TARGET_MISSING:
             return jsonify({
                 'status': 'error',
                 'message': f'Post avec l\'ID {post_id} non trouvé'
             }), 404
         
-        # Ajouter le like
-        post.like(user_id)
-        
         return jsonify({
             'status': 'success',
-            'message': f'Like ajouté au post {post_id} par l\'utilisateur {user_id}'
-        }), 201
+            'message': f'Like ajouté au post {post_id} par l\'utilisateur {user_id}',
+            'created': status == CREATED
+        }), 201 if status == CREATED else 200
     except Exception as e:
         return jsonify({
             'status': 'error',
@@ -157,37 +209,35 @@ def like_post(post_id):
 def unlike_post(post_id):
     """Route pour retirer un like d'un post"""
     try:
-        data = request.get_json()
-        if not data or 'user_id' not in data:
+        try:
+            data = get_json_body(LIKE)
+        except ValueError as e:
             return jsonify({
                 'status': 'error',
-                'message': 'ID utilisateur manquant dans les données'
+                'message': str(e)
             }), 400
         
         user_id = data['user_id']
         
-        # Vérifier que l'utilisateur et le post existent
-        user = User.find_by_id(user_id)
-        post = Post.find_by_id(post_id)
+        # Vérifier les deux nœuds et retirer le like en une seule requête
+        status = Post.remove_like(post_id, user_id)
         
-        if not user:
+        if status == USER_MISSING:
             return jsonify({
                 'status': 'error',
                 'message': f'Utilisateur avec l\'ID {user_id} non trouvé'
             }), 404
         
-        if not post:
+        if status == TARGET_MISSING:
             return jsonify({
                 'status': 'error',
                 'message': f'Post avec l\'ID {post_id} non trouvé'
             }), 404
         
-        # Retirer le like
-        post.unlike(user_id)
-        
         return jsonify({
             'status': 'success',
-            'message': f'Like retiré du post {post_id} par l\'utilisateur {user_id}'
+            'message': f'Like retiré du post {post_id} par l\'utilisateur {user_id}',
+            'removed': status == REMOVED
         }), 200
     except Exception as e:
         return jsonify({
@@ -208,12 +258,25 @@ def get_user_posts(user_id):
                 'message': f'Utilisateur avec l\'ID {user_id} non trouvé'
             }), 404
         
+        try:
+            include, viewer_id = get_engagement_params(('likes_count', 'comment_count'))
+        except ValueError as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
+        
+        # En mode flux, envoyer chaque post dès sa lecture
+        if wants_stream():
+            return ndjson_response(Post.iter_by_user_rows(user_id, viewer_id=viewer_id),
+                                   lambda row: engagement_row(row, include))
+        
         # Récupérer les posts de l'utilisateur
-        posts = Post.find_by_user(user_id)
+        posts = Post.iter_by_user_rows(user_id, viewer_id=viewer_id)
         
         return jsonify({
             'status': 'success',
-            'posts': [post.to_dict() for post in posts]
+            'posts': [engagement_row(post, include) for post in posts]
         }), 200
     except Exception as e:
         return jsonify({
@@ -225,32 +288,25 @@ def get_user_posts(user_id):
 def create_post(user_id):
     """Route pour créer un post"""
     try:
-        data = request.get_json()
-        if not data:
+        try:
+            data = get_json_body(POST_CREATE)
+        except ValueError as e:
             return jsonify({
                 'status': 'error',
-                'message': 'Données JSON manquantes'
+                'message': str(e)
             }), 400
         
-        # Vérifier que les champs requis sont présents
-        if 'title' not in data or 'content' not in data:
-            return jsonify({
-                'status': 'error',
-                'message': 'Les champs title et content sont requis'
-            }), 400
-        
-        # Vérifier que l'utilisateur existe
-        user = User.find_by_id(user_id)
-        if not user:
+        # Créer et enregistrer le nouveau post : save() vérifie l'utilisateur
+        # dans la même requête
+        post = Post(title=data['title'], content=data['content'], user_id=user_id)
+        try:
+            post.save()
+        except ValueError as e:
             return jsonify({
                 'status': 'error',
-                'message': f'Utilisateur avec l\'ID {user_id} non trouvé'
+                'message': str(e)
             }), 404
         
-        # Créer et enregistrer le nouveau post
-        post = Post(title=data['title'], content=data['content'], user_id=user_id)
-        post.save()
-        
         return jsonify({
             'status': 'success',
             'message': 'Post créé avec succès',
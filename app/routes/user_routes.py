@@ -1,16 +1,44 @@
-﻿from flask import Blueprint, jsonify, request
+﻿from flask import Blueprint, current_app, jsonify
+from app.pagination import get_page_params, get_limit_param, split_page
+from app.streaming import wants_stream, ndjson_response
+from app.engagement import get_engagement_params, engagement_dict, engagement_row
+from app.bulk import get_bulk_params, bulk_response
+from app.schemas import get_json_body, USER_CREATE, USER_UPDATE, FRIEND
+from app.conditional import conditional
+from app.versions import friends_key
+from app.status import USER_MISSING, TARGET_MISSING, CREATED, REMOVED, EXISTS
 from app.models.user import User
+from app.models.post import Post
 
 user_bp = Blueprint('user_bp', __name__)
 
 @user_bp.route('', methods=['GET'])
 def get_users():
-    """Route pour récupérer la liste des utilisateurs"""
+    """Route pour récupérer la liste des utilisateurs, paginée par curseur"""
     try:
-        users = User.find_all()
+        stream = wants_stream()
+        try:
+            limit, after = get_page_params(bounded=not stream)
+        except ValueError as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
+        
+        # En mode flux, envoyer chaque utilisateur dès sa lecture
+        if stream:
+            return ndjson_response(User.iter_all_rows(limit=limit, after=after),
+                                   lambda row: row)
+        
+        # Récupérer une page de plus pour savoir s'il reste des résultats
+        # Lignes projetées par la requête : sérialisées sans objet User
+        users = list(User.iter_all_rows(limit=limit + 1, after=after))
+        users, next_cursor = split_page(users, limit)
+        
         return jsonify({
             'status': 'success',
-            'users': [user.to_dict() for user in users]
+            'users': users,
+            'next_cursor': next_cursor
         }), 200
     except Exception as e:
         return jsonify({
@@ -22,18 +50,12 @@ def get_users():
 def create_user():
     """Route pour créer un nouvel utilisateur"""
     try:
-        data = request.get_json()
-        if not data:
+        try:
+            data = get_json_body(USER_CREATE)
+        except ValueError as e:
             return jsonify({
                 'status': 'error',
-                'message': 'Données JSON manquantes'
-            }), 400
-        
-        # Vérifier que les champs requis sont présents
-        if 'name' not in data or 'email' not in data:
-            return jsonify({
-                'status': 'error',
-                'message': 'Les champs name et email sont requis'
+                'message': str(e)
             }), 400
         
         # Créer et enregistrer le nouvel utilisateur
@@ -51,6 +73,26 @@ def create_user():
             'message': str(e)
         }), 500
 
+@user_bp.route('/bulk', methods=['POST'])
+def bulk_create_users():
+    """Route pour créer des utilisateurs en masse (liste JSON dans le body)"""
+    try:
+        try:
+            items, batch_size = get_bulk_params()
+        except ValueError as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
+        
+        results = User.bulk_create(items, batch_size=batch_size)
+        return bulk_response(results)
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
 @user_bp.route('/<user_id>', methods=['GET'])
 def get_user(user_id):
     """Route pour récupérer un utilisateur par son ID"""
@@ -76,11 +118,12 @@ def get_user(user_id):
 def update_user(user_id):
     """Route pour mettre à jour un utilisateur par son ID"""
     try:
-        data = request.get_json()
-        if not data:
+        try:
+            data = get_json_body(USER_UPDATE)
+        except ValueError as e:
             return jsonify({
                 'status': 'error',
-                'message': 'Données JSON manquantes'
+                'message': str(e)
             }), 400
         
         # Vérifier que l'utilisateur existe
@@ -137,6 +180,7 @@ def delete_user(user_id):
         }), 500
 
 @user_bp.route('/<user_id>/friends', methods=['GET'])
+@conditional(lambda user_id: [friends_key(user_id)])
 def get_friends(user_id):
     """Route pour récupérer la liste des amis d'un utilisateur"""
     try:
@@ -161,49 +205,90 @@ def get_friends(user_id):
             'message': str(e)
         }), 500
 
+@user_bp.route('/<user_id>/feed', methods=['GET'])
+def get_feed(user_id):
+    """Route pour récupérer le fil d'actualité (posts des amis), paginé par curseur"""
+    try:
+        # Vérifier que l'utilisateur existe
+        user = User.find_by_id(user_id)
+        if not user:
+            return jsonify({
+                'status': 'error',
+                'message': f'Utilisateur avec l\'ID {user_id} non trouvé'
+            }), 404
+        
+        stream = wants_stream()
+        try:
+            limit, after = get_page_params(bounded=not stream)
+            include, viewer_id = get_engagement_params(('likes_count', 'comment_count'))
+        except ValueError as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
+        
+        # En mode flux, envoyer chaque post dès sa lecture
+        if stream:
+            return ndjson_response(Post.iter_feed_rows(user_id, limit=limit, after=after, viewer_id=viewer_id),
+                                   lambda row: engagement_row(row, include))
+        
+        # Récupérer une page de plus pour savoir s'il reste des résultats
+        # Fil matérialisé si TIMELINE_ENABLED, sinon lecture des posts des amis
+        posts = Post.find_timeline(user_id, limit + 1, after=after, viewer_id=viewer_id)
+        posts, next_cursor = split_page(posts, limit)
+        
+        return jsonify({
+            'status': 'success',
+            'posts': [engagement_dict(post, include, viewer_id) for post in posts],
+            'next_cursor': next_cursor
+        }), 200
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
 @user_bp.route('/<user_id>/friends', methods=['POST'])
 def add_friend(user_id):
     """Route pour ajouter un ami (ID de l'ami dans le body)"""
     try:
-        data = request.get_json()
-        if not data or 'friend_id' not in data:
+        try:
+            data = get_json_body(FRIEND)
+        except ValueError as e:
             return jsonify({
                 'status': 'error',
-                'message': 'ID de l\'ami manquant dans les données'
+                'message': str(e)
             }), 400
         
         friend_id = data['friend_id']
         
-        # Vérifier que les deux utilisateurs existent
-        user = User.find_by_id(user_id)
-        friend = User.find_by_id(friend_id)
+        # Vérifier qu'un utilisateur ne peut pas s'ajouter lui-même
+        if user_id == friend_id:
+            return jsonify({
+                'status': 'error',
+                'message': 'Un utilisateur ne peut pas s\'ajouter lui-même comme ami'
+            }), 400
         
-        if not user:
+        # Vérifier les deux nœuds et créer l'amitié en une seule requête
+        status = User.create_friendship(user_id, friend_id)
+        
+        if status == USER_MISSING:
             return jsonify({
                 'status': 'error',
                 'message': f'Utilisateur avec l\'ID {user_id} non trouvé'
             }), 404
         
-        if not friend:
+        if status == TARGET_MISSING:
             return jsonify({
                 'status': 'error',
                 'message': f'Ami avec l\'ID {friend_id} non trouvé'
             }), 404
         
-        # Vérifier qu'un utilisateur ne peut pas s'ajouter lui-même
-        if user_id == friend_id:
-            return jsonify({
-                'status': 'error',
-                'message': 'Un utilisateur ne peut pas s\'ajouter lui-même comme ami'
-            }), 400
-        
-        # Ajouter l'ami
-        user.add_friend(friend_id)
-        
         return jsonify({
             'status': 'success',
-            'message': f'Amitié créée entre les utilisateurs {user_id} et {friend_id}'
-        }), 201
+            'message': f'Amitié créée entre les utilisateurs {user_id} et {friend_id}',
+            'created': status == CREATED
+        }), 201 if status == CREATED else 200
     except Exception as e:
         return jsonify({
             'status': 'error',
@@ -214,28 +299,25 @@ def add_friend(user_id):
 def remove_friend(user_id, friend_id):
     """Route pour supprimer un ami"""
     try:
-        # Vérifier que les deux utilisateurs existent
-        user = User.find_by_id(user_id)
-        friend = User.find_by_id(friend_id)
+        # Vérifier les deux nœuds et supprimer l'amitié en une seule requête
+        status = User.delete_friendship(user_id, friend_id)
         
-        if not user:
+        if status == USER_MISSING:
             return jsonify({
                 'status': 'error',
                 'message': f'Utilisateur avec l\'ID {user_id} non trouvé'
             }), 404
         
-        if not friend:
+        if status == TARGET_MISSING:
             return jsonify({
                 'status': 'error',
                 'message': f'Ami avec l\'ID {friend_id} non trouvé'
             }), 404
         
-        # Supprimer l'amitié
-        user.remove_friend(friend_id)
-        
         return jsonify({
             'status': 'success',
-            'message': f'Amitié supprimée entre les utilisateurs {user_id} et {friend_id}'
+            'message': f'Amitié supprimée entre les utilisateurs {user_id} et {friend_id}',
+            'removed': status == REMOVED
         }), 200
     except Exception as e:
         return jsonify({
@@ -247,29 +329,62 @@ def remove_friend(user_id, friend_id):
 def check_friendship(user_id, friend_id):
     """Route pour vérifier si deux utilisateurs sont amis"""
     try:
-        # Vérifier que les deux utilisateurs existent
-        user = User.find_by_id(user_id)
-        friend = User.find_by_id(friend_id)
+        # Vérifier les deux nœuds et lire l'amitié en une seule requête
+        status = User.friendship_status(user_id, friend_id)
         
-        if not user:
+        if status == USER_MISSING:
             return jsonify({
                 'status': 'error',
                 'message': f'Utilisateur avec l\'ID {user_id} non trouvé'
             }), 404
         
-        if not friend:
+        if status == TARGET_MISSING:
             return jsonify({
                 'status': 'error',
                 'message': f'Ami avec l\'ID {friend_id} non trouvé'
             }), 404
         
-        # Vérifier l'amitié
-        are_friends = User.check_friendship(user_id, friend_id)
+        return jsonify({
+            'status': 'success',
+            'are_friends': status == EXISTS
+        }), 200
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+@user_bp.route('/<user_id>/recommendations', methods=['GET'])
+def get_recommendations(user_id):
+    """Route pour récupérer les amis suggérés (amis d'amis, par amis en commun)"""
+    try:
+        # Vérifier que l'utilisateur existe
+        user = User.find_by_id(user_id)
+        if not user:
+            return jsonify({
+                'status': 'error',
+                'message': f'Utilisateur avec l\'ID {user_id} non trouvé'
+            }), 404
+        
+        try:
+            limit = get_limit_param(10, current_app.config.get('RECOMMENDATIONS_TOP_K', 50))
+        except ValueError as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
+        
+        recommendations = []
+        for candidate, mutual_count in User.get_recommendations(user_id, limit=limit):
+            candidate_dict = candidate.to_dict()
+            candidate_dict['mutual_friends_count'] = mutual_count
+            recommendations.append(candidate_dict)
         
         return jsonify({
             'status': 'success',
-            'are_friends': are_friends
-        }), 200 except Exception as e:
+            'recommendations': recommendations
+        }), 200
+    except Exception as e:
         return jsonify({
             'status': 'error',
             'message': str(e)
@@ -0,0 +1,87 @@
+﻿# Contraintes et index du graphe
+#
+# Toutes les recherches des modèles passent par la propriété `id` :
+# sans contrainte d'unicité, chaque `MATCH (x:Label {id: $id})` parcourt
+# tous les nœuds du label.
+
+from .database import Query
+
+# (nom, requête Cypher) - les noms servent à détecter ce qui existe déjà
+CONSTRAINTS = [
+    ("user_id_unique",
+     Query("schema.create", "CREATE CONSTRAINT user_id_unique IF NOT EXISTS FOR (u:User) REQUIRE u.id IS UNIQUE")),
+    ("post_id_unique",
+     Query("schema.create", "CREATE CONSTRAINT post_id_unique IF NOT EXISTS FOR (p:Post) REQUIRE p.id IS UNIQUE")),
+    ("comment_id_unique",
+     Query("schema.create", "CREATE CONSTRAINT comment_id_unique IF NOT EXISTS FOR (c:Comment) REQUIRE c.id IS UNIQUE")),
+]
+
+INDEXES = [
+    ("user_created_at",
+     Query("schema.create", "CREATE INDEX user_created_at IF NOT EXISTS FOR (u:User) ON (u.created_at)")),
+    ("post_created_at",
+     Query("schema.create", "CREATE INDEX post_created_at IF NOT EXISTS FOR (p:Post) ON (p.created_at)")),
+    ("comment_created_at",
+     Query("schema.create", "CREATE INDEX comment_created_at IF NOT EXISTS FOR (c:Comment) ON (c.created_at)")),
+    ("user_email",
+     Query("schema.create", "CREATE INDEX user_email IF NOT EXISTS FOR (u:User) ON (u.email)")),
+    # Posts d'un auteur, du plus récent au plus ancien (fil d'actualité, voir feed_query)
+    ("post_author_created_at",
+     Query("schema.create",
+           "CREATE INDEX post_author_created_at IF NOT EXISTS FOR (p:Post) ON (p.author_id, p.created_at)")),
+]
+
+# Copie l'ID de l'auteur sur les posts créés avant l'index post_author_created_at
+BACKFILL_POST_AUTHORS_QUERY = Query("schema.backfill_post_authors", """
+MATCH (u:User)-[:CREATED]->(p:Post)
+WHERE p.author_id IS NULL
+WITH u, p LIMIT $batch_size
+SET p.author_id = u.id
+RETURN count(p) AS updated
+""")
+
+
+def _existing_names(graph):
+    """Récupère les noms des contraintes et index déjà présents"""
+    names = set()
+    for query in (Query("schema.show_constraints", "SHOW CONSTRAINTS YIELD name RETURN name"),
+                  Query("schema.show_indexes", "SHOW INDEXES YIELD name RETURN name")):
+        names.update(record.get('name') for record in graph.run(query).data())
+    return names
+
+
+def init_schema(graph):
+    """Crée les contraintes et index manquants (idempotent)
+
+    Retourne un dictionnaire {"created": [...], "existing": [...]}.
+    """
+    report = {"created": [], "existing": []}
+    if graph is None:
+        return report
+
+    existing = _existing_names(graph)
+    for name, query in CONSTRAINTS + INDEXES:
+        if name in existing:
+            report["existing"].append(name)
+            continue
+        graph.run(query)
+        report["created"].append(name)
+
+    if "post_author_created_at" in report["created"]:
+        backfill_post_authors(graph)
+
+    return report
+
+
+def backfill_post_authors(graph, batch_size=10000):
+    """Renseigne `author_id` sur les posts qui ne l'ont pas, une transaction par lot
+
+    Retourne le nombre de posts mis à jour.
+    """
+    total = 0
+    while True:
+        result = graph.run(BACKFILL_POST_AUTHORS_QUERY, batch_size=batch_size).data()
+        updated = result[0].get('updated') if result else 0
+        if not updated:
+            return total
+        total += updated
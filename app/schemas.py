@@ -0,0 +1,84 @@
+﻿# Schémas déclaratifs des corps de requête JSON
+from flask import request
+
+# Nom des types dans les messages d'erreur
+TYPE_NAMES = {str: 'chaîne', int: 'entier', bool: 'booléen', list: 'liste', dict: 'objet'}
+
+
+class ValidationError(ValueError):
+    """Corps de requête (ou élément d'une écriture en masse) invalide"""
+
+
+class Schema:
+    """Champs attendus d'un objet JSON, avec leur type
+
+        Schema(required={'name': str, 'email': str}, optional={'id': str})
+
+    Les vérifications sont préparées une fois, à la déclaration : `validate`
+    ne fait qu'un passage sur les champs déclarés. Un champ obligatoire
+    absent, nul ou vide est signalé comme manquant ; un champ facultatif nul
+    est ignoré. Le type doit correspondre exactement (un booléen n'est pas
+    un entier).
+    """
+
+    def __init__(self, required=None, optional=None):
+        required = required or {}
+        optional = optional or {}
+        self.fields = {**required, **optional}
+        self._required = tuple(required)
+        self._checks = tuple(
+            (name, expected, f"Champ {name} invalide (type attendu : {TYPE_NAMES.get(expected, expected.__name__)})")
+            for name, expected in self.fields.items()
+        )
+
+    def validate(self, data):
+        """Retourne les champs déclarés présents dans `data`, ou lève ValidationError"""
+        missing = [name for name in self._required if data.get(name) in (None, '')]
+        if missing:
+            raise ValidationError(f"Champs manquants : {', '.join(missing)}")
+        clean = {}
+        for name, expected, message in self._checks:
+            value = data.get(name)
+            if value is None:
+                continue
+            if type(value) is not expected:
+                raise ValidationError(message)
+            clean[name] = value
+        return clean
+
+
+def validate_body(schema, data):
+    """Valide un corps de requête déjà décodé ; lève ValidationError (réponse 400)"""
+    if not isinstance(data, dict) or not data:
+        raise ValidationError('Données JSON manquantes')
+    return schema.validate(data)
+
+
+def get_json_body(schema):
+    """Lit et valide le corps JSON de la requête Flask en cours (voir `validate_body`)"""
+    return validate_body(schema, request.get_json(silent=True))
+
+
+# Utilisateurs
+USER_CREATE = Schema(required={'name': str, 'email': str})
+USER_UPDATE = Schema(optional={'name': str, 'email': str})
+USER_BULK_ITEM = Schema(required={'name': str, 'email': str}, optional={'id': str, 'created_at': int})
+FRIEND = Schema(required={'friend_id': str})
+FRIENDSHIP_BULK_ITEM = Schema(required={'user_id': str, 'friend_id': str})
+
+# Posts
+POST_CREATE = Schema(required={'title': str, 'content': str})
+POST_UPDATE = Schema(optional={'title': str, 'content': str})
+POST_BULK_ITEM = Schema(required={'title': str, 'content': str, 'user_id': str},
+                        optional={'id': str, 'created_at': int})
+
+# Commentaires
+COMMENT_CREATE = Schema(required={'content': str, 'user_id': str})
+COMMENT_UPDATE = Schema(optional={'content': str})
+COMMENT_BULK_ITEM = Schema(required={'content': str, 'user_id': str, 'post_id': str},
+                           optional={'id': str, 'created_at': int})
+
+# Likes
+LIKE = Schema(required={'user_id': str})
+POST_LIKE_BULK_ITEM = Schema(required={'user_id': str, 'post_id': str})
+COMMENT_LIKE_BULK_ITEM = Schema(required={'user_id': str, 'comment_id': str})
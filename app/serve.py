@@ -0,0 +1,139 @@
+﻿# Serveur de production multi-processus (gunicorn)
+#
+#   python -m app.serve             démarre le serveur (configuration : SERVE_* dans Config)
+#   python -m app.serve --reload    recharge les processus sans couper le service
+#
+# Deux modèles de processus :
+#   gthread  chaque processus sert SERVE_THREADS requêtes à la fois avec
+#            des threads ; par défaut 2 x CPU + 1 processus
+#   gevent   chaque processus sert jusqu'à SERVE_WORKER_CONNECTIONS requêtes
+#            avec des threads verts (entrées/sorties coopératives) ;
+#            par défaut un processus par CPU
+#
+# Chaque processus a ses propres connexions Bolt (au plus NEO4J_POOL_MAX_SIZE)
+# et laisse au plus NEO4J_POOL_MAX_SIZE requêtes Cypher en cours : au-delà,
+# les requêtes attendent une place. Avec gthread, garder
+# SERVE_THREADS <= NEO4J_POOL_MAX_SIZE.
+#
+# Rechargement gracieux (SIGHUP) : de nouveaux processus démarrent, les
+# anciens terminent leurs requêtes en cours (SERVE_GRACEFUL_TIMEOUT). Avec
+# SERVE_PRELOAD, le code est chargé une fois dans le processus maître :
+# SIGHUP recharge alors la configuration mais pas le code, qui demande un
+# nouveau maître (SIGUSR2 puis SIGQUIT à l'ancien).
+import argparse
+import multiprocessing
+import os
+import signal
+import sys
+from .config import Config
+
+WORKER_CLASSES = ('gthread', 'gevent')
+
+
+def default_workers(worker_class, cpu_count=None):
+    """Nombre de processus selon le modèle et le nombre de CPU"""
+    cpu_count = cpu_count or multiprocessing.cpu_count()
+    if worker_class == 'gevent':
+        return cpu_count
+    return 2 * cpu_count + 1
+
+
+def post_worker_init(worker):
+    """Ouvre la connexion du processus dès son démarrage
+
+    Appelé dans chaque processus après le fork (et après l'activation de
+    gevent) : il oublie la connexion héritée du maître et en ouvre une à
+    lui (voir ConcurrencyLimiter). La première requête ne paie donc pas
+    la connexion, le schéma ni le chargement de l'index des amitiés.
+    """
+    from app import db
+    if db.connect(force=False):
+        print(f"Worker {os.getpid()} connecté à la base de données")
+    else:
+        print(f"Worker {os.getpid()} : connexion impossible, nouvel essai à la première requête")
+
+
+def gunicorn_options(config=Config):
+    """Traduit la configuration SERVE_* en options gunicorn"""
+    worker_class = config.SERVE_WORKER_CLASS
+    if worker_class not in WORKER_CLASSES:
+        raise ValueError(f"Modèle de processus inconnu : {worker_class} "
+                         f"(valeurs possibles : {', '.join(WORKER_CLASSES)})")
+    return {
+        'bind': config.SERVE_BIND,
+        'worker_class': worker_class,
+        'workers': config.SERVE_WORKERS or default_workers(worker_class),
+        'threads': config.SERVE_THREADS,
+        'worker_connections': config.SERVE_WORKER_CONNECTIONS,
+        'timeout': config.SERVE_TIMEOUT,
+        'graceful_timeout': config.SERVE_GRACEFUL_TIMEOUT,
+        'keepalive': config.SERVE_KEEPALIVE,
+        'max_requests': config.SERVE_MAX_REQUESTS,
+        'max_requests_jitter': config.SERVE_MAX_REQUESTS_JITTER,
+        'preload_app': config.SERVE_PRELOAD,
+        'pidfile': config.SERVE_PIDFILE,
+        'post_worker_init': post_worker_init
+    }
+
+
+def serve(config=Config):
+    from gunicorn.app.base import BaseApplication
+
+    class Server(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from app import create_app
+            return create_app(config)
+
+    options = gunicorn_options(config)
+    print(f"Serveur {options['worker_class']} sur {options['bind']} : {options['workers']} processus")
+    shared_version_store(config, options['workers'])
+    if config.FRIENDSHIP_INDEX_ENABLED and options['workers'] > 1:
+        print(f"Attention : l'index des amitiés (FRIENDSHIP_INDEX_ENABLED) est propre à chacun des "
+              f"{options['workers']} processus, sans invalidation entre eux : les amitiés écrites par "
+              f"un processus restent invisibles aux autres jusqu'à leur rechargement")
+    Server(options).run()
+
+
+def shared_version_store(config, workers):
+    """Passe les versions en SQLite quand plusieurs processus servent les réponses conditionnelles
+
+    Le stockage 'memory' n'est pas partagé entre les processus : une écriture
+    servie par l'un ne changerait pas les ETag des autres. Appelé avant le
+    chargement de l'application, qui crée le stockage (voir app.versions).
+    """
+    if config.CONDITIONAL_GET_ENABLED and config.VERSION_STORE == 'memory' and workers > 1:
+        print(f"VERSION_STORE=memory n'est pas partagé entre {workers} processus : "
+              f"utilisation de VERSION_STORE=sqlite ({config.VERSION_SQLITE_PATH})")
+        config.VERSION_STORE = 'sqlite'
+        Config.VERSION_STORE = 'sqlite'
+        # Stockage déjà créé (application importée avant serve())
+        loaded = sys.modules.get('app.versions')
+        if loaded is not None and loaded.versions is not None:
+            loaded.versions = loaded.create_version_store('sqlite', sqlite_path=config.VERSION_SQLITE_PATH)
+
+
+def reload(config=Config):
+    """Demande au serveur en cours un rechargement gracieux (SIGHUP)"""
+    with open(config.SERVE_PIDFILE) as pidfile:
+        pid = int(pidfile.read().strip())
+    os.kill(pid, signal.SIGHUP)
+    print(f"Rechargement demandé au serveur {pid}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serveur de production de l'API")
+    parser.add_argument('--reload', action='store_true',
+                        help="recharger le serveur en cours (SIGHUP) au lieu d'en démarrer un")
+    args = parser.parse_args()
+    if args.reload:
+        reload()
+    else:
+        serve()
@@ -0,0 +1,44 @@
+﻿# Mesure du temps de démarrage de l'application
+#
+#   python -m app.startup
+#
+# Importe le paquet `app` et appelle create_app() dans un processus neuf
+# (sans modules déjà chargés), puis vérifie qu'aucune connexion à la base
+# n'a été ouverte et que le pilote py2neo n'a pas été importé.
+import json
+import subprocess
+import sys
+
+MEASURE = """
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+flask_app = app.create_app()
+created = time.perf_counter()
+print(json.dumps({
+    'import_ms': round((imported - start) * 1000, 1),
+    'create_app_ms': round((created - imported) * 1000, 1),
+    'connected': app.db.connected,
+    'py2neo_imported': 'py2neo' in sys.modules
+}))
+"""
+
+
+def measure_startup(runs=5):
+    """Lance `runs` démarrages à froid et retourne leurs mesures"""
+    results = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', MEASURE], capture_output=True,
+                                text=True, check=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return results
+
+
+if __name__ == '__main__':
+    results = measure_startup()
+    for field in ('import_ms', 'create_app_ms'):
+        values = sorted(result[field] for result in results)
+        print(f"{field} : médiane {values[len(values) // 2]} ms (min {values[0]}, max {values[-1]})")
+    print(f"Connexion ouverte au démarrage : {any(result['connected'] for result in results)}")
+    print(f"py2neo importé au démarrage : {any(result['py2neo_imported'] for result in results)}")
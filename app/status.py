@@ -0,0 +1,12 @@
+﻿# Résultats des mutations en une seule requête (likes, amitiés)
+#
+# La requête vérifie l'existence des nœuds et effectue la modification
+# dans la même transaction ; la route traduit le statut en code HTTP.
+
+USER_MISSING = 'user_missing'        # l'utilisateur à l'origine de l'action n'existe pas
+TARGET_MISSING = 'target_missing'    # le post, commentaire ou ami visé n'existe pas
+CREATED = 'created'                  # la relation a été créée
+ALREADY_EXISTED = 'already_existed'  # la relation existait déjà
+REMOVED = 'removed'                  # la relation a été supprimée
+EXISTS = 'exists'                    # la relation existe (lecture seule)
+NOT_FOUND = 'not_found'              # la relation n'existe pas
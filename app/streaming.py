@@ -0,0 +1,31 @@
+﻿# Réponses NDJSON en flux pour les grandes listes
+from flask import Response, current_app, request, stream_with_context
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+
+def wants_stream():
+    """Indique si le client demande une réponse NDJSON en flux
+
+    Le mode flux est activé par `?stream=1` ou par un en-tête
+    `Accept: application/x-ndjson`.
+    """
+    if request.args.get('stream', '').lower() in ('1', 'true', 't'):
+        return True
+    return request.accept_mimetypes.best == NDJSON_MIMETYPE
+
+
+def ndjson_response(items, serialize=None):
+    """Envoie un objet JSON par ligne au fur et à mesure du parcours de `items`
+
+    `items` est un itérable d'objets modèle : seul l'élément courant est
+    gardé en mémoire. `serialize(item)` remplace `item.to_dict()`.
+    """
+    serialize = serialize or (lambda item: item.to_dict())
+    dumps = current_app.json.dumps
+
+    def generate():
+        for item in items:
+            yield dumps(serialize(item), ensure_ascii=False) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
@@ -0,0 +1,211 @@
+﻿# Fils d'actualité matérialisés (fan-out à l'écriture)
+#
+# Quand un post est créé, sa position (created_at, id) est ajoutée au fil
+# de chaque ami de l'auteur ; GET /users/<id>/feed lit alors une liste déjà
+# triée au lieu de parcourir les posts de tous les amis. Chaque fil garde
+# au plus TIMELINE_MAX_ENTRIES entrées. Les auteurs très connectés
+# (friend_count > TIMELINE_CELEBRITY_THRESHOLD) ne sont pas diffusés : leurs
+# posts sont fusionnés à la lecture (voir Post.find_timeline).
+#
+# Un fil n'est alimenté que s'il a déjà été construit : un fil absent
+# (jamais lu, ou abandonné après un changement d'amitié) est reconstruit à
+# la première lecture, ou pour tous par `python -m app.db_init --rebuild-timelines`.
+from bisect import bisect_left, insort
+import importlib
+import os
+import sqlite3
+import threading
+from .config import Config
+
+
+class TimelineStore:
+    """Interface d'un stockage de fils d'actualité
+
+    Une entrée est un tuple (created_at, post_id) ; les lectures retournent
+    les entrées de la plus récente à la plus ancienne.
+    """
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+
+    def exists(self, user_id):
+        """Indique si le fil de l'utilisateur est construit"""
+        raise NotImplementedError
+
+    def push(self, user_ids, entry):
+        """Ajoute une entrée aux fils construits parmi `user_ids`"""
+        raise NotImplementedError
+
+    def read(self, user_id, limit, after=None):
+        """Retourne au plus `limit` entrées situées après la position `after`"""
+        raise NotImplementedError
+
+    def size(self, user_id):
+        raise NotImplementedError
+
+    def replace(self, user_id, entries):
+        """Remplace (et marque comme construit) le fil d'un utilisateur"""
+        raise NotImplementedError
+
+    def drop(self, user_id):
+        """Abandonne le fil d'un utilisateur (il sera reconstruit)"""
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class MemoryTimelineStore(TimelineStore):
+    """Fils gardés dans le processus (perdus au redémarrage, propres à chaque worker)"""
+
+    def __init__(self, max_entries=1000):
+        super().__init__(max_entries)
+        # user_id -> liste triée croissante de (created_at, post_id)
+        self._timelines = {}
+        self._lock = threading.Lock()
+
+    def exists(self, user_id):
+        return user_id in self._timelines
+
+    def push(self, user_ids, entry):
+        with self._lock:
+            for user_id in user_ids:
+                timeline = self._timelines.get(user_id)
+                if timeline is None:
+                    continue
+                position = bisect_left(timeline, entry)
+                if position < len(timeline) and timeline[position] == entry:
+                    continue
+                insort(timeline, entry)
+                if len(timeline) > self.max_entries:
+                    del timeline[:len(timeline) - self.max_entries]
+
+    def read(self, user_id, limit, after=None):
+        with self._lock:
+            timeline = self._timelines.get(user_id, [])
+            position = len(timeline) if after is None else bisect_left(timeline, tuple(after))
+            return [timeline[index] for index in range(position - 1, max(position - limit, 0) - 1, -1)]
+
+    def size(self, user_id):
+        return len(self._timelines.get(user_id, ()))
+
+    def replace(self, user_id, entries):
+        timeline = sorted(set(entries))[-self.max_entries:]
+        with self._lock:
+            self._timelines[user_id] = timeline
+
+    def drop(self, user_id):
+        with self._lock:
+            self._timelines.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._timelines.clear()
+
+
+class SqliteTimelineStore(TimelineStore):
+    """Fils persistants dans un fichier SQLite, partagés par les workers d'une machine"""
+
+    def __init__(self, path, max_entries=1000):
+        super().__init__(max_entries)
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as connection:
+            connection.execute("""
+            CREATE TABLE IF NOT EXISTS timeline (
+                user_id TEXT NOT NULL, created_at INTEGER NOT NULL, post_id TEXT NOT NULL,
+                PRIMARY KEY (user_id, created_at, post_id)
+            ) WITHOUT ROWID""")
+            connection.execute("CREATE TABLE IF NOT EXISTS timeline_built (user_id TEXT PRIMARY KEY)")
+
+    def _connection(self):
+        """Une connexion par thread et par processus (les connexions ne survivent pas à un fork)"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def exists(self, user_id):
+        cursor = self._connection().execute(
+            "SELECT 1 FROM timeline_built WHERE user_id = ?", (user_id,))
+        return cursor.fetchone() is not None
+
+    def push(self, user_ids, entry):
+        created_at, post_id = entry
+        with self._connection() as connection:
+            for user_id in user_ids:
+                inserted = connection.execute("""
+                INSERT OR IGNORE INTO timeline (user_id, created_at, post_id)
+                SELECT ?, ?, ? WHERE EXISTS (SELECT 1 FROM timeline_built WHERE user_id = ?)
+                """, (user_id, created_at, post_id, user_id)).rowcount
+                if inserted:
+                    self._trim(connection, user_id)
+
+    def _trim(self, connection, user_id):
+        connection.execute("""
+        DELETE FROM timeline WHERE user_id = ? AND (created_at, post_id) IN (
+            SELECT created_at, post_id FROM timeline WHERE user_id = ?
+            ORDER BY created_at DESC, post_id DESC LIMIT -1 OFFSET ?)
+        """, (user_id, user_id, self.max_entries))
+
+    def read(self, user_id, limit, after=None):
+        if after is None:
+            cursor = self._connection().execute("""
+            SELECT created_at, post_id FROM timeline WHERE user_id = ?
+            ORDER BY created_at DESC, post_id DESC LIMIT ?
+            """, (user_id, limit))
+        else:
+            cursor = self._connection().execute("""
+            SELECT created_at, post_id FROM timeline
+            WHERE user_id = ? AND created_at <= ? AND (created_at < ? OR post_id < ?)
+            ORDER BY created_at DESC, post_id DESC LIMIT ?
+            """, (user_id, after[0], after[0], after[1], limit))
+        return [tuple(row) for row in cursor.fetchall()]
+
+    def size(self, user_id):
+        cursor = self._connection().execute("SELECT count(*) FROM timeline WHERE user_id = ?", (user_id,))
+        return cursor.fetchone()[0]
+
+    def replace(self, user_id, entries):
+        entries = sorted(set(entries))[-self.max_entries:]
+        with self._connection() as connection:
+            connection.execute("DELETE FROM timeline WHERE user_id = ?", (user_id,))
+            connection.executemany("INSERT INTO timeline (user_id, created_at, post_id) VALUES (?, ?, ?)",
+                                   [(user_id, created_at, post_id) for created_at, post_id in entries])
+            connection.execute("INSERT OR IGNORE INTO timeline_built (user_id) VALUES (?)", (user_id,))
+
+    def drop(self, user_id):
+        with self._connection() as connection:
+            connection.execute("DELETE FROM timeline WHERE user_id = ?", (user_id,))
+            connection.execute("DELETE FROM timeline_built WHERE user_id = ?", (user_id,))
+
+    def clear(self):
+        with self._connection() as connection:
+            connection.execute("DELETE FROM timeline")
+            connection.execute("DELETE FROM timeline_built")
+
+
+def create_timeline_store(name, max_entries=1000, sqlite_path='timelines.db'):
+    """Construit le stockage désigné par TIMELINE_STORE
+
+    `name` vaut 'memory', 'sqlite' ou 'module:Classe' pour un stockage
+    externe (la classe reçoit `max_entries` et implémente TimelineStore).
+    """
+    if name == 'memory':
+        return MemoryTimelineStore(max_entries)
+    if name == 'sqlite':
+        return SqliteTimelineStore(sqlite_path, max_entries)
+    module_name, _, class_name = name.partition(':')
+    if not class_name:
+        raise ValueError(f"Stockage de fils d'actualité inconnu : {name}")
+    return getattr(importlib.import_module(module_name), class_name)(max_entries=max_entries)
+
+
+# Stockage utilisé par les modèles, None si les fils matérialisés sont désactivés
+timelines = create_timeline_store(
+    Config.TIMELINE_STORE,
+    max_entries=Config.TIMELINE_MAX_ENTRIES,
+    sqlite_path=Config.TIMELINE_SQLITE_PATH
+) if Config.TIMELINE_ENABLED else None
@@ -0,0 +1,220 @@
+﻿# Versions des entités et des listes, pour les réponses conditionnelles (ETag / 304)
+#
+# Chaque écriture des modèles change la version des clés qu'elle touche :
+#   'posts'                   liste de tous les posts
+#   'post:<id>'               un post
+#   'post_comments:<id>'      commentaires d'un post
+#   'user_friends:<id>'       amis d'un utilisateur
+# Les écritures en masse et les suppressions d'utilisateurs changent la
+# version globale, qui entre dans toutes les ETag.
+#
+# Le stockage 'memory' n'est vu que par son processus : avec plusieurs
+# processus, utiliser 'sqlite' (fichier partagé par les processus d'une
+# machine) ou un stockage externe ('module:Classe'). python -m app.serve
+# passe de lui-même à 'sqlite' quand il démarre plusieurs processus.
+import hashlib
+import importlib
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from .config import Config
+
+GLOBAL = 'global'
+POSTS = 'posts'
+
+
+def post_key(post_id):
+    return f'post:{post_id}'
+
+
+def comments_key(post_id):
+    return f'post_comments:{post_id}'
+
+
+def friends_key(user_id):
+    return f'user_friends:{user_id}'
+
+
+class VersionStore:
+    """Interface des stockages de versions
+
+    - `epoch` : identifiant du stockage, qui change quand des versions sont
+      perdues (redémarrage d'un stockage en mémoire, éviction)
+    - `get(keys)` : [(version, modifié à (s))] pour chaque clé ; une clé
+      jamais modifiée vaut (0, date de création de l'époque)
+    - `bump(keys)` : incrémente les clés
+    """
+
+    epoch = None
+
+    def get(self, keys):
+        raise NotImplementedError
+
+    def bump(self, keys):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class MemoryVersionStore(VersionStore):
+    """Versions en mémoire du processus, au plus `max_keys` clés
+
+    Quand une clé est évincée, l'époque change : toutes les ETag émises
+    deviennent invalides, de sorte qu'une version repartie de 0 ne peut pas
+    être confondue avec une ancienne.
+
+    L'époque contient le PID : des processus issus d'un même fork (serveur
+    avec préchargement) héritent des mêmes compteurs mais tiennent chacun
+    les leurs ; une ETag émise par un processus ne vaut donc jamais dans un
+    autre, qui répond 200 au lieu d'un 304 périmé.
+    """
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._versions = OrderedDict()
+        self._lock = threading.Lock()
+        self._new_epoch()
+
+    @property
+    def epoch(self):
+        return f'{self._epoch}-{os.getpid()}'
+
+    def _new_epoch(self):
+        self._epoch = uuid.uuid4().hex
+        self.epoch_started_at = time.time()
+
+    def get(self, keys):
+        with self._lock:
+            default = (0, self.epoch_started_at)
+            return [self._versions.get(key, default) for key in keys]
+
+    def bump(self, keys):
+        now = time.time()
+        with self._lock:
+            for key in keys:
+                version = self._versions.get(key, (0, now))[0]
+                self._versions[key] = (version + 1, now)
+                self._versions.move_to_end(key)
+            if len(self._versions) > self.max_keys:
+                while len(self._versions) > self.max_keys:
+                    self._versions.popitem(last=False)
+                self._new_epoch()
+
+    def clear(self):
+        with self._lock:
+            self._versions.clear()
+            self._new_epoch()
+
+
+class SqliteVersionStore(VersionStore):
+    """Versions dans un fichier SQLite, partagées par les workers d'une machine"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as connection:
+            connection.execute("""
+            CREATE TABLE IF NOT EXISTS version (
+                key TEXT PRIMARY KEY, version INTEGER NOT NULL, modified_at REAL NOT NULL
+            ) WITHOUT ROWID""")
+            connection.execute("CREATE TABLE IF NOT EXISTS version_epoch (epoch TEXT NOT NULL, started_at REAL NOT NULL)")
+            connection.execute("INSERT INTO version_epoch SELECT ?, ? WHERE NOT EXISTS (SELECT 1 FROM version_epoch)",
+                               (uuid.uuid4().hex, time.time()))
+
+    def _connection(self):
+        """Une connexion par thread et par processus (les connexions ne survivent pas à un fork)"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    @property
+    def epoch(self):
+        return self._epoch()[0]
+
+    def _epoch(self):
+        return self._connection().execute("SELECT epoch, started_at FROM version_epoch").fetchone()
+
+    def get(self, keys):
+        connection = self._connection()
+        epoch_started_at = self._epoch()[1]
+        placeholders = ', '.join('?' * len(keys))
+        found = {key: (version, modified_at) for key, version, modified_at in connection.execute(
+            f"SELECT key, version, modified_at FROM version WHERE key IN ({placeholders})", list(keys))}
+        return [found.get(key, (0, epoch_started_at)) for key in keys]
+
+    def bump(self, keys):
+        now = time.time()
+        with self._connection() as connection:
+            connection.executemany("""
+            INSERT INTO version (key, version, modified_at) VALUES (?, 1, ?)
+            ON CONFLICT (key) DO UPDATE SET version = version + 1, modified_at = excluded.modified_at
+            """, [(key, now) for key in keys])
+
+    def clear(self):
+        with self._connection() as connection:
+            connection.execute("DELETE FROM version")
+            connection.execute("UPDATE version_epoch SET epoch = ?, started_at = ?", (uuid.uuid4().hex, time.time()))
+
+
+def create_version_store(name, sqlite_path='versions.db', max_keys=100000):
+    """Construit le stockage désigné par VERSION_STORE
+
+    `name` vaut 'memory', 'sqlite' ou 'module:Classe' pour un stockage
+    externe (la classe, sans argument, implémente VersionStore).
+    """
+    if name == 'memory':
+        return MemoryVersionStore(max_keys)
+    if name == 'sqlite':
+        return SqliteVersionStore(sqlite_path)
+    module_name, _, class_name = name.partition(':')
+    if not class_name:
+        raise ValueError(f"Stockage de versions inconnu : {name}")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+def bump(*keys):
+    """Change la version des clés après une écriture"""
+    if versions is not None and keys:
+        versions.bump(keys)
+
+
+def bump_all():
+    """Invalide toutes les ETag (écritures en masse ou hors de l'API)"""
+    bump(GLOBAL)
+
+
+def validators(keys, variant=b''):
+    """ETag forte, date de dernière modification (s) et état des versions d'une réponse
+
+    `keys` sont les clés dont dépend la réponse ; `variant` distingue les
+    réponses d'une même ressource (paramètres, format). L'état ne dépend que
+    des versions des clés : il change à chaque écriture qui les touche, quel
+    que soit le processus qui l'a faite (voir app.cache.find_entity).
+    """
+    keys = [GLOBAL, *keys]
+    state = hashlib.blake2b(digest_size=16)
+    state.update(versions.epoch.encode())
+    last_modified = 0
+    for key, (version, modified_at) in zip(keys, versions.get(keys)):
+        state.update(f'|{key}={version}'.encode())
+        last_modified = max(last_modified, modified_at)
+    state = state.hexdigest()
+    etag = hashlib.blake2b(f'{state}|'.encode() + variant, digest_size=16).hexdigest()
+    return etag, last_modified, state
+
+
+# Stockage utilisé par les modèles, None si les réponses conditionnelles sont désactivées
+versions = create_version_store(
+    Config.VERSION_STORE,
+    sqlite_path=Config.VERSION_SQLITE_PATH,
+    max_keys=Config.VERSION_MAX_KEYS
+) if Config.CONDITIONAL_GET_ENABLED else None
@@ -0,0 +1,4 @@
+﻿from app.aio import create_async_app
+
+# Application ASGI : hypercorn asgi:app --bind 0.0.0.0:8000
+app = create_async_app()
@@ -0,0 +1,61 @@
+﻿# Tests des routes sur le backend mémoire, sans serveur Neo4j
+#
+#   python -m pytest
+#
+# La configuration (app.config.Config) est lue à l'import de l'application :
+# elle est fixée ici, avant le premier import de `app`.
+import os
+
+os.environ.update({
+    'DB_BACKEND': 'memory',
+    'NEO4J_INIT_SCHEMA': 'False',
+    'DEBUG': 'False',
+    'CONDITIONAL_GET_ENABLED': 'True',
+    'VERSION_STORE': 'memory',
+    'FRIENDSHIP_INDEX_ENABLED': 'False',
+    'TIMELINE_ENABLED': 'False',
+    'PLAN_CAPTURE_ENABLED': 'False',
+    # Recommandations appliquées dans la requête : résultats lisibles tout de suite
+    'RECOMMENDATIONS_FLUSH_INTERVAL': '0'
+})
+
+import pytest
+from app import create_app, db
+from app import versions
+from app.cache import entity_cache
+
+
+@pytest.fixture(scope='session')
+def app():
+    app = create_app()
+    app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture
+def client(app):
+    """Client de test sur un graphe vide"""
+    db.connect(force=False)
+    db.graph.clear()
+    entity_cache.clear()
+    versions.versions.clear()
+    return app.test_client()
+
+
+def create_user(client, name, email=None):
+    response = client.post('/users', json={'name': name, 'email': email or f'{name}@example.com'})
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()['user']['id']
+
+
+def create_post(client, user_id, title, content='contenu'):
+    response = client.post(f'/posts/users/{user_id}/posts', json={'title': title, 'content': content})
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()['post']['id']
+
+
+def create_comment(client, post_id, user_id, content='commentaire'):
+    response = client.post(f'/comments/posts/{post_id}/comments',
+                           json={'content': content, 'user_id': user_id})
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()['comment']['id']
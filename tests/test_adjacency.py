@@ -0,0 +1,49 @@
+﻿# Index d'adjacence des amitiés : mêmes réponses que la base, tenu à jour par les écritures
+import random
+import pytest
+from app import db
+from app.adjacency import friendship_index
+from app.models.user import User
+from conftest import create_user
+
+
+@pytest.fixture
+def index(client, monkeypatch):
+    monkeypatch.setattr(friendship_index, 'enabled', True)
+    friendship_index.rebuild(db)
+    yield friendship_index
+    friendship_index.loaded = False
+
+
+def answers(user_ids):
+    """Statut d'amitié et amis en commun de chaque paire"""
+    return {(a, b): (User.friendship_status(a, b), sorted(user.id for user in User.get_mutual_friends(a, b)))
+            for a in user_ids for b in user_ids if a != b}
+
+
+def test_index_matches_database_after_writes(client, index, monkeypatch):
+    rng = random.Random(2)
+    user_ids = [create_user(client, f'user{number}') for number in range(12)]
+    for _ in range(60):
+        a, b = rng.sample(user_ids, 2)
+        if rng.random() < 0.6:
+            client.post(f'/users/{a}/friends', json={'friend_id': b})
+        else:
+            client.delete(f'/users/{a}/friends/{b}')
+    client.post('/friendships/bulk', json=[{'user_id': user_ids[0], 'friend_id': user_ids[5]}])
+    client.delete(f'/users/{user_ids[3]}')
+    user_ids.remove(user_ids[3])
+    assert index.active
+
+    indexed = answers(user_ids)
+    monkeypatch.setattr(friendship_index, 'enabled', False)
+    assert answers(user_ids) == indexed
+
+
+def test_rebuild_route(client, index):
+    alice, bob = create_user(client, 'alice'), create_user(client, 'bob')
+    # Amitié écrite hors de l'application : visible après reconstruction
+    db.graph.link('FRIENDS_WITH', alice, bob)
+    assert client.get(f'/users/{alice}/friends/{bob}').get_json()['are_friends'] is False
+    assert client.post('/cache/friendship-index/rebuild').status_code == 200
+    assert client.get(f'/users/{alice}/friends/{bob}').get_json()['are_friends'] is True
@@ -0,0 +1,52 @@
+﻿# Modèles asynchrones : mêmes réponses que l'application Flask, sur le même graphe mémoire
+import asyncio
+from app.aio.database import graph
+from app.aio.models import AsyncUser, AsyncPost, AsyncComment
+from app.status import ALREADY_EXISTED, CREATED, EXISTS, REMOVED, TARGET_MISSING
+from conftest import create_user, create_post, create_comment
+
+
+def run(coroutine):
+    async def connected():
+        await graph.connect()
+        try:
+            return await coroutine
+        finally:
+            await graph.close()
+    return asyncio.run(connected())
+
+
+def test_reads_match_flask_routes(client):
+    alice, bob, carol = create_user(client, 'alice'), create_user(client, 'bob'), create_user(client, 'carol')
+    for a, b in ((alice, bob), (alice, carol), (bob, carol)):
+        client.post(f'/users/{a}/friends', json={'friend_id': b})
+    post_id = create_post(client, bob, 'bonjour')
+    create_comment(client, post_id, alice)
+
+    async def reads():
+        return await asyncio.gather(
+            AsyncUser.find_by_id(alice), AsyncUser.get_mutual_friends(alice, bob),
+            AsyncUser.friendship_status(alice, bob), AsyncUser.friendship_status(alice, 'inconnu'),
+            AsyncPost.find_feed(alice, 10, viewer_id=alice), AsyncComment.find_by_post(post_id, viewer_id=alice))
+    user, mutual, status, unknown, feed, comments = run(reads())
+    assert user.name == 'alice'
+    assert [friend.id for friend in mutual] == [carol]
+    assert (status, unknown) == (EXISTS, TARGET_MISSING)
+    assert [(post['id'], post['user_id'], post['liked_by_me']) for post in feed] == [(post_id, bob, False)]
+    assert [(comment['user_id'], comment['post_id']) for comment in comments] == [(alice, post_id)]
+
+
+def test_likes_are_shared_with_flask(client):
+    alice, bob = create_user(client, 'alice'), create_user(client, 'bob')
+    post_id = create_post(client, bob, 'bonjour')
+    comment_id = create_comment(client, post_id, bob)
+
+    async def likes():
+        return [await AsyncPost.add_like(post_id, alice), await AsyncPost.add_like(post_id, alice),
+                await AsyncPost.add_like('inconnu', alice), await AsyncComment.add_like(comment_id, alice)]
+    assert run(likes()) == [CREATED, ALREADY_EXISTED, TARGET_MISSING, CREATED]
+    assert client.get(f'/posts/{post_id}').get_json()['post']['like_count'] == 1
+    assert client.get(f'/comments/{comment_id}').get_json()['comment']['like_count'] == 1
+
+    assert run(AsyncPost.remove_like(post_id, alice)) == REMOVED
+    assert client.get(f'/posts/{post_id}').get_json()['post']['like_count'] == 0
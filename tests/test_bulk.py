@@ -0,0 +1,68 @@
+﻿# Écritures en masse : rapport par élément et codes de réponse
+from conftest import create_user, create_post, create_comment
+
+
+def test_bulk_users_all_valid(client):
+    response = client.post('/users/bulk', json=[
+        {'name': 'alice', 'email': 'alice@example.com'},
+        {'name': 'bob', 'email': 'bob@example.com'}])
+    assert response.status_code == 201
+    body = response.get_json()
+    assert (body['status'], body['created'], body['failed']) == ('success', 2, 0)
+    for result in body['results']:
+        assert client.get(f"/users/{result['id']}").status_code == 200
+
+
+def test_bulk_with_one_invalid_item_returns_207(client):
+    response = client.post('/users/bulk', json=[
+        {'name': 'alice', 'email': 'alice@example.com'},
+        {'name': 'bob'},
+        {'name': 'carol', 'email': 'carol@example.com'}])
+    assert response.status_code == 207
+    body = response.get_json()
+    assert (body['status'], body['created'], body['failed']) == ('partial', 2, 1)
+    assert [result['status'] for result in body['results']] == ['success', 'error', 'success']
+    assert body['results'][1]['index'] == 1
+    assert 'email' in body['results'][1]['message']
+    assert len(client.get('/users').get_json()['users']) == 2
+
+
+def test_bulk_reports_missing_references(client):
+    alice = create_user(client, 'alice')
+    response = client.post('/posts/bulk', json=[
+        {'title': 't', 'content': 'c', 'user_id': alice},
+        {'title': 't', 'content': 'c', 'user_id': 'inconnu'}])
+    assert response.status_code == 207
+    results = response.get_json()['results']
+    assert [result['status'] for result in results] == ['success', 'error']
+    assert client.get(f"/posts/{results[0]['id']}").status_code == 200
+
+
+def test_bulk_likes_keep_request_order(client):
+    alice = create_user(client, 'alice')
+    post_id = create_post(client, alice, 'bonjour')
+    comment_id = create_comment(client, post_id, alice)
+    response = client.post('/likes/bulk', json=[
+        {'user_id': alice, 'comment_id': comment_id},
+        'pas un objet',
+        {'user_id': alice, 'post_id': post_id}])
+    assert response.status_code == 207
+    results = response.get_json()['results']
+    assert [(result['index'], result['status']) for result in results] == [
+        (0, 'success'), (1, 'error'), (2, 'success')]
+    assert client.get(f'/posts/{post_id}').get_json()['post']['like_count'] == 1
+    assert client.get(f'/comments/{comment_id}').get_json()['comment']['like_count'] == 1
+
+
+def test_bulk_friendships_in_several_batches(client):
+    user_ids = [create_user(client, f'user{index}') for index in range(4)]
+    response = client.post('/friendships/bulk?batch_size=1', json=[
+        {'user_id': user_ids[0], 'friend_id': friend_id} for friend_id in user_ids[1:]])
+    assert response.status_code == 201
+    friends = client.get(f'/users/{user_ids[0]}/friends').get_json()['friends']
+    assert sorted(friend['id'] for friend in friends) == sorted(user_ids[1:])
+
+
+def test_bulk_body_must_be_a_list(client):
+    assert client.post('/users/bulk', json={'name': 'alice'}).status_code == 400
+    assert client.post('/users/bulk?batch_size=0', json=[]).status_code == 400
@@ -0,0 +1,111 @@
+﻿# Cache d'entités : invalidation après écriture, lectures doublées par une écriture
+import pytest
+from app import db
+from app.backends.memory import MemoryCursor
+from app.cache import EntityCache, entity_cache
+from app.models.post import Post
+from conftest import create_user, create_post
+
+
+class OvertakingGraph:
+    """Graphe dont la prochaine lecture `name` est doublée par `write`
+
+    La ligne est lue, puis `write` s'exécute (écriture et invalidation)
+    avant que le lecteur ne la reçoive : elle est donc antérieure à l'écriture.
+    """
+
+    def __init__(self, graph, name, write):
+        self.graph = graph
+        self.name = name
+        self.write = write
+
+    def run(self, query, **params):
+        cursor = self.graph.run(query, **params)
+        if self.write is None or query.name != self.name:
+            return cursor
+        rows = [{key: dict(value) if isinstance(value, dict) else value for key, value in row.items()}
+                for row in cursor.data()]
+        write, self.write = self.write, None
+        write()
+        return MemoryCursor(rows)
+
+    def stream(self, query, **params):
+        yield from self.run(query, **params)
+
+
+@pytest.fixture
+def overtake(client):
+    graph = db.graph
+
+    def install(name, write):
+        db.graph = OvertakingGraph(graph, name, write)
+
+    yield install
+    db.graph = graph
+
+
+def test_write_invalidates_cached_user(client):
+    alice = create_user(client, 'alice')
+    assert client.get(f'/users/{alice}').get_json()['user']['name'] == 'alice'
+    hits = entity_cache.stats()['hits']
+    assert client.get(f'/users/{alice}').get_json()['user']['name'] == 'alice'
+    assert entity_cache.stats()['hits'] == hits + 1
+
+    client.put(f'/users/{alice}', json={'name': 'alicia'})
+    assert client.get(f'/users/{alice}').get_json()['user']['name'] == 'alicia'
+
+
+def test_consistent_read_bypasses_cache(client):
+    alice = create_user(client, 'alice')
+    client.get(f'/users/{alice}')
+    # Écriture hors de l'application : le cache n'est pas invalidé
+    db.graph.nodes['User'][alice]['name'] = 'alicia'
+    assert client.get(f'/users/{alice}').get_json()['user']['name'] == 'alice'
+    assert client.get(f'/users/{alice}?consistent=1').get_json()['user']['name'] == 'alicia'
+    assert client.get(f'/users/{alice}', headers={'Cache-Control': 'no-cache'}).get_json()['user']['name'] == 'alicia'
+
+
+def test_read_overtaken_by_a_write_is_not_cached(client, overtake):
+    alice, bob = create_user(client, 'alice'), create_user(client, 'bob')
+    post_id = create_post(client, alice, 'bonjour')
+    entity_cache.clear()
+
+    overtake('post.find_by_id', lambda: Post.add_like(post_id, bob))
+    # Lue avant le like : la réponse est ancienne, mais elle n'est pas gardée
+    assert Post.find_by_id(post_id).like_count == 0
+    assert Post.find_by_id(post_id).like_count == 1
+
+
+def test_route_read_overtaken_by_an_update(app, client, overtake):
+    alice = create_user(client, 'alice')
+    entity_cache.clear()
+
+    def rename():
+        with app.test_client() as other:
+            assert other.put(f'/users/{alice}', json={'name': 'alicia'}).status_code == 200
+
+    overtake('user.find_by_id', rename)
+    assert client.get(f'/users/{alice}').get_json()['user']['name'] == 'alice'
+    assert client.get(f'/users/{alice}').get_json()['user']['name'] == 'alicia'
+
+
+def test_set_is_skipped_after_invalidation():
+    cache = EntityCache(max_size=2)
+    generation = cache.generation()
+    cache.invalidate('post', 'p1')
+    cache.set('post', 'p1', {'id': 'p1'}, generation=generation)
+    assert cache.get('post', 'p1') is None
+    assert cache.stats()['stale_sets'] == 1
+
+    # Une autre entité invalidée ne concerne pas celle-ci
+    generation = cache.generation()
+    cache.invalidate('post', 'p2')
+    cache.set('post', 'p1', {'id': 'p1'}, generation=generation)
+    assert cache.get('post', 'p1') == {'id': 'p1'}
+
+    # Invalidation oubliée (au-delà de max_size) : la lecture n'est pas gardée
+    generation = cache.generation()
+    for post_id in ('p3', 'p4', 'p5'):
+        cache.invalidate('post', post_id)
+    cache.set('post', 'p6', {'id': 'p6'}, generation=generation)
+    assert cache.get('post', 'p6') is None
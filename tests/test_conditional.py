@@ -0,0 +1,116 @@
+﻿# Réponses conditionnelles : ETag, 304 sans requête à la base, 200 après une écriture
+import pytest
+from app import db
+from app.versions import post_key, versions
+from conftest import create_user, create_post, create_comment
+
+
+class CountingGraph:
+    """Graphe qui compte les requêtes exécutées"""
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.queries = 0
+
+    def run(self, query, **params):
+        self.queries += 1
+        return self.graph.run(query, **params)
+
+    def stream(self, query, **params):
+        yield from self.run(query, **params)
+
+
+@pytest.fixture
+def counting(client):
+    graph = CountingGraph(db.graph)
+    db.graph = graph
+    yield graph
+    db.graph = graph.graph
+
+
+def revalidate(client, path, etag):
+    return client.get(path, headers={'If-None-Match': etag})
+
+
+@pytest.fixture
+def data(client):
+    alice, bob = create_user(client, 'alice'), create_user(client, 'bob')
+    post_id = create_post(client, alice, 'bonjour')
+    return {'alice': alice, 'bob': bob, 'post_id': post_id}
+
+
+def test_304_without_query_then_200_after_write(client, counting, data):
+    path = f"/posts/{data['post_id']}"
+    response = client.get(path)
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    assert response.headers['Last-Modified']
+
+    queries = counting.queries
+    response = revalidate(client, path, etag)
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+    assert response.get_data() == b''
+    assert counting.queries == queries
+
+    assert client.post(f'{path}/like', json={'user_id': data['bob']}).status_code == 201
+    response = revalidate(client, path, etag)
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert response.get_json()['post']['like_count'] == 1
+    assert revalidate(client, path, response.headers['ETag']).status_code == 304
+
+
+@pytest.mark.parametrize('path, write', [
+    ('/posts', lambda client, data: create_post(client, data['bob'], 'autre')),
+    ('/comments/posts/{post_id}/comments',
+     lambda client, data: create_comment(client, data['post_id'], data['bob'])),
+    ('/users/{alice}/friends',
+     lambda client, data: client.post(f"/users/{data['alice']}/friends", json={'friend_id': data['bob']})),
+    ('/posts/{post_id}',
+     lambda client, data: client.put(f"/posts/{data['post_id']}", json={'title': 'modifié'}))
+])
+def test_write_invalidates_etag(client, data, path, write):
+    path = path.format(**data)
+    etag = client.get(path).headers['ETag']
+    assert revalidate(client, path, etag).status_code == 304
+    write(client, data)
+    assert revalidate(client, path, etag).status_code == 200
+
+
+def test_friend_rename_invalidates_friend_list(client, data):
+    client.post(f"/users/{data['alice']}/friends", json={'friend_id': data['bob']})
+    path = f"/users/{data['alice']}/friends"
+    etag = client.get(path).headers['ETag']
+
+    # Un nouvel utilisateur n'apparaît dans aucune liste d'amis
+    create_user(client, 'carol')
+    assert revalidate(client, path, etag).status_code == 304
+
+    client.put(f"/users/{data['bob']}", json={'name': 'robert'})
+    response = revalidate(client, path, etag)
+    assert response.status_code == 200
+    assert response.get_json()['friends'][0]['name'] == 'robert'
+
+
+def test_etag_depends_on_query_string(client, data):
+    etag = client.get('/posts?limit=1').headers['ETag']
+    assert client.get('/posts?limit=2').headers['ETag'] != etag
+    assert revalidate(client, '/posts?limit=2', etag).status_code == 200
+
+
+def test_write_from_another_worker_is_not_served_from_cache(client, data):
+    path = f"/posts/{data['post_id']}"
+    etag = client.get(path).headers['ETag']
+    # Lu une fois : le post est dans le cache d'entités de ce processus
+    assert client.get(path).get_json()['post']['like_count'] == 0
+
+    # Like traité par un autre processus : base et versions partagées changent,
+    # le cache d'entités de ce processus n'est pas invalidé
+    db.graph.nodes['Post'][data['post_id']]['like_count'] = 1
+    versions.bump([post_key(data['post_id'])])
+
+    response = revalidate(client, path, etag)
+    assert response.status_code == 200
+    assert response.get_json()['post']['like_count'] == 1
+    assert revalidate(client, path, response.headers['ETag']).status_code == 304
@@ -0,0 +1,52 @@
+﻿# Compteurs dénormalisés : incrémentés une seule fois par relation créée
+from concurrent.futures import ThreadPoolExecutor
+from app import db
+from conftest import create_user, create_post, create_comment
+
+
+def test_duplicate_like_counts_once(client):
+    alice, bob = create_user(client, 'alice'), create_user(client, 'bob')
+    post_id = create_post(client, alice, 'bonjour')
+    assert client.post(f'/posts/{post_id}/like', json={'user_id': bob}).status_code == 201
+    assert client.post(f'/posts/{post_id}/like', json={'user_id': bob}).status_code == 200
+    assert client.get(f'/posts/{post_id}').get_json()['post']['like_count'] == 1
+
+    comment_id = create_comment(client, post_id, alice)
+    assert client.post(f'/comments/{comment_id}/like', json={'user_id': bob}).status_code == 201
+    assert client.post(f'/comments/{comment_id}/like', json={'user_id': bob}).status_code == 200
+    assert client.get(f'/comments/{comment_id}').get_json()['comment']['like_count'] == 1
+
+
+def test_concurrent_duplicate_likes(app, client):
+    alice, bob = create_user(client, 'alice'), create_user(client, 'bob')
+    post_id = create_post(client, alice, 'bonjour')
+
+    def like(_):
+        with app.test_client() as other:
+            return other.post(f'/posts/{post_id}/like', json={'user_id': bob}).status_code
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        statuses = sorted(pool.map(like, range(8)))
+    assert statuses == [200] * 7 + [201]
+    assert client.get(f'/posts/{post_id}').get_json()['post']['like_count'] == 1
+
+
+def test_unlike_then_like_again(client):
+    alice, bob = create_user(client, 'alice'), create_user(client, 'bob')
+    post_id = create_post(client, alice, 'bonjour')
+    client.post(f'/posts/{post_id}/like', json={'user_id': bob})
+    client.delete(f'/posts/{post_id}/like', json={'user_id': bob})
+    assert client.get(f'/posts/{post_id}').get_json()['post']['like_count'] == 0
+    assert client.post(f'/posts/{post_id}/like', json={'user_id': bob}).status_code == 201
+    assert client.get(f'/posts/{post_id}').get_json()['post']['like_count'] == 1
+
+
+def test_reversed_friendship_is_a_single_relationship(client):
+    alice, bob = create_user(client, 'alice'), create_user(client, 'bob')
+    assert client.post(f'/users/{alice}/friends', json={'friend_id': bob}).status_code == 201
+    assert client.post(f'/users/{bob}/friends', json={'friend_id': alice}).status_code == 200
+
+    for user_id in (alice, bob):
+        assert client.get(f'/users/{user_id}').get_json()['user']['friend_count'] == 1
+    edges = [(source, target) for source, targets in db.graph.out['FRIENDS_WITH'].items() for target in targets]
+    assert edges == [(min(alice, bob), max(alice, bob))]
@@ -0,0 +1,63 @@
+﻿# Compteurs et `liked_by_me` des listes, lus dans la requête de la liste
+import pytest
+from app import db
+from conftest import create_user, create_post, create_comment
+
+
+class CountingGraph:
+    """Graphe qui compte les requêtes exécutées"""
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.queries = 0
+
+    def run(self, query, **params):
+        self.queries += 1
+        return self.graph.run(query, **params)
+
+    def stream(self, query, **params):
+        yield from self.run(query, **params)
+
+
+@pytest.fixture
+def data(client):
+    alice, bob = create_user(client, 'alice'), create_user(client, 'bob')
+    posts = [create_post(client, alice, f'post {index}') for index in range(3)]
+    comment_id = create_comment(client, posts[0], bob)
+    client.post(f'/posts/{posts[0]}/like', json={'user_id': bob})
+    client.post(f'/posts/{posts[2]}/like', json={'user_id': alice})
+    client.post(f'/comments/{comment_id}/like', json={'user_id': bob})
+    return {'alice': alice, 'bob': bob, 'posts': posts, 'comment_id': comment_id}
+
+
+def test_post_list_with_counts_and_viewer(client, data):
+    posts = client.get(f"/posts?include=likes_count,comment_count&viewer={data['bob']}").get_json()['posts']
+    by_id = {post['id']: post for post in posts}
+    first, _, last = data['posts']
+    assert (by_id[first]['likes_count'], by_id[first]['comment_count'], by_id[first]['liked_by_me']) == (1, 1, True)
+    assert (by_id[last]['likes_count'], by_id[last]['liked_by_me']) == (1, False)
+
+
+def test_comment_list_with_viewer(client, data):
+    path = f"/comments/posts/{data['posts'][0]}/comments?include=likes_count&viewer="
+    assert [(comment['likes_count'], comment['liked_by_me'])
+            for comment in client.get(path + data['bob']).get_json()['comments']] == [(1, True)]
+    assert client.get(path + data['alice']).get_json()['comments'][0]['liked_by_me'] is False
+
+
+def test_list_fields_are_read_in_one_query(client, data):
+    graph = CountingGraph(db.graph)
+    db.graph = graph
+    try:
+        response = client.get(f"/posts/users/{data['alice']}/posts?include=likes_count&viewer={data['bob']}")
+    finally:
+        db.graph = graph.graph
+    assert len(response.get_json()['posts']) == 3
+    # Lecture de l'auteur, puis la liste avec ses compteurs : pas une requête par post
+    assert graph.queries == 2
+
+
+def test_unknown_include_is_rejected(client, data):
+    response = client.get('/posts?include=shares')
+    assert response.status_code == 400
+    assert 'include' in response.get_json()['message']
@@ -0,0 +1,37 @@
+﻿# Fil d'actualité : fusion des posts des amis, page par page
+from app import db
+from app.schema import backfill_post_authors
+from conftest import create_user, create_post
+
+
+def befriend(client, user_id, friend_id):
+    assert client.post(f'/users/{user_id}/friends', json={'friend_id': friend_id}).status_code == 201
+
+
+def test_feed_merges_friends_page_by_page(client):
+    alice, bob, carol, dave = (create_user(client, name) for name in ('alice', 'bob', 'carol', 'dave'))
+    befriend(client, alice, bob)
+    befriend(client, carol, alice)
+    # Posts entrelacés de bob et carol, et un post de dave (pas un ami)
+    client.post('/posts/bulk', json=[{'title': f'post {index}', 'content': 'c',
+                                      'user_id': (bob, carol, dave)[index % 3], 'created_at': 1000 + index}
+                                     for index in range(9)])
+
+    titles, url = [], f'/users/{alice}/feed?limit=2'
+    while url:
+        body = client.get(url).get_json()
+        assert len(body['posts']) <= 2
+        titles += [post['title'] for post in body['posts']]
+        url = body['next_cursor'] and f"/users/{alice}/feed?limit=2&after={body['next_cursor']}"
+    assert titles == [f'post {index}' for index in (7, 6, 4, 3, 1, 0)]
+
+
+def test_posts_carry_their_author_id(client):
+    alice = create_user(client, 'alice')
+    post_id = create_post(client, alice, 'bonjour')
+    assert db.graph.nodes['Post'][post_id]['author_id'] == alice
+
+    # Post créé avant l'index (author_id, created_at) : renseigné par lots
+    del db.graph.nodes['Post'][post_id]['author_id']
+    assert backfill_post_authors(db, batch_size=1) == 1
+    assert db.graph.nodes['Post'][post_id]['author_id'] == alice
@@ -0,0 +1,68 @@
+﻿# Carte d'identité : une entité lue au plus une fois par requête HTTP
+import pytest
+from app import db
+from app.cache import entity_cache
+from app.models.post import Post
+from app.models.user import User
+from conftest import create_user, create_post
+
+
+class CountingGraph:
+    """Graphe qui compte les requêtes exécutées, par nom"""
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.names = []
+
+    def run(self, query, **params):
+        self.names.append(query.name)
+        return self.graph.run(query, **params)
+
+    def stream(self, query, **params):
+        yield from self.run(query, **params)
+
+
+@pytest.fixture
+def counting(client, monkeypatch):
+    # Sans cache d'entités : seules les lectures évitées par la carte comptent
+    monkeypatch.setattr(entity_cache, 'enabled', False)
+    graph = CountingGraph(db.graph)
+    db.graph = graph
+    yield graph
+    db.graph = graph.graph
+
+
+def test_same_object_within_a_request(app, client, counting):
+    alice = create_user(client, 'alice')
+    post_id = create_post(client, alice, 'bonjour')
+    counting.names.clear()
+
+    with app.test_request_context():
+        post = Post.find_by_id(post_id)
+        assert Post.find_by_id(post_id) is post
+        assert User.find_by_id(alice) is User.find_by_id(alice)
+        assert Post.find_by_id('inconnu') is None
+        assert Post.find_by_id('inconnu') is None
+    assert counting.names == ['post.find_by_id', 'user.find_by_id', 'post.find_by_id']
+
+    # Requête suivante : nouvelle carte
+    with app.test_request_context():
+        assert Post.find_by_id(post_id) is not post
+    assert counting.names.count('post.find_by_id') == 3
+
+
+def test_write_discards_the_entity(app, client, counting):
+    alice = create_user(client, 'alice')
+    with app.test_request_context():
+        user = User.find_by_id(alice)
+        user.name = 'alicia'
+        user.save()
+        assert User.find_by_id(alice).name == 'alicia'
+        assert User.find_by_id(alice) is not user
+
+
+def test_nothing_is_kept_outside_a_request(client, counting):
+    alice = create_user(client, 'alice')
+    counting.names.clear()
+    assert User.find_by_id(alice) is not User.find_by_id(alice)
+    assert counting.names == ['user.find_by_id'] * 2
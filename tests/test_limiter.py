@@ -0,0 +1,69 @@
+﻿# Limiteur de requêtes : places bornées, connexion paresseuse, reconnexion
+import threading
+import pytest
+from app.backends.memory import MemoryGraph
+from app.database import ConcurrencyLimiter, LimiterTimeout, Query
+
+PING = Query("db.ping", "RETURN 1 AS ok")
+
+
+class BlockingGraph(MemoryGraph):
+    """Graphe mémoire dont les requêtes attendent un signal"""
+
+    def __init__(self):
+        super().__init__()
+        self.started = threading.Semaphore(0)
+        self.go = threading.Event()
+
+    def run(self, query, **params):
+        self.started.release()
+        self.go.wait(5)
+        return super().run(query, **params)
+
+
+def test_connection_is_opened_on_first_use_and_hooks_run_once():
+    connects, hooked = [], []
+    limiter = ConcurrencyLimiter(lambda: connects.append(1) or MemoryGraph(), max_size=2)
+    limiter.on_connect(hooked.append)
+    assert connects == [] and not limiter.connected
+
+    assert limiter.run(PING).data() == [{'ok': 1}]
+    limiter.run(PING)
+    assert len(connects) == 1
+    assert len(hooked) == 1
+
+
+def test_slots_are_bounded():
+    graph = BlockingGraph()
+    limiter = ConcurrencyLimiter(lambda: graph, max_size=1, acquire_timeout=0.05)
+    thread = threading.Thread(target=limiter.run, args=(PING,))
+    thread.start()
+    assert graph.started.acquire(timeout=5)
+
+    with pytest.raises(LimiterTimeout):
+        limiter.run(PING)
+    graph.go.set()
+    thread.join()
+    stats = limiter.stats()
+    assert (stats['in_use'], stats['acquired'], stats['timeouts']) == (0, 1, 1)
+
+
+class DeadGraph:
+    def run(self, query, **params):
+        raise ConnectionError('connexion fermée')
+
+
+def test_idle_connection_is_checked_and_reopened():
+    graphs = [DeadGraph(), MemoryGraph()]
+    limiter = ConcurrencyLimiter(lambda: graphs.pop(0), liveness_check_interval=-1)
+    limiter.connect()
+    # Intervalle négatif : la connexion est vérifiée à chaque requête, puis rouverte
+    assert limiter.run(PING).data() == [{'ok': 1}]
+    assert limiter.stats()['reconnects'] == 1
+
+
+def test_unavailable_database():
+    limiter = ConcurrencyLimiter(lambda: None)
+    with pytest.raises(ConnectionError):
+        limiter.run(PING)
+    assert limiter.stats()['in_use'] == 0
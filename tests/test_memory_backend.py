@@ -0,0 +1,210 @@
+﻿# Backend mémoire : couverture des requêtes nommées, routes et parité avec Neo4j
+import os
+import pathlib
+import re
+import pytest
+from app import db
+from app.backends.memory import HANDLERS, MemoryCursor
+from app.config import Config
+from app.counters import repair_counters
+from app.recommendations import build_recommendations
+from conftest import create_user, create_post, create_comment
+
+APP_DIR = pathlib.Path(__file__).resolve().parent.parent / 'app'
+
+# Base Neo4j de test pour la parité : elle est vidée par le test
+NEO4J_TEST_URI = os.getenv('NEO4J_TEST_URI')
+
+# Requêtes sans équivalent en mémoire (schéma) : résultats non comparés
+PARITY_SKIPPED = ('schema.',)
+
+
+def query_names():
+    """Noms des requêtes nommées déclarées dans le code de l'application"""
+    names = set()
+    for path in APP_DIR.rglob('*.py'):
+        names.update(re.findall(r'Query\(\s*"([a-z_.]+)"', path.read_text(encoding='utf-8-sig')))
+    return names
+
+
+def test_every_named_query_has_a_handler():
+    names = query_names()
+    assert names
+    assert sorted(names - set(HANDLERS)) == []
+    assert sorted(set(HANDLERS) - names) == []
+
+
+def test_user_crud(client):
+    user_id = create_user(client, 'alice')
+    assert client.get(f'/users/{user_id}').get_json()['user']['name'] == 'alice'
+
+    response = client.put(f'/users/{user_id}', json={'name': 'alice2'})
+    assert response.status_code == 200
+    assert client.get(f'/users/{user_id}').get_json()['user']['name'] == 'alice2'
+
+    assert client.delete(f'/users/{user_id}').status_code == 200
+    assert client.get(f'/users/{user_id}').status_code == 404
+
+
+def test_friends_feed_and_recommendations(client):
+    alice, bob, carol = (create_user(client, name) for name in ('alice', 'bob', 'carol'))
+    for user_id, friend_id in ((alice, bob), (bob, carol)):
+        response = client.post(f'/users/{user_id}/friends', json={'friend_id': friend_id})
+        assert response.status_code == 201
+        assert response.get_json()['created'] is True
+
+    friends = client.get(f'/users/{bob}/friends').get_json()['friends']
+    assert sorted(friend['id'] for friend in friends) == sorted([alice, carol])
+
+    post_id = create_post(client, bob, 'bonjour')
+    feed = client.get(f'/users/{alice}/feed').get_json()['posts']
+    assert [post['id'] for post in feed] == [post_id]
+    assert client.get(f'/users/{carol}/feed').get_json()['posts'][0]['id'] == post_id
+
+    recommendations = client.get(f'/users/{alice}/recommendations').get_json()['recommendations']
+    assert [(user['id'], user['mutual_friends_count']) for user in recommendations] == [(carol, 1)]
+
+    assert client.delete(f'/users/{alice}/friends/{bob}').status_code == 200
+    assert client.get(f'/users/{alice}/feed').get_json()['posts'] == []
+    assert client.get(f'/users/{alice}/recommendations').get_json()['recommendations'] == []
+
+
+def test_deleted_user_leaves_recommendations(client):
+    alice, bob, carol = (create_user(client, name) for name in ('alice', 'bob', 'carol'))
+    client.post(f'/users/{alice}/friends', json={'friend_id': bob})
+    client.post(f'/users/{bob}/friends', json={'friend_id': carol})
+
+    assert client.delete(f'/users/{carol}').status_code == 200
+    assert client.get(f'/users/{alice}/recommendations').get_json()['recommendations'] == []
+
+
+def test_counters_follow_likes_and_comments(client):
+    alice = create_user(client, 'alice')
+    post_id = create_post(client, alice, 'bonjour')
+    comment_id = create_comment(client, post_id, alice)
+
+    assert client.post(f'/posts/{post_id}/like', json={'user_id': alice}).status_code == 201
+    post = client.get(f'/posts/{post_id}').get_json()['post']
+    assert (post['like_count'], post['comment_count']) == (1, 1)
+
+    assert client.delete(f'/comments/{comment_id}').status_code == 200
+    assert client.get(f'/posts/{post_id}').get_json()['post']['comment_count'] == 0
+    # Une deuxième suppression ne fait pas passer le compteur sous zéro
+    assert client.delete(f'/comments/{comment_id}').status_code == 404
+    assert client.get(f'/posts/{post_id}').get_json()['post']['comment_count'] == 0
+
+
+def test_post_delete_removes_its_comments(client):
+    alice = create_user(client, 'alice')
+    post_id = create_post(client, alice, 'bonjour')
+    comment_ids = [create_comment(client, post_id, alice, f'commentaire {i}') for i in range(3)]
+    # Lu une fois : le commentaire est dans le cache d'entités
+    assert client.get(f'/comments/{comment_ids[0]}').status_code == 200
+
+    assert client.delete(f'/posts/{post_id}').status_code == 200
+    assert client.get(f'/posts/{post_id}').status_code == 404
+    for comment_id in comment_ids:
+        assert client.get(f'/comments/{comment_id}').status_code == 404
+    assert client.get('/comments').get_json()['comments'] == []
+
+
+class RecordingGraph:
+    """Graphe qui enregistre chaque requête exécutée, ses paramètres et son résultat"""
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.calls = []
+
+    def run(self, query, **params):
+        records = self.graph.run(query, **params).data()
+        self.calls.append((query, params, normalize(records, ordered='ORDER BY' in query)))
+        return MemoryCursor(records)
+
+    def stream(self, query, **params):
+        yield from self.run(query, **params)
+
+
+def normalize(value, ordered=True):
+    """Résultat comparable entre backends : nœuds en dictionnaires, listes non ordonnées triées"""
+    if isinstance(value, dict):
+        return {key: normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        items = [normalize(item, ordered=False) for item in value]
+        return items if ordered else sorted(items, key=repr)
+    return value
+
+
+def ok(response):
+    assert response.status_code < 300, response.get_json()
+    return response
+
+
+def run_scenario(client):
+    """Parcours des routes qui exécute la plupart des requêtes nommées"""
+    alice, bob, carol = (create_user(client, name) for name in ('alice', 'bob', 'carol'))
+    ok(client.put(f'/users/{alice}', json={'email': 'alice@example.org'}))
+    ok(client.post('/users/bulk', json=[{'name': 'dave', 'email': 'dave@example.com'}]))
+    ok(client.post(f'/users/{alice}/friends', json={'friend_id': bob}))
+    ok(client.post(f'/users/{bob}/friends', json={'friend_id': carol}))
+    ok(client.post('/friendships/bulk', json=[{'user_id': alice, 'friend_id': carol}]))
+    post_ids = [create_post(client, user_id, f'post {i}') for i, user_id in enumerate((alice, bob, carol))]
+    ok(client.post('/posts/bulk', json=[{'title': 't', 'content': 'c', 'user_id': bob}]))
+    comment_id = create_comment(client, post_ids[0], bob)
+    ok(client.post('/comments/bulk', json=[{'content': 'c', 'user_id': carol, 'post_id': post_ids[1]}]))
+    ok(client.post(f'/posts/{post_ids[0]}/like', json={'user_id': carol}))
+    ok(client.post(f'/comments/{comment_id}/like', json={'user_id': alice}))
+    ok(client.post('/likes/bulk', json=[{'user_id': alice, 'post_id': post_ids[1]},
+                                        {'user_id': bob, 'comment_id': comment_id}]))
+    for path in ('/users', '/posts?limit=2', f'/posts?viewer={alice}', '/comments',
+                 f'/users/{alice}/feed', f'/users/{alice}/friends', f'/users/{alice}/recommendations',
+                 f'/users/{alice}/mutual-friends/{bob}', f'/users/{alice}/friends/{bob}',
+                 f'/posts/users/{bob}/posts', f'/comments/posts/{post_ids[0]}/comments'):
+        ok(client.get(path))
+    ok(client.delete(f'/posts/{post_ids[0]}/like', json={'user_id': carol}))
+    ok(client.delete(f'/comments/{comment_id}/like', json={'user_id': alice}))
+    ok(client.delete(f'/users/{alice}/friends/{bob}'))
+    ok(client.delete(f'/comments/{comment_id}'))
+    ok(client.delete(f'/posts/{post_ids[1]}'))
+    ok(client.delete(f'/users/{carol}'))
+    ok(client.get(f'/users/{bob}/recommendations'))
+    # Maintenance : recalcul des compteurs et des recommandations
+    repair_counters(db)
+    build_recommendations(db)
+    ok(client.get(f'/users/{bob}/recommendations'))
+
+
+def test_scenario_runs_on_memory(client):
+    recording = RecordingGraph(db.graph)
+    db.graph = recording
+    try:
+        run_scenario(client)
+    finally:
+        db.graph = recording.graph
+    assert len({query.name for query, _, _ in recording.calls}) >= 30
+
+
+@pytest.mark.skipif(not NEO4J_TEST_URI, reason="NEO4J_TEST_URI non défini (base Neo4j vidée par le test)")
+def test_named_queries_match_neo4j(client):
+    """Chaque requête nommée retourne le même résultat sur Neo4j et en mémoire
+
+    Le scénario est exécuté sur le backend mémoire, puis les mêmes requêtes,
+    avec les mêmes paramètres (identifiants et dates compris), sont rejouées
+    dans l'ordre sur une base Neo4j vide. Tant que les résultats sont égaux,
+    l'application aurait émis exactement les mêmes requêtes sur Neo4j.
+    """
+    from py2neo import Graph
+
+    recording = RecordingGraph(db.graph)
+    db.graph = recording
+    try:
+        run_scenario(client)
+    finally:
+        db.graph = recording.graph
+
+    graph = Graph(NEO4J_TEST_URI, auth=(Config.NEO4J_USER, Config.NEO4J_PASSWORD))
+    graph.run("MATCH (n) DETACH DELETE n")
+    for query, params, expected in recording.calls:
+        if query.name.startswith(PARITY_SKIPPED):
+            continue
+        actual = normalize(graph.run(query, **params).data(), ordered='ORDER BY' in query)
+        assert actual == expected, query.name
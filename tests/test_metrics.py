@@ -0,0 +1,69 @@
+﻿# Mesures des requêtes Cypher et des routes : /metrics, /db/stats, requêtes lentes
+import pytest
+from app.metrics import QueryMetrics, redact
+from conftest import create_user
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def data(self):
+        return list(self.rows)
+
+
+class NamedQuery(str):
+    name = 'user.find_by_id'
+
+
+QUERY = NamedQuery('MATCH (u:User {id: $user_id}) RETURN u')
+
+
+def test_redact_keeps_only_types_and_sizes():
+    assert redact({'user_id': 'secret', 'ids': [1, 2, 3], 'limit': 10, 'row': {'a': 1}}) == \
+        {'user_id': '<str:6>', 'ids': '<list:3>', 'limit': '<int>', 'row': '<dict:1>'}
+
+
+def test_query_is_recorded_once_read():
+    metrics = QueryMetrics(slow_query_ms=0)
+    cursor = metrics.run(lambda query, **params: FakeCursor([{'u': 1}, {'u': 2}]), QUERY, {'user_id': 'x'})
+    assert metrics.summary() == []
+    assert len(list(cursor)) == 2
+    entry, = metrics.summary()
+    assert (entry['query'], entry['count'], entry['rows'], entry['errors']) == ('user.find_by_id', 1, 2, 0)
+
+
+def test_slow_query_is_logged_without_values(capsys):
+    metrics = QueryMetrics(slow_query_ms=0.000001)
+    metrics.run(lambda query, **params: FakeCursor([]), QUERY, {'user_id': 'secret'}).data()
+    output = capsys.readouterr().out
+    assert 'Requête lente user.find_by_id' in output
+    assert '<str:6>' in output and 'secret' not in output
+
+
+def test_errors_are_counted():
+    metrics = QueryMetrics()
+
+    def fail(query, **params):
+        raise ConnectionError('connexion perdue')
+    with pytest.raises(ConnectionError):
+        metrics.run(fail, QUERY, {})
+    assert metrics.errors.values() == {('user.find_by_id',): 1}
+
+
+def test_metrics_and_stats_routes(client):
+    alice = create_user(client, 'alice')
+    client.get(f'/users/{alice}')
+    text = client.get('/metrics').get_data(as_text=True)
+    assert 'db_query_duration_seconds_count{query="user.find_by_id"}' in text
+    assert 'http_request_db_queries_bucket{endpoint="user_bp.create_user",le="1"}' in text
+    assert 'db_limiter_in_use 0' in text
+
+    stats = client.get('/db/stats').get_json()
+    names = [entry['query'] for entry in stats['queries']]
+    assert 'user.find_by_id' in names and 'user.save' in names
+    totals = [entry['total_ms'] for entry in stats['queries']]
+    assert totals == sorted(totals, reverse=True)
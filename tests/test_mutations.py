@@ -0,0 +1,82 @@
+﻿# Likes et amitiés : une seule requête par mutation, statut selon les nœuds trouvés
+import pytest
+from app import db
+from conftest import create_user, create_post, create_comment
+
+
+class CountingGraph:
+    """Graphe qui note le nom des requêtes exécutées"""
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.names = []
+
+    def run(self, query, **params):
+        self.names.append(query.name)
+        return self.graph.run(query, **params)
+
+    def stream(self, query, **params):
+        yield from self.run(query, **params)
+
+
+@pytest.fixture
+def data(client):
+    alice, bob = create_user(client, 'alice'), create_user(client, 'bob')
+    post_id = create_post(client, alice, 'bonjour')
+    comment_id = create_comment(client, post_id, alice)
+    return {'alice': alice, 'bob': bob, 'post_id': post_id, 'comment_id': comment_id}
+
+
+@pytest.fixture
+def counting(client):
+    graph = CountingGraph(db.graph)
+    db.graph = graph
+    yield graph
+    db.graph = graph.graph
+
+
+@pytest.mark.parametrize('path, body, name', [
+    ('/posts/{post_id}/like', {'user_id': '{bob}'}, 'post.add_like'),
+    ('/comments/{comment_id}/like', {'user_id': '{bob}'}, 'comment.add_like'),
+    ('/users/{alice}/friends', {'friend_id': '{bob}'}, 'user.create_friendship')
+])
+def test_mutation_is_a_single_query(client, data, counting, path, body, name):
+    body = {key: value.format(**data) for key, value in body.items()}
+    assert client.post(path.format(**data), json=body).status_code == 201
+    # Les recommandations sont mises en file, appliquées tout de suite dans
+    # les tests (RECOMMENDATIONS_FLUSH_INTERVAL=0)
+    names = [query for query in counting.names if not query.startswith('user.recommendations')]
+    assert names == [name]
+
+
+@pytest.mark.parametrize('method, path, body, expected', [
+    ('post', '/posts/{post_id}/like', {'user_id': 'inconnu'}, 404),
+    ('post', '/posts/inconnu/like', {'user_id': '{bob}'}, 404),
+    ('delete', '/posts/inconnu/like', {'user_id': '{bob}'}, 404),
+    ('post', '/comments/inconnu/like', {'user_id': '{bob}'}, 404),
+    ('post', '/users/{alice}/friends', {'friend_id': 'inconnu'}, 404),
+    ('post', '/users/inconnu/friends', {'friend_id': '{bob}'}, 404),
+    ('post', '/users/{alice}/friends', {'friend_id': '{alice}'}, 400),
+    ('delete', '/users/{alice}/friends/inconnu', None, 404),
+    ('get', '/users/inconnu/friends/{bob}', None, 404)
+])
+def test_missing_nodes(client, data, method, path, body, expected):
+    kwargs = {'json': {key: value.format(**data) for key, value in body.items()}} if body else {}
+    assert getattr(client, method)(path.format(**data), **kwargs).status_code == expected
+    post = client.get(f"/posts/{data['post_id']}").get_json()['post']
+    assert post['like_count'] == 0
+    assert client.get(f"/users/{data['alice']}").get_json()['user']['friend_count'] == 0
+
+
+def test_removal_reports_whether_something_was_removed(client, data):
+    path = f"/posts/{data['post_id']}/like"
+    assert client.delete(path, json={'user_id': data['bob']}).get_json()['removed'] is False
+    client.post(path, json={'user_id': data['bob']})
+    assert client.delete(path, json={'user_id': data['bob']}).get_json()['removed'] is True
+
+    alice, bob = data['alice'], data['bob']
+    assert client.delete(f'/users/{alice}/friends/{bob}').get_json()['removed'] is False
+    client.post(f'/users/{alice}/friends', json={'friend_id': bob})
+    assert client.get(f'/users/{bob}/friends/{alice}').get_json()['are_friends'] is True
+    assert client.delete(f'/users/{bob}/friends/{alice}').get_json()['removed'] is True
+    assert client.get(f'/users/{alice}/friends/{bob}').get_json()['are_friends'] is False
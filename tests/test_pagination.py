@@ -0,0 +1,66 @@
+﻿# Pagination par curseur des listes /users, /posts et /comments
+import pytest
+from app.pagination import keyset_clause
+from conftest import create_user, create_post
+
+
+def pages(client, path, key, limit):
+    """Toutes les pages d'une liste, en suivant next_cursor"""
+    result = []
+    url = f'{path}?limit={limit}'
+    while True:
+        response = client.get(url)
+        assert response.status_code == 200, response.get_json()
+        body = response.get_json()
+        assert len(body[key]) <= limit
+        result.append([item['id'] for item in body[key]])
+        if body['next_cursor'] is None:
+            return result
+        url = f"{path}?limit={limit}&after={body['next_cursor']}"
+
+
+def test_next_page_does_not_overlap(client):
+    user_ids = [create_user(client, f'user{index}') for index in range(5)]
+    first = client.get('/users?limit=2').get_json()
+    second = client.get(f"/users?limit=2&after={first['next_cursor']}").get_json()
+    first_ids = [user['id'] for user in first['users']]
+    second_ids = [user['id'] for user in second['users']]
+    assert len(first_ids) == len(second_ids) == 2
+    assert not set(first_ids) & set(second_ids)
+    assert set(first_ids + second_ids) <= set(user_ids)
+
+
+@pytest.mark.parametrize('path, key', [('/users', 'users'), ('/posts', 'posts'), ('/comments', 'comments')])
+def test_pages_cover_the_list_once(client, path, key):
+    # Même created_at pour tous : l'ordre et le curseur départagent par id
+    alice = create_user(client, 'alice')
+    post_id = create_post(client, alice, 'bonjour')
+    items = {
+        'users': [{'name': f'user{index}', 'email': f'user{index}@example.com', 'created_at': 1000}
+                  for index in range(6)],
+        'posts': [{'title': f'post {index}', 'content': 'c', 'user_id': alice, 'created_at': 1000}
+                  for index in range(6)],
+        'comments': [{'content': f'commentaire {index}', 'user_id': alice, 'post_id': post_id,
+                      'created_at': 1000} for index in range(7)]
+    }[key]
+    assert client.post(f'{path}/bulk', json=items).status_code == 201
+
+    expected = [item['id'] for item in client.get(f'{path}?limit=100').get_json()[key]]
+    assert len(expected) == 7
+    result = pages(client, path, key, 3)
+    assert [len(page) for page in result] == [3, 3, 1]
+    assert [item_id for page in result for item_id in page] == expected
+
+
+def test_invalid_page_parameters(client):
+    assert client.get('/users?limit=0').status_code == 400
+    assert client.get('/users?limit=abc').status_code == 400
+    assert client.get('/posts?after=pas-un-curseur').status_code == 400
+
+
+def test_keyset_clause_bounds_created_at_alone():
+    # Borne seule sur created_at en tête de clause : recherche de plage dans l'index
+    clause, params = keyset_clause('p', (1000, 'b'))
+    assert clause.startswith('WHERE p.created_at <= $after_created_at AND (')
+    assert params == {'after_created_at': 1000, 'after_id': 'b'}
+    assert keyset_clause('p', None) == ('', {})
@@ -0,0 +1,80 @@
+﻿# Capture des plans d'exécution, avec un faux curseur Neo4j (le backend mémoire n'a pas de plan)
+import pytest
+from app import plans
+from app.database import Query
+from app.plans import PlanCapture, format_report
+
+FIND_ALL = Query("user.find_all", """
+MATCH (u:User)
+RETURN u
+""")
+
+PLAN = {
+    'operator_type': 'ProduceResults@neo4j', 'args': {'EstimatedRows': 3.0}, 'identifiers': ['u'],
+    'db_hits': 0, 'rows': 2,
+    'children': [{'operatorType': 'NodeByLabelScan@neo4j', 'args': {'Details': 'u:User'},
+                  'dbHits': 101, 'rows': 100, 'children': []}]
+}
+
+
+class PlanCursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def data(self):
+        return list(self.rows)
+
+    def plan(self):
+        return PLAN
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def run(calls):
+    def run(query, **params):
+        calls.append(str(query).split()[0])
+        return PlanCursor([{'u': 1}, {'u': 2}])
+    return run
+
+
+def test_profile_reads_result_and_flags_label_scan(run, calls):
+    capture = PlanCapture('profile', 1.0, seed=1)
+    cursor = capture.run(run, FIND_ALL, {})
+    assert calls == ['PROFILE']
+    assert list(cursor) == cursor.data() == [{'u': 1}, {'u': 2}]
+
+    plan, = capture.report()
+    assert (plan['query'], plan['flags'], plan['db_hits'], plan['rows']) == \
+        ('user.find_all', ['NodeByLabelScan'], 101, 2)
+    assert plan['cypher'] == 'MATCH (u:User) RETURN u'
+    lines, flagged = format_report([plan])
+    assert flagged == 1 and 'SIGNALÉE NodeByLabelScan' in lines[0]
+    assert format_report([plan], {'user.find_all'})[1] == 0
+
+
+def test_explain_runs_the_query_after_its_plan(run, calls):
+    capture = PlanCapture('explain', 1.0)
+    capture.run(run, FIND_ALL, {})
+    assert calls == ['EXPLAIN', 'MATCH']
+    assert capture.report()[0]['mode'] == 'explain'
+
+
+def test_unsampled_and_schema_queries_are_not_planned(run, calls):
+    PlanCapture('profile', 0.0).run(run, FIND_ALL, {})
+    PlanCapture('profile', 1.0).run(run, Query("schema.create", "CREATE INDEX x"), {})
+    assert calls == ['MATCH', 'CREATE']
+    with pytest.raises(ValueError):
+        PlanCapture('trace')
+
+
+def test_plans_route(client, run, monkeypatch):
+    assert client.get('/db/plans').status_code == 400
+    capture = PlanCapture('profile', 1.0)
+    capture.run(run, FIND_ALL, {})
+    monkeypatch.setattr(plans, 'plan_capture', capture)
+    assert [plan['query'] for plan in client.get('/db/plans?flagged=1').get_json()['plans']] == ['user.find_all']
+    assert client.delete('/db/plans').get_json()['plans'] == []
@@ -0,0 +1,51 @@
+﻿# Listes lues en projections Cypher : mêmes champs que to_dict(), sans objet modèle
+import pytest
+from app.models.comment import Comment
+from app.models.post import Post
+from app.models.user import User
+from conftest import create_user, create_post, create_comment
+
+
+@pytest.fixture
+def data(client):
+    alice, bob = create_user(client, 'alice'), create_user(client, 'bob')
+    client.post(f'/users/{alice}/friends', json={'friend_id': bob})
+    post_id = create_post(client, bob, 'bonjour')
+    create_comment(client, post_id, alice)
+    client.post(f'/posts/{post_id}/like', json={'user_id': alice})
+    return {'alice': alice, 'bob': bob, 'post_id': post_id}
+
+
+def test_rows_equal_to_dict(data):
+    alice, bob, post_id = data['alice'], data['bob'], data['post_id']
+    for model, rows in ((User, User.iter_all_rows()), (Post, Post.iter_all_rows()),
+                        (Post, Post.iter_by_user_rows(bob)), (Post, Post.iter_feed_rows(alice)),
+                        (Comment, Comment.iter_all_rows()), (Comment, Comment.iter_by_post_rows(post_id))):
+        rows = list(rows)
+        assert rows
+        for row in rows:
+            assert row == model.find_by_id(row['id']).to_dict()
+
+
+def test_viewer_adds_liked_by_me(data):
+    alice, bob = data['alice'], data['bob']
+    row, = Post.iter_all_rows(viewer_id=alice)
+    assert row['liked_by_me'] is True
+    assert {key: value for key, value in row.items() if key != 'liked_by_me'} == \
+        Post.find_by_id(row['id']).to_dict()
+    assert next(Post.iter_all_rows(viewer_id=bob))['liked_by_me'] is False
+
+
+def test_iterators_build_models_from_rows(data):
+    post, = Post.iter_feed(data['alice'])
+    assert isinstance(post, Post)
+    assert (post.id, post.user_id, post.like_count, post.comment_count) == (data['post_id'], data['bob'], 1, 1)
+    comment, = Comment.iter_by_post(data['post_id'])
+    assert (comment.user_id, comment.post_id) == (data['alice'], data['post_id'])
+
+
+def test_routes_serialize_rows(client, data):
+    posts = client.get(f"/users/{data['alice']}/feed").get_json()['posts']
+    assert posts == [Post.find_by_id(data['post_id']).to_dict()]
+    lines = client.get('/users', headers={'Accept': 'application/x-ndjson'}).get_data(as_text=True).splitlines()
+    assert len(lines) == 2
@@ -0,0 +1,61 @@
+﻿# Recommandations d'amis : deltas d'une amitié, file et recalcul complet
+import pytest
+from app import db
+from app.metrics import recommendation_metrics
+from app.recommendations import RecommendationQueue, build_recommendations, friendship_deltas
+from conftest import create_user
+
+
+def test_friendship_deltas_only_touch_new_paths():
+    # a - b - c déjà amis ; ajout de b - d, d ayant e pour ami
+    deltas = friendship_deltas('b', 'd', ['a', 'c'], ['e'], 1)
+    assert deltas == {('a', 'd'): 1, ('d', 'a'): 1, ('c', 'd'): 1, ('d', 'c'): 1,
+                      ('e', 'b'): 1, ('b', 'e'): 1, ('b', 'd'): 0, ('d', 'b'): 0}
+
+
+def test_friendship_deltas_skip_common_friends():
+    # c est déjà ami des deux : aucun chemin nouveau ne passe par lui
+    deltas = friendship_deltas('a', 'b', ['c', 'd'], ['c'], -1)
+    assert deltas == {('d', 'b'): -1, ('b', 'd'): -1, ('a', 'b'): 0, ('b', 'a'): 0}
+
+
+def recommended(client, user_id):
+    body = client.get(f'/users/{user_id}/recommendations').get_json()
+    return [(user['id'], user['mutual_friends_count']) for user in body['recommendations']]
+
+
+def test_queued_deltas_match_a_full_rebuild(client):
+    alice, bob, carol, dave = (create_user(client, name) for name in ('alice', 'bob', 'carol', 'dave'))
+    for user_id, friend_id in ((alice, bob), (bob, carol), (carol, dave), (alice, dave)):
+        client.post(f'/users/{user_id}/friends', json={'friend_id': friend_id})
+    client.delete(f'/users/{carol}/friends/{dave}')
+    incremental = {user_id: recommended(client, user_id) for user_id in (alice, bob, carol, dave)}
+
+    progress = []
+    assert build_recommendations(db, progress=lambda written, total: progress.append((written, total))) == 4
+    assert progress == [(4, 4)]
+    assert {user_id: recommended(client, user_id) for user_id in (alice, bob, carol, dave)} == incremental
+    assert incremental[alice] == [(carol, 1)]
+
+
+class FailingGraph:
+    def run(self, query, **params):
+        raise ConnectionError('base indisponible')
+
+
+def test_failed_flush_is_counted(client):
+    # Lot différé d'une heure : appliqué ici, à la main
+    queue = RecommendationQueue(flush_interval=3600)
+    failed = recommendation_metrics.flushes.values().get(('failed',), 0)
+    dropped = recommendation_metrics.dropped.values().get(('flush_failed',), 0)
+
+    queue.add_friendship_change('a', 'b', ['c'], [], 1)
+    assert queue.pending == 4
+    with pytest.raises(ConnectionError):
+        queue.flush(FailingGraph())
+    assert queue.pending == 0
+    assert recommendation_metrics.flushes.values()[('failed',)] == failed + 1
+    assert recommendation_metrics.dropped.values()[('flush_failed',)] == dropped + 4
+
+    metrics = client.get('/metrics').get_data(as_text=True)
+    assert 'recommendations_dropped_deltas_total{reason="flush_failed"}' in metrics
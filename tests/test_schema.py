@@ -0,0 +1,47 @@
+﻿# Contraintes et index : création des manquants seulement
+from app.backends.memory import MemoryCursor
+from app.schema import CONSTRAINTS, INDEXES, init_schema
+
+
+class SchemaGraph:
+    """Graphe qui connaît une liste de contraintes et index, et note les créations"""
+
+    def __init__(self, existing=()):
+        self.existing = set(existing)
+        self.created = []
+
+    def run(self, query, **params):
+        if query.name in ('schema.show_constraints', 'schema.show_indexes'):
+            return MemoryCursor([{'name': name} for name in self.existing])
+        if query.name == 'schema.create':
+            name = str(query).split()[2]
+            self.created.append(name)
+            self.existing.add(name)
+        return MemoryCursor([{'updated': 0}])
+
+
+def test_init_schema_creates_everything_once():
+    graph = SchemaGraph()
+    report = init_schema(graph)
+    names = [name for name, _ in CONSTRAINTS + INDEXES]
+    assert report == {'created': names, 'existing': []}
+    assert graph.created == names
+
+    report = init_schema(graph)
+    assert report == {'created': [], 'existing': names}
+    assert graph.created == names
+
+
+def test_init_schema_keeps_existing_names():
+    graph = SchemaGraph(existing={'user_id_unique', 'post_created_at'})
+    report = init_schema(graph)
+    assert set(report['existing']) == {'user_id_unique', 'post_created_at'}
+    assert 'user_id_unique' not in graph.created
+    assert 'post_id_unique' in graph.created
+
+
+def test_every_id_lookup_is_backed_by_a_constraint():
+    cypher = ' '.join(str(query) for _, query in CONSTRAINTS)
+    for label in ('User', 'Post', 'Comment'):
+        assert f':{label}) REQUIRE ' in cypher
+    assert init_schema(None) == {'created': [], 'existing': []}
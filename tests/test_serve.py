@@ -0,0 +1,47 @@
+﻿# Options du serveur de production (gunicorn), sans lancer de processus
+import signal
+import pytest
+from app import serve, versions
+from app.config import Config
+from app.serve import default_workers, gunicorn_options, shared_version_store
+
+
+@pytest.mark.parametrize('worker_class, expected', [('gthread', 9), ('gevent', 4)])
+def test_default_workers(worker_class, expected):
+    assert default_workers(worker_class, cpu_count=4) == expected
+
+
+def test_options_from_config():
+    class ServeConfig(Config):
+        SERVE_WORKER_CLASS = 'gevent'
+        SERVE_WORKERS = 3
+        SERVE_MAX_REQUESTS = 1000
+    options = gunicorn_options(ServeConfig)
+    assert (options['worker_class'], options['workers'], options['max_requests']) == ('gevent', 3, 1000)
+    assert options['post_worker_init'] is serve.post_worker_init
+
+    ServeConfig.SERVE_WORKER_CLASS = 'sync'
+    with pytest.raises(ValueError):
+        gunicorn_options(ServeConfig)
+
+
+def test_versions_are_shared_between_workers(monkeypatch, tmp_path):
+    monkeypatch.setattr(Config, 'VERSION_STORE', 'memory')
+    monkeypatch.setattr(Config, 'VERSION_SQLITE_PATH', str(tmp_path / 'versions.db'))
+    monkeypatch.setattr(versions, 'versions', versions.versions)
+
+    shared_version_store(Config, workers=1)
+    assert Config.VERSION_STORE == 'memory'
+    shared_version_store(Config, workers=4)
+    assert Config.VERSION_STORE == 'sqlite'
+    assert isinstance(versions.versions, versions.SqliteVersionStore)
+
+
+def test_reload_signals_the_server(monkeypatch, tmp_path):
+    pidfile = tmp_path / 'serve.pid'
+    pidfile.write_text('1234\n')
+    monkeypatch.setattr(Config, 'SERVE_PIDFILE', str(pidfile))
+    signals = []
+    monkeypatch.setattr(serve.os, 'kill', lambda pid, sig: signals.append((pid, sig)))
+    serve.reload()
+    assert signals == [(1234, signal.SIGHUP)]
@@ -0,0 +1,47 @@
+﻿# Démarrage sans entrée/sortie, connexion rouverte dans un processus enfant
+import os
+from app import database
+from app.backends.memory import MemoryGraph
+from app.database import ConcurrencyLimiter, Query
+from app.startup import measure_startup
+
+PING = Query("db.ping", "RETURN 1 AS ok")
+
+
+def test_create_app_opens_no_connection(monkeypatch):
+    monkeypatch.setenv('DB_BACKEND', 'neo4j')
+    monkeypatch.setenv('NEO4J_URI', 'bolt://127.0.0.1:1')
+    result, = measure_startup(runs=1)
+    assert result['connected'] is False
+    assert result['py2neo_imported'] is False
+
+
+def fork(monkeypatch):
+    """Simule l'entrée dans un processus enfant"""
+    parent = os.getpid()
+    monkeypatch.setattr(database.os, 'getpid', lambda: parent + 1)
+
+
+def test_child_reconnects_and_reruns_hooks(monkeypatch):
+    graphs, hooked = [], []
+    limiter = ConcurrencyLimiter(lambda: graphs.append(MemoryGraph()) or graphs[-1], max_size=1)
+    limiter.on_connect(hooked.append)
+    limiter.run(PING)
+    # Place prise dans le parent au moment du fork : l'enfant ne l'hérite pas
+    limiter.acquire()
+
+    fork(monkeypatch)
+    assert not limiter.connected
+    assert limiter.stats()['in_use'] == 0
+    assert limiter.run(PING).data() == [{'ok': 1}]
+    assert len(graphs) == 2
+    assert hooked == graphs
+
+
+def test_memory_graph_is_kept_after_fork(monkeypatch):
+    graph = MemoryGraph()
+    limiter = ConcurrencyLimiter(lambda: graph, reconnect_after_fork=False)
+    limiter.connect()
+
+    fork(monkeypatch)
+    assert limiter.connected and limiter.graph is graph
@@ -0,0 +1,72 @@
+﻿# Réponses NDJSON en flux : lignes lues et envoyées au fil du parcours
+import json
+import pytest
+from app import db
+from conftest import create_user, create_post
+
+
+class LazyGraph:
+    """Graphe qui compte les lignes lues par les parcours en flux"""
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.pulled = 0
+
+    def run(self, query, **params):
+        return self.graph.run(query, **params)
+
+    def stream(self, query, **params):
+        for record in self.graph.stream(query, **params):
+            self.pulled += 1
+            yield record
+
+
+@pytest.fixture
+def lazy(client):
+    graph = LazyGraph(db.graph)
+    db.graph = graph
+    yield graph
+    db.graph = graph.graph
+
+
+def test_rows_are_emitted_incrementally(client, lazy):
+    alice = create_user(client, 'alice')
+    client.post('/posts/bulk', json=[{'title': f'post {index}', 'content': 'c', 'user_id': alice,
+                                      'created_at': 1000 + index} for index in range(5)])
+
+    response = client.get('/posts?stream=1', buffered=False)
+    assert response.mimetype == 'application/x-ndjson'
+    lines = response.response
+    first = json.loads(next(lines))
+    assert first['title'] == 'post 4'
+    assert lazy.pulled == 1
+    # Une place du limiteur est gardée pendant le parcours
+    assert db.stats()['in_use'] == 1
+
+    rest = [json.loads(line) for line in lines]
+    assert [post['title'] for post in rest] == [f'post {index}' for index in range(3, -1, -1)]
+    assert lazy.pulled == 5
+    response.close()
+    assert db.stats()['in_use'] == 0
+
+
+def test_closing_a_stream_releases_its_slot(client, lazy):
+    alice = create_user(client, 'alice')
+    for index in range(3):
+        create_post(client, alice, f'post {index}')
+
+    response = client.get(f'/posts/users/{alice}/posts?stream=1', buffered=False)
+    next(response.response)
+    # Client déconnecté avant la fin : la session et la place sont rendues
+    response.close()
+    assert lazy.pulled == 1
+    assert db.stats()['in_use'] == 0
+
+
+def test_streamed_list_matches_page(client):
+    alice = create_user(client, 'alice')
+    for index in range(3):
+        create_post(client, alice, f'post {index}')
+    lines = client.get('/posts', headers={'Accept': 'application/x-ndjson'}).get_data(as_text=True).splitlines()
+    page = client.get('/posts').get_json()['posts']
+    assert [json.loads(line) for line in lines] == page
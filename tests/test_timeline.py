@@ -0,0 +1,98 @@
+﻿# Fils matérialisés : diffusion des nouveaux posts, abandon après un changement d'amitié
+import pytest
+from app.timeline import MemoryTimelineStore, SqliteTimelineStore
+from conftest import create_user, create_post
+
+
+@pytest.fixture
+def store(client, monkeypatch):
+    store = MemoryTimelineStore(max_entries=100)
+    monkeypatch.setattr('app.models.post.timelines', store)
+    monkeypatch.setattr('app.models.user.timelines', store)
+    return store
+
+
+@pytest.fixture
+def friends(client):
+    alice, bob, carol = (create_user(client, name) for name in ('alice', 'bob', 'carol'))
+    client.post(f'/users/{alice}/friends', json={'friend_id': bob})
+    return alice, bob, carol
+
+
+def feed_titles(client, user_id):
+    return [post['title'] for post in client.get(f'/users/{user_id}/feed').get_json()['posts']]
+
+
+def test_new_post_is_fanned_out(client, store, friends):
+    alice, bob, _ = friends
+    assert feed_titles(client, bob) == []
+    assert store.exists(bob)
+
+    post_id = create_post(client, alice, 'bonjour')
+    assert [entry[1] for entry in store.read(bob, 10)] == [post_id]
+    assert feed_titles(client, bob) == ['bonjour']
+
+
+def test_bulk_update_is_not_fanned_out_again(client, store, friends):
+    alice, bob, _ = friends
+    feed_titles(client, bob)
+    item = {'id': 'post-1', 'title': 'v1', 'content': 'c', 'user_id': alice, 'created_at': 1000}
+    client.post('/posts/bulk', json=[item])
+    assert store.read(bob, 10) == [(1000, 'post-1')]
+
+    client.post('/posts/bulk', json=[{**item, 'title': 'v2', 'created_at': 5000}])
+    assert store.read(bob, 10) == [(1000, 'post-1')]
+    assert feed_titles(client, bob) == ['v2']
+
+
+def test_friendship_change_drops_timelines(client, store, friends):
+    alice, bob, carol = friends
+    feed_titles(client, alice)
+    feed_titles(client, bob)
+    client.post(f'/users/{bob}/friends', json={'friend_id': carol})
+    assert store.exists(alice)
+    assert not store.exists(bob)
+
+    feed_titles(client, bob)
+    client.delete(f'/users/{bob}/friends/{alice}')
+    assert not store.exists(alice)
+    assert not store.exists(bob)
+
+
+def test_bulk_friendships_drop_timelines(client, store, friends):
+    alice, bob, carol = friends
+    create_post(client, carol, 'de carol')
+    assert feed_titles(client, alice) == []
+    response = client.post('/friendships/bulk', json=[{'user_id': alice, 'friend_id': carol}])
+    assert response.status_code == 201
+    assert not store.exists(alice)
+    assert feed_titles(client, alice) == ['de carol']
+
+
+def test_bulk_friendships_are_deduplicated(client, friends):
+    alice, bob, carol = friends
+    response = client.post('/friendships/bulk', json=[
+        {'user_id': bob, 'friend_id': carol},
+        {'user_id': carol, 'friend_id': bob},
+        {'user_id': bob, 'friend_id': carol},
+        {'user_id': alice, 'friend_id': bob}])
+    assert response.status_code == 201
+    assert [result['status'] for result in response.get_json()['results']] == ['success'] * 4
+    counts = {user_id: client.get(f'/users/{user_id}').get_json()['user']['friend_count']
+              for user_id in (alice, bob, carol)}
+    assert counts == {alice: 1, bob: 2, carol: 1}
+
+    # Deltas de recommandations mis en file : alice et carol ont bob en commun
+    recommendations = client.get(f'/users/{alice}/recommendations').get_json()['recommendations']
+    assert [(user['id'], user['mutual_friends_count']) for user in recommendations] == [(carol, 1)]
+
+
+@pytest.mark.parametrize('kind', ['memory', 'sqlite'])
+def test_read_after_cursor_with_ties(tmp_path, kind):
+    store = (MemoryTimelineStore() if kind == 'memory'
+             else SqliteTimelineStore(str(tmp_path / 'timelines.db')))
+    entries = [(2000, 'a'), (1000, 'c'), (1000, 'b'), (1000, 'a'), (500, 'z')]
+    store.replace('alice', entries)
+    assert store.read('alice', 2, (1000, 'c')) == [(1000, 'b'), (1000, 'a')]
+    assert store.read('alice', 10, (1000, 'a')) == [(500, 'z')]
+    assert store.read('alice', 10, (2000, 'a')) == entries[1:]
@@ -0,0 +1,43 @@
+﻿# Post.save et Comment.save : création ou mise à jour en une requête, sans orphelin
+import pytest
+from app import db
+from app.models.comment import Comment
+from app.models.post import Post
+from conftest import create_user, create_post, create_comment
+
+
+def test_post_for_unknown_author_is_not_created(client):
+    post = Post(title='t', content='c', user_id='inconnu')
+    with pytest.raises(ValueError):
+        post.save()
+    assert db.graph.nodes['Post'] == {}
+
+
+def test_comment_needs_author_and_post(client):
+    alice = create_user(client, 'alice')
+    post_id = create_post(client, alice, 'bonjour')
+    for user_id, target_id in (('inconnu', post_id), (alice, 'inconnu')):
+        with pytest.raises(ValueError):
+            Comment(content='c', user_id=user_id, post_id=target_id).save()
+    assert db.graph.nodes['Comment'] == {}
+    assert client.get(f'/posts/{post_id}').get_json()['post']['comment_count'] == 0
+
+
+def test_update_keeps_creation_time_and_counters(client):
+    alice, bob = create_user(client, 'alice'), create_user(client, 'bob')
+    post_id = create_post(client, alice, 'bonjour')
+    comment_id = create_comment(client, post_id, alice)
+    client.post(f'/posts/{post_id}/like', json={'user_id': bob})
+    post = client.get(f'/posts/{post_id}').get_json()['post']
+
+    updated = client.put(f'/posts/{post_id}', json={'title': 'modifié'}).get_json()['post']
+    assert updated['title'] == 'modifié'
+    assert (updated['created_at'], updated['like_count'], updated['comment_count']) == \
+        (post['created_at'], 1, 1)
+
+    comment = Comment.find_by_id(comment_id)
+    comment.content = 'modifié'
+    comment.save()
+    # Ré-enregistrer un commentaire ne le compte pas une seconde fois
+    assert client.get(f'/posts/{post_id}').get_json()['post']['comment_count'] == 1
+    assert client.get(f'/comments/{comment_id}').get_json()['comment']['content'] == 'modifié'
@@ -0,0 +1,44 @@
+﻿# Validation des corps de requête : 400 avec un message, sans écriture
+import pytest
+from conftest import create_user, create_post
+
+
+@pytest.mark.parametrize('body, message', [
+    ({'name': 'alice'}, 'Champs manquants : email'),
+    ({'name': 'alice', 'email': ''}, 'Champs manquants : email'),
+    ({'name': 'alice', 'email': 42}, 'Champ email invalide'),
+    ({'name': True, 'email': 'alice@example.com'}, 'Champ name invalide'),
+    ({}, 'Données JSON manquantes'),
+    ([], 'Données JSON manquantes')
+])
+def test_invalid_user_body(client, body, message):
+    response = client.post('/users', json=body)
+    assert response.status_code == 400
+    assert response.get_json()['status'] == 'error'
+    assert response.get_json()['message'].startswith(message)
+    assert client.get('/users').get_json()['users'] == []
+
+
+def test_body_that_is_not_json(client):
+    response = client.post('/users', data='name=alice', content_type='application/x-www-form-urlencoded')
+    assert response.status_code == 400
+    response = client.post('/users', data='{"name": ', content_type='application/json')
+    assert response.status_code == 400
+
+
+def test_invalid_bodies_on_other_routes(client):
+    alice = create_user(client, 'alice')
+    post_id = create_post(client, alice, 'bonjour')
+    for method, path, body in (
+            ('put', f'/users/{alice}', {'name': 1}),
+            ('post', f'/users/{alice}/friends', {'friend_id': 7}),
+            ('post', f'/posts/users/{alice}/posts', {'title': 'sans contenu'}),
+            ('put', f'/posts/{post_id}', {'content': ['liste']}),
+            ('post', f'/posts/{post_id}/like', {}),
+            ('post', f'/comments/posts/{post_id}/comments', {'content': 'sans auteur'})):
+        response = getattr(client, method)(path, json=body)
+        assert response.status_code == 400, (method, path)
+
+    post = client.get(f'/posts/{post_id}').get_json()['post']
+    assert (post['like_count'], post['comment_count']) == (0, 0)
+    assert client.get(f'/users/{alice}').get_json()['user']['name'] == 'alice'